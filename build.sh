@@ -5,8 +5,11 @@ set -o errexit
 # Встановлюємо залежності
 pip install -r requirements.txt
 
-# Збираємо статичні файли
-python manage.py collectstatic --no-input
+# Перевіряємо, що шаблони посилаються лише на хешовані статичні файли
+python manage.py check --tag templates
+
+# Збираємо статичні файли: хешовані імена плюс стиснені .br та .gz версії
+python manage.py collectstatic --no-input --clear
 
 # Накочуємо міграції
 python manage.py migrate
@@ -1,5 +1,54 @@
 from django.contrib import admin
-from .models import DishType, Dish, Ingredient
+from .facets import PRICE_BANDS, get_facets, price_band_q
+from .models import DishType, Dish, Ingredient, Order, Ticket
+
+PRICE_BAND_CHOICES = [(band, label) for band, label, _, _ in PRICE_BANDS]
+
+
+class CachedFacetsMixin:
+    """
+    Take the filter's counts from the cached ``get_facets`` of the dishes
+    matching the search and the other filters, instead of aggregating them
+    on every request.
+    """
+
+    def get_cached_facets(self, changelist):
+        excluded = self.expected_parameters()
+        queryset = changelist.get_queryset(self.request, exclude_parameters=excluded)
+        key_parts = ["admin"] + sorted(
+            f"{name}={values}"
+            for name, values in changelist.filter_params.items()
+            if name not in excluded
+        )
+        return get_facets(queryset, key_parts)
+
+
+class DishTypeListFilter(CachedFacetsMixin, admin.RelatedFieldListFilter):
+    def get_facet_queryset(self, changelist):
+        facets = self.get_cached_facets(changelist)
+        counts = {pk: count for pk, _, count in facets.dish_types}
+        return {f"{pk}__c": counts.get(pk, 0) for pk, _ in self.lookup_choices}
+
+
+class PriceBandListFilter(CachedFacetsMixin, admin.SimpleListFilter):
+    title = "price"
+    parameter_name = "price_band"
+
+    def lookups(self, request, model_admin):
+        return PRICE_BAND_CHOICES
+
+    def queryset(self, request, queryset):
+        if self.value() in dict(PRICE_BAND_CHOICES):
+            return queryset.filter(price_band_q(self.value()))
+        return queryset
+
+    def get_facet_queryset(self, changelist):
+        facets = self.get_cached_facets(changelist)
+        counts = {band: count for band, _, count in facets.price_bands}
+        return {
+            f"{i}__c": counts.get(band, 0)
+            for i, (band, _) in enumerate(self.lookup_choices)
+        }
 
 
 @admin.register(DishType)
@@ -14,7 +63,28 @@ class IngredientAdmin(admin.ModelAdmin):
 
 @admin.register(Dish)
 class DishAdmin(admin.ModelAdmin):
-    list_display = ("name", "dish_type", "price")
-    list_filter = ("dish_type",)
+    list_display = ("name", "dish_type_name", "price")
+    list_filter = (("dish_type", DishTypeListFilter), PriceBandListFilter)
+    # The counts are cached per data version, so they are always shown.
+    show_facets = admin.ShowFacets.ALWAYS
     search_fields = ("name",)
     filter_horizontal = ("cooks", "ingredients")
+
+
+class TicketInline(admin.TabularInline):
+    model = Ticket
+    extra = 0
+    raw_id_fields = ("dish", "cook")
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "created_at")
+    inlines = [TicketInline]
+
+
+@admin.register(Ticket)
+class TicketAdmin(admin.ModelAdmin):
+    list_display = ("pk", "dish", "cook", "status", "priority", "updated_at")
+    list_filter = ("status",)
+    raw_id_fields = ("order", "dish", "cook")
@@ -0,0 +1,142 @@
+from collections import defaultdict
+
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from django.views import generic
+
+from .forms import DishSearchForm
+from .models import Dish
+from .pagination import CURSOR_PARAM, paginate_keyset
+
+SCALAR_FIELDS = ("id", "name", "description", "price")
+RELATED_FIELDS = ("dish_type", "ingredients", "cooks")
+DISH_FIELDS = SCALAR_FIELDS + RELATED_FIELDS
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def parse_fields(value):
+    if not value:
+        return DISH_FIELDS
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    unknown = sorted(set(fields) - set(DISH_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return tuple(field for field in DISH_FIELDS if field in fields)
+
+
+def parse_limit(value):
+    if not value:
+        return DEFAULT_PAGE_SIZE
+    limit = int(value)
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def dish_values(queryset, fields):
+    """
+    Select only the requested dish columns as dicts, reading the dish type
+    name from its denormalized copy. ``id`` and ``name`` are always selected
+    because they key the cursor.
+    """
+    columns = ["id", "name"] + [
+        field for field in SCALAR_FIELDS if field in fields and field not in ("id", "name")
+    ]
+    if "dish_type" in fields:
+        columns += ["dish_type_id", "dish_type_name"]
+    return queryset.values(*columns)
+
+
+def attach_relations(rows, fields):
+    """Add the requested M2M lists with one query per relation."""
+    ids = [row["id"] for row in rows]
+    if "ingredients" in fields:
+        ingredients = defaultdict(list)
+        links = Dish.ingredients.through.objects.filter(dish_id__in=ids).values_list(
+            "dish_id", "ingredient_id", "ingredient__name"
+        )
+        for dish_id, ingredient_id, name in links.order_by("ingredient__name"):
+            ingredients[dish_id].append({"id": ingredient_id, "name": name})
+    if "cooks" in fields:
+        cooks = defaultdict(list)
+        links = Dish.cooks.through.objects.filter(dish_id__in=ids).values_list(
+            "dish_id", "cook_id", "cook__username", "cook__first_name", "cook__last_name"
+        )
+        for dish_id, cook_id, username, first_name, last_name in links.order_by(
+            "cook__username"
+        ):
+            cooks[dish_id].append(
+                {
+                    "id": cook_id,
+                    "username": username,
+                    "first_name": first_name,
+                    "last_name": last_name,
+                }
+            )
+
+    results = []
+    for row in rows:
+        item = {field: row[field] for field in SCALAR_FIELDS if field in fields}
+        if "dish_type" in fields:
+            item["dish_type"] = {
+                "id": row["dish_type_id"],
+                "name": row["dish_type_name"],
+            }
+        if "ingredients" in fields:
+            item["ingredients"] = ingredients.get(row["id"], [])
+        if "cooks" in fields:
+            item["cooks"] = cooks.get(row["id"], [])
+        results.append(item)
+    return results
+
+
+def error_response(message, status=400):
+    return JsonResponse({"error": message}, status=status)
+
+
+class DishApiListView(LoginRequiredMixin, generic.View):
+    raise_exception = True
+
+    def get(self, request, *args, **kwargs):
+        try:
+            fields = parse_fields(request.GET.get("fields"))
+            limit = parse_limit(request.GET.get("limit"))
+        except ValueError as error:
+            return error_response(str(error))
+
+        form = DishSearchForm(request.GET)
+        queryset = form.search(form.filter_by_ingredients(Dish.objects.all()))
+        page = paginate_keyset(
+            dish_values(queryset, fields),
+            ("name", "id"),
+            limit,
+            token=request.GET.get(CURSOR_PARAM),
+        )
+        return JsonResponse(
+            {
+                "results": attach_relations(page.object_list, fields),
+                "next": page.next_cursor,
+                "previous": page.previous_cursor,
+            },
+            encoder=DjangoJSONEncoder,
+        )
+
+
+class DishApiDetailView(LoginRequiredMixin, generic.View):
+    raise_exception = True
+
+    def get(self, request, pk, *args, **kwargs):
+        try:
+            fields = parse_fields(request.GET.get("fields"))
+        except ValueError as error:
+            return error_response(str(error))
+
+        rows = list(dish_values(Dish.objects.filter(pk=pk), fields))
+        if not rows:
+            return error_response("Not found.", status=404)
+        return JsonResponse(
+            attach_relations(rows, fields)[0], encoder=DjangoJSONEncoder
+        )
@@ -0,0 +1,120 @@
+from django.contrib.auth.views import redirect_to_login
+from django.core.handlers.asgi import ASGIRequest
+from django.core.paginator import InvalidPage
+from django.http import Http404
+from django.utils.translation import gettext as _
+from django.views import generic
+from django.views.generic.base import ContextMixin
+
+
+def is_asgi(request):
+    """Whether ``request`` is served by the ASGI handler, on an event loop."""
+    return isinstance(request, ASGIRequest)
+
+
+class AsyncLoginRequiredMixin:
+    """LoginRequiredMixin for async views, resolving the user with ``auser()``."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        request.user = user
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncListView(generic.ListView):
+    """
+    ListView whose page is counted and fetched with the async ORM.
+
+    ``get_queryset`` and ``get_context_data`` must not query; work that
+    does goes in ``aget_queryset`` and ``aget_context_data``.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = queryset = await self.aget_queryset()
+        page_size = self.get_paginate_by(queryset)
+        if page_size:
+            self.page = await self.apaginate_queryset(queryset, page_size)
+        else:
+            self.page = (None, None, [obj async for obj in queryset], False)
+        context = await self.aget_context_data()
+        return self.render_to_response(context)
+
+    async def aget_queryset(self):
+        return self.get_queryset()
+
+    async def aget_context_data(self, **kwargs):
+        return self.get_context_data(**kwargs)
+
+    async def apaginate_queryset(self, queryset, page_size):
+        paginator = self.get_paginator(
+            range(await queryset.acount()),
+            page_size,
+            orphans=self.get_paginate_orphans(),
+            allow_empty_first_page=self.get_allow_empty(),
+        )
+        page_kwarg = self.page_kwarg
+        page = self.kwargs.get(page_kwarg) or self.request.GET.get(page_kwarg) or 1
+        try:
+            page_number = int(page)
+        except ValueError:
+            if page == "last":
+                page_number = paginator.num_pages
+            else:
+                raise Http404(_("Page is not “last”, nor can it be converted to an int."))
+        try:
+            page = paginator.page(page_number)
+        except InvalidPage as e:
+            raise Http404(
+                _("Invalid page (%(page_number)s): %(message)s")
+                % {"page_number": page_number, "message": str(e)}
+            )
+        bounds = page.object_list
+        page.object_list = [obj async for obj in queryset[bounds.start : bounds.stop]]
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        # MultipleObjectMixin's, with the page get() already fetched.
+        paginator, page, rows, is_paginated = self.page
+        context = {
+            "paginator": paginator,
+            "page_obj": page,
+            "is_paginated": is_paginated,
+            "object_list": rows,
+        }
+        context_object_name = self.get_context_object_name(self.object_list)
+        if context_object_name is not None:
+            context[context_object_name] = rows
+        context.update(kwargs)
+        return ContextMixin.get_context_data(self, **context)
+
+
+class AsyncDetailView(generic.DetailView):
+    """DetailView fetching its object with the async ORM."""
+
+    async def get(self, request, *args, **kwargs):
+        self.object = await self.aget_object()
+        context = self.get_context_data(object=self.object)
+        return self.render_to_response(context)
+
+    async def aget_object(self):
+        queryset = self.get_queryset()
+        pk = self.kwargs.get(self.pk_url_kwarg)
+        slug = self.kwargs.get(self.slug_url_kwarg)
+        if pk is not None:
+            queryset = queryset.filter(pk=pk)
+        if slug is not None and (pk is None or self.query_pk_and_slug):
+            queryset = queryset.filter(**{self.get_slug_field(): slug})
+        if pk is None and slug is None:
+            raise AttributeError(
+                f"Generic detail view {self.__class__.__name__} must be called with "
+                f"either an object pk or a slug in the URLconf."
+            )
+        try:
+            return await queryset.aget()
+        except queryset.model.DoesNotExist:
+            raise Http404(
+                _("No %(verbose_name)s found matching the query")
+                % {"verbose_name": queryset.model._meta.verbose_name}
+            )
@@ -0,0 +1,128 @@
+import uuid
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+KEY_PREFIX = "kitchen:auth:"
+
+
+def get_cache():
+    return caches[getattr(settings, "AUTH_USER_CACHE", "default")]
+
+
+# Never cached, so a password hash stays out of the cache even when it is
+# stored on disk; the user loads it on first access like a deferred field.
+EXCLUDED_FIELDS = ("password",)
+
+
+def get_timeout():
+    return getattr(settings, "AUTH_USER_CACHE_TIMEOUT", 300)
+
+
+def _keys(user_id):
+    return f"{KEY_PREFIX}version:{user_id}", f"{KEY_PREFIX}user:{user_id}"
+
+
+def invalidate(user_id):
+    """Give ``user_id`` a new version, orphaning its cached entry."""
+    version_key, _ = _keys(user_id)
+    get_cache().set(version_key, uuid.uuid4().hex, timeout=get_timeout())
+
+
+def _current_version(cache, version_key, version):
+    # A version that expires only orphans the entries made under it.
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(version_key, version, timeout=get_timeout()):
+            version = cache.get(version_key, version)
+    return version
+
+
+def _dump(user):
+    """Return the cacheable field values of ``user``."""
+    return user._state.db, {
+        field.attname: getattr(user, field.attname)
+        for field in user._meta.concrete_fields
+        if field.attname not in EXCLUDED_FIELDS
+    }
+
+
+def _load(db, values):
+    return auth.get_user_model().from_db(db, list(values), list(values.values()))
+
+
+def cached_user(request):
+    """
+    Return the user of ``request``'s session from the cache when its entry
+    is at the current version and matches the session's auth hash, falling
+    back to ``auth.get_user()`` (which also verifies the session) otherwise.
+    """
+    session = request.session
+    try:
+        user_id = str(session[auth.SESSION_KEY])
+        backend_path = session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return auth.get_user(request)
+    session_hash = session.get(auth.HASH_SESSION_KEY)
+    cache = get_cache()
+    version_key, user_key = _keys(user_id)
+    cached = cache.get_many([version_key, user_key])
+    version = cached.get(version_key)
+    entry = cached.get(user_key)
+    if (
+        entry is not None
+        and version is not None
+        and entry[0] == version
+        and session_hash
+        and backend_path in settings.AUTHENTICATION_BACKENDS
+        and constant_time_compare(session_hash, entry[1])
+    ):
+        return _load(*entry[2:])
+
+    # Read the version before the row, so a change committed in between
+    # leaves this entry behind instead of hiding under the new version.
+    version = _current_version(cache, version_key, version)
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        entry = (version, user.get_session_auth_hash(), *_dump(user))
+        cache.set(user_key, entry, timeout=get_timeout())
+    return user
+
+
+def get_user(request):
+    if not hasattr(request, "_cached_user"):
+        request._cached_user = cached_user(request)
+    return request._cached_user
+
+
+async def auser(request):
+    if not hasattr(request, "_acached_user"):
+        request._acached_user = await sync_to_async(cached_user)(request)
+    return request._acached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    ``AuthenticationMiddleware`` that keeps logged-in cooks (every field but
+    the password hash) in the ``AUTH_USER_CACHE`` cache, so a request reads
+    its user from there instead of loading the row. Saving or deleting a cook gives it a new version on
+    commit, and a password change also stops matching the hash stored in
+    other sessions, which are logged out as before. Use a cache shared by
+    every worker (as in production settings) so they all see new versions.
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
+        request.auser = partial(auser, request)
+
+
+def cook_changed(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate, instance.pk))
@@ -0,0 +1,120 @@
+import threading
+from array import array
+from bisect import bisect_left
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import JsonResponse
+from django.views import generic
+
+from . import versioning
+from .api import error_response, parse_limit
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+def word_starts(text):
+    """``text`` case folded, plus each of its tails starting at a word."""
+    words = text.casefold().split()
+    return {" ".join(words[i:]) for i in range(len(words))}
+
+
+class PrefixIndex:
+    """
+    Case-folded names of one model, sorted, so the rows whose name (or a
+    word of it) starts with a prefix are one contiguous run found with a
+    bisection. ``texts`` returns the names of an object loaded with only
+    ``fields``; the label shown is ``str(obj)``, as in model choice fields.
+
+    Rebuilt with one query when the version table shows the model changed,
+    in this process or another, so a lookup costs one version query.
+    """
+
+    def __init__(self, label, fields, texts):
+        self.label = label
+        self.fields = fields
+        self.texts = texts
+        self._lock = threading.Lock()
+        self._keys = None
+        self._ids = None
+        self._labels = None
+        self._state = None
+
+    def invalidate(self):
+        with self._lock:
+            self._keys = None
+
+    def _build(self, state):
+        model = apps.get_model(self.label)
+        entries = []
+        labels = {}
+        for obj in model.objects.only(*self.fields).iterator(chunk_size=10000):
+            labels[obj.pk] = str(obj)
+            for text in self.texts(obj):
+                entries.extend((key, obj.pk) for key in word_starts(text))
+        entries.sort()
+        self._keys = [key for key, _ in entries]
+        self._ids = array("q", (pk for _, pk in entries))
+        self._labels = labels
+        self._state = state
+
+    def ensure_fresh(self):
+        with self._lock:
+            state = versioning.get_versions((self.label,))
+            if self._keys is None or state != self._state:
+                self._build(state)
+            return self._keys, self._ids, self._labels
+
+    def search(self, prefix, limit=DEFAULT_LIMIT):
+        """Return up to ``limit`` ``(id, label)`` pairs matching ``prefix``."""
+        prefix = " ".join(prefix.casefold().split())
+        if not prefix:
+            return []
+        keys, ids, labels = self.ensure_fresh()
+        results = []
+        seen = set()
+        for i in range(bisect_left(keys, prefix), len(keys)):
+            if not keys[i].startswith(prefix):
+                break
+            pk = ids[i]
+            if pk not in seen:
+                seen.add(pk)
+                results.append((pk, labels[pk]))
+                if len(results) == limit:
+                    break
+        return results
+
+
+indexes = {
+    "cook": PrefixIndex(
+        settings.AUTH_USER_MODEL,
+        ("username", "first_name", "last_name"),
+        lambda cook: (cook.username, cook.get_full_name()),
+    ),
+    "dish": PrefixIndex("kitchen.Dish", ("name",), lambda dish: (dish.name,)),
+    "ingredient": PrefixIndex(
+        "kitchen.Ingredient", ("name",), lambda ingredient: (ingredient.name,)
+    ),
+}
+
+
+class AutocompleteView(LoginRequiredMixin, generic.View):
+    """
+    ``GET ?q=<prefix>&limit=<n>``: the ``kind`` objects with a name or a
+    word of it starting with ``q``, as ``{"results": [{"id", "label"}]}``.
+    """
+
+    raise_exception = True
+    kind = None
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = min(parse_limit(request.GET.get("limit") or DEFAULT_LIMIT), MAX_LIMIT)
+        except ValueError:
+            return error_response("limit must be a positive integer.")
+        results = indexes[self.kind].search(request.GET.get("q", ""), limit)
+        return JsonResponse(
+            {"results": [{"id": pk, "label": label} for pk, label in results]}
+        )
@@ -0,0 +1,389 @@
+import asyncio
+import random
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from asgiref.sync import ThreadSensitiveContext
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.urls import reverse
+
+from . import (
+    changes,
+    cook_stats,
+    counters,
+    dish_summary,
+    ingredient_index,
+    tickets as ticket_queue,
+    urls as kitchen_urls,
+    versioning,
+)
+from .models import Dish, DishType, Ingredient, Order, Ticket
+
+
+def seed_dataset(
+    dishes=1000,
+    cooks=100,
+    dish_types=20,
+    ingredients=200,
+    links_per_dish=3,
+    seed=0,
+    batch_size=2000,
+):
+    """
+    Fill the database with generated rows using ``bulk_create`` only.
+    Returns the user the benchmark logs in as.
+    """
+    rng = random.Random(seed)
+    cook_model = get_user_model()
+    password = make_password("benchmark")
+
+    DishType.objects.bulk_create(
+        [DishType(name=f"Type {i:05d}") for i in range(dish_types)],
+        batch_size=batch_size,
+    )
+    Ingredient.objects.bulk_create(
+        [Ingredient(name=f"Ingredient {i:06d}") for i in range(ingredients)],
+        batch_size=batch_size,
+    )
+    cook_model.objects.bulk_create(
+        [
+            cook_model(
+                username=f"cook{i:06d}",
+                first_name="Bench",
+                last_name=f"Cook {i}",
+                years_of_experience=rng.randint(0, 30),
+                password=password,
+            )
+            for i in range(cooks)
+        ],
+        batch_size=batch_size,
+    )
+    user = cook_model.objects.create_user(
+        username="benchmark", password="benchmark", is_staff=True
+    )
+    type_ids = list(DishType.objects.values_list("pk", flat=True))
+    ingredient_ids = list(Ingredient.objects.values_list("pk", flat=True))
+    cook_ids = list(cook_model.objects.values_list("pk", flat=True))
+
+    for start in range(0, dishes, batch_size):
+        batch = Dish.objects.bulk_create(
+            [
+                Dish(
+                    name=f"Dish {i:07d}",
+                    description="Generated for benchmarking",
+                    price=Decimal(rng.randint(100, 9999)) / 100,
+                    dish_type_id=rng.choice(type_ids),
+                )
+                for i in range(start, min(start + batch_size, dishes))
+            ]
+        )
+        Dish.cooks.through.objects.bulk_create(
+            [
+                Dish.cooks.through(dish_id=dish.pk, cook_id=cook_id)
+                for dish in batch
+                for cook_id in rng.sample(cook_ids, min(links_per_dish, len(cook_ids)))
+            ],
+            batch_size=batch_size,
+        )
+        Dish.ingredients.through.objects.bulk_create(
+            [
+                Dish.ingredients.through(dish_id=dish.pk, ingredient_id=ingredient_id)
+                for dish in batch
+                for ingredient_id in rng.sample(
+                    ingredient_ids, min(links_per_dish, len(ingredient_ids))
+                )
+            ],
+            batch_size=batch_size,
+        )
+
+    counters.reconcile()
+    ingredient_index.index.invalidate()
+    cook_stats.rebuild()
+    dish_summary.refresh()
+    changes.snapshot()
+    for label in ("kitchen.Dish", "kitchen.DishType", "kitchen.Ingredient"):
+        versioning.bump(label)
+    versioning.bump(cook_model._meta.label)
+    return user
+
+
+# Streams that never end on their own.
+UNBOUNDED_URLS = {"kitchen:events"}
+
+
+def fragment_query():
+    ids = Dish.objects.order_by("pk").values_list("pk", flat=True)[:5]
+    return f"?fragment=dish-row&ids={','.join(map(str, ids))}"
+
+
+# Query strings for URLs that need parameters to answer 200.
+URL_QUERIES = {"kitchen:live-fragments": fragment_query}
+
+
+def collect_urls(user):
+    """
+    Return ``(url_name, path)`` for every pattern in kitchen/urls.py and
+    users/urls.py, filling ``pk`` with the first matching object, or with
+    ``user`` for cook URLs since cooks may only edit themselves.
+    """
+    from users import urls as users_urls
+
+    pk_models = {
+        "dish": Dish,
+        "api-dish": Dish,
+        "dishtype": DishType,
+        "ingredient": Ingredient,
+        "cook": get_user_model(),
+    }
+    collected = []
+    for module in (kitchen_urls, users_urls):
+        for pattern in module.urlpatterns:
+            view_class = getattr(pattern.callback, "view_class", None)
+            if view_class is not None and not hasattr(view_class, "get"):
+                continue  # POST-only actions
+            url_name = f"{module.app_name}:{pattern.name}"
+            if url_name in UNBOUNDED_URLS:
+                continue
+            kwargs = {}
+            if "pk" in pattern.pattern.converters:
+                model = pk_models[pattern.name.rsplit("-", 1)[0]]
+                obj = user if model is type(user) else model.objects.order_by("pk").first()
+                if obj is None:
+                    continue
+                kwargs["pk"] = obj.pk
+            query = URL_QUERIES[url_name]() if url_name in URL_QUERIES else ""
+            collected.append((url_name, reverse(url_name, kwargs=kwargs) + query))
+    return collected
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def get(client, path):
+    """GET ``path``, reading streamed responses to the end."""
+    response = client.get(path)
+    if response.streaming:
+        b"".join(response.streaming_content)
+    return response
+
+
+def benchmark_url(client, path, requests=50):
+    """
+    Warm ``path`` up once, count the queries of a steady-state request and
+    time ``requests`` sequential GETs.
+    """
+    get(client, path)
+    queries = QueryCounter()
+    with connection.execute_wrapper(queries):
+        response = get(client, path)
+
+    timings = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        begin = time.perf_counter()
+        get(client, path)
+        timings.append(time.perf_counter() - begin)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "path": path,
+        "status": response.status_code,
+        "queries": queries.count,
+        "requests": requests,
+        "rps": round(requests / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(timings, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 3),
+    }
+
+
+def run_benchmarks(client, user, requests=50, only=None):
+    results = []
+    for url_name, path in collect_urls(user):
+        if only and url_name not in only:
+            continue
+        results.append({"url_name": url_name, **benchmark_url(client, path, requests)})
+    return results
+
+
+# Async views compared under both handlers by the concurrency benchmark.
+ASYNC_URLS = (
+    "kitchen:dish-list",
+    "kitchen:dish-detail",
+    "kitchen:dishtype-list",
+    "kitchen:dishtype-detail",
+    "users:cook-list",
+    "users:cook-detail",
+)
+
+
+class SimulatedLatency:
+    def __init__(self, delay):
+        self.delay = delay
+        self.active = True
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.active:
+            time.sleep(self.delay)
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def simulated_latency(delay):
+    """
+    Sleep ``delay`` seconds before every query on every connection, including
+    the per-request ones opened by the threads serving async views.
+    """
+    wrapper = SimulatedLatency(delay)
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(wrapper)
+
+    connection_created.connect(install, weak=False, dispatch_uid="kitchen.benchmark.latency")
+    try:
+        with connection.execute_wrapper(wrapper):
+            yield wrapper
+    finally:
+        connection_created.disconnect(dispatch_uid="kitchen.benchmark.latency")
+        # Connections created meanwhile keep the wrapper, switched off.
+        wrapper.active = False
+
+
+def benchmark_sync(client, path, requests):
+    """Serve ``requests`` GETs one after another, like a single sync worker."""
+    client.get(path)
+    timings = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        begin = time.perf_counter()
+        response = client.get(path)
+        timings.append(time.perf_counter() - begin)
+    return response.status_code, timings, time.perf_counter() - started
+
+
+async def benchmark_async(client, path, requests, concurrency):
+    """
+    Serve ``requests`` GETs with up to ``concurrency`` in flight on one event
+    loop. Each request runs in its own ``ThreadSensitiveContext``, as under
+    the ASGI handler, so ORM calls of different requests overlap.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def fetch():
+        async with semaphore, ThreadSensitiveContext():
+            begin = time.perf_counter()
+            response = await client.get(path)
+            timings.append(time.perf_counter() - begin)
+            return response.status_code
+
+    async with ThreadSensitiveContext():
+        await client.get(path)
+    started = time.perf_counter()
+    statuses = await asyncio.gather(*(fetch() for _ in range(requests)))
+    return max(statuses), timings, time.perf_counter() - started
+
+
+def summarize(status, timings, elapsed):
+    return {
+        "status": status,
+        "rps": round(len(timings) / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(timings, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 3),
+    }
+
+
+def run_concurrency_benchmarks(
+    client, async_client, user, requests=50, concurrency=10, latency=0.005, only=None
+):
+    """
+    Compare each view of ``ASYNC_URLS`` served serially by the WSGI handler,
+    like a sync worker, with the same view served concurrently by the ASGI
+    handler, with ``latency`` seconds added per query.
+    """
+    paths = dict(collect_urls(user))
+    results = []
+    with simulated_latency(latency):
+        for url_name in ASYNC_URLS:
+            if only and url_name not in only:
+                continue
+            sync_result = benchmark_sync(client, paths[url_name], requests)
+            async_result = asyncio.run(
+                benchmark_async(async_client, paths[url_name], requests, concurrency)
+            )
+            results.append(
+                {
+                    "url_name": url_name,
+                    "sync": summarize(*sync_result),
+                    "async": summarize(*async_result),
+                }
+            )
+    return results
+
+
+def benchmark_tickets(tickets=5000, batch_size=100, capacity=None, seed=0):
+    """
+    Push ``tickets`` random tickets through queued, assigned, cooking and
+    done with a fresh ``Scheduler``, ``batch_size`` tickets per call, and
+    report the transitions per second and the queries they took.
+    """
+    rng = random.Random(seed)
+    dish_ids = list(
+        Dish.cooks.through.objects.order_by().values_list("dish_id", flat=True).distinct()
+    )
+    scheduler = ticket_queue.Scheduler(capacity=capacity)
+    scheduler.ensure_fresh()
+    order = Order.objects.create(table="benchmark")
+    created = Ticket.objects.bulk_create(
+        [
+            Ticket(order=order, dish_id=rng.choice(dish_ids), priority=rng.randint(0, 3))
+            for _ in range(tickets)
+        ],
+        batch_size=2000,
+    )
+
+    def batches(items):
+        for start in range(0, len(items), batch_size):
+            yield items[start : start + batch_size]
+
+    queries = QueryCounter()
+    transitions = 0
+    started = time.perf_counter()
+    with connection.execute_wrapper(queries):
+        for batch in batches(created):
+            assignments = scheduler.submit(batch)
+            transitions += sum(1 for cook_id in assignments.values() if cook_id)
+        while assigned := scheduler.open_tickets(Ticket.Status.ASSIGNED):
+            for batch in batches(assigned):
+                transitions += len(scheduler.start(batch))
+            before = len(scheduler.open_tickets(Ticket.Status.QUEUED))
+            for batch in batches(assigned):
+                transitions += len(scheduler.complete(batch))
+            # Completions hand waiting tickets to the cooks they free.
+            transitions += before - len(scheduler.open_tickets(Ticket.Status.QUEUED))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "tickets": tickets,
+        "batch_size": batch_size,
+        "capacity": capacity,
+        "transitions": transitions,
+        "transitions_per_second": round(transitions / elapsed, 2) if elapsed else None,
+        "queries": queries.count,
+        "done": Ticket.objects.filter(order=order, status=Ticket.Status.DONE).count(),
+    }
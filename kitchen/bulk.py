@@ -0,0 +1,315 @@
+import csv
+import json
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Prefetch
+
+from . import changes, cook_stats, counters, dish_summary, ingredient_index, versioning
+from .models import Dish, DishType, Ingredient
+
+MODEL_CHOICES = ("dishtype", "ingredient", "cook", "dish")
+FORMAT_CHOICES = ("csv", "jsonl")
+
+# Separator for multi-valued columns (ingredients, cooks) in CSV files.
+LIST_SEPARATOR = ";"
+
+EXPORT_FIELDS = {
+    "dishtype": ["name"],
+    "ingredient": ["name"],
+    "cook": ["username", "first_name", "last_name", "email", "years_of_experience"],
+    "dish": ["name", "description", "price", "dish_type", "ingredients", "cooks"],
+}
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return "jsonl" if str(path).endswith((".jsonl", ".json")) else "csv"
+
+
+def read_rows(stream, fmt):
+    if fmt == "jsonl":
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        yield from csv.DictReader(stream)
+
+
+def clean_price(value):
+    """
+    Return ``value`` as a positive price the ``Dish.price`` column can hold,
+    or raise ``ValidationError``.
+    """
+    price = Dish._meta.get_field("price").clean(value, None)
+    if price <= 0:
+        raise ValidationError("Prices must stay above zero.")
+    return price
+
+
+def as_list(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(LIST_SEPARATOR) if item.strip()]
+    return list(value)
+
+
+class Importer:
+    """
+    Stream rows into the database with ``bulk_create``, resolving names to
+    primary keys through in-memory lookups and inserting ``Dish.cooks`` /
+    ``Dish.ingredients`` links in batches. Rows whose natural key already
+    exists are skipped.
+
+    Each batch commits on its own, so derived data is resynced even when a
+    later batch fails.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.created = 0
+        self.skipped = 0
+        self.errors = []
+        # Data rows read before the current batch, for 1-based row numbers.
+        self.rows_read = 0
+
+    def run(self, model, rows):
+        handler = getattr(self, f"import_{model}")
+        committed = False
+        try:
+            for batch in batched(rows, self.batch_size):
+                with transaction.atomic():
+                    handler(batch)
+                committed = True
+                self.rows_read += len(batch)
+        finally:
+            if committed:
+                self.refresh_derived(model)
+
+    def refresh_derived(self, model):
+        # bulk_create sends no signals, so resync what they maintain.
+        counters.reconcile()
+        ingredient_index.index.invalidate()
+        if model in ("cook", "dish"):
+            cook_stats.rebuild()
+        if model == "dish":
+            dish_summary.refresh()
+        for label in ("kitchen.Dish", "kitchen.DishType", "kitchen.Ingredient"):
+            versioning.bump(label)
+        versioning.bump(get_user_model()._meta.label)
+
+    def _create_named(self, model, names):
+        names = set(filter(None, names))
+        existing = set(
+            model.objects.filter(name__in=names).values_list("name", flat=True)
+        )
+        new = [model(name=name) for name in sorted(names - existing)]
+        model.objects.bulk_create(new, batch_size=self.batch_size)
+        changes.record(model._meta.model_name, changes.UPSERT, [obj.pk for obj in new])
+        return len(new), len(existing)
+
+    def import_dishtype(self, rows):
+        created, skipped = self._create_named(DishType, (row["name"] for row in rows))
+        self.created += created
+        self.skipped += skipped
+
+    def import_ingredient(self, rows):
+        created, skipped = self._create_named(
+            Ingredient, (row["name"] for row in rows)
+        )
+        self.created += created
+        self.skipped += skipped
+
+    def import_cook(self, rows):
+        cook_model = get_user_model()
+        usernames = [row["username"] for row in rows]
+        existing = set(
+            cook_model.objects.filter(username__in=usernames).values_list(
+                "username", flat=True
+            )
+        )
+        cooks = []
+        for row in rows:
+            if row["username"] in existing:
+                self.skipped += 1
+                continue
+            existing.add(row["username"])
+            cooks.append(
+                cook_model(
+                    username=row["username"],
+                    first_name=row.get("first_name") or "",
+                    last_name=row.get("last_name") or "",
+                    email=row.get("email") or "",
+                    years_of_experience=int(row.get("years_of_experience") or 0),
+                    password=make_password(row.get("password") or None),
+                )
+            )
+        cook_model.objects.bulk_create(cooks, batch_size=self.batch_size)
+        changes.record("cook", changes.UPSERT, [cook.pk for cook in cooks])
+        self.created += len(cooks)
+
+    def import_dish(self, rows):
+        cook_model = get_user_model()
+        for row in rows:
+            row["ingredients"] = as_list(row.get("ingredients"))
+            row["cooks"] = as_list(row.get("cooks"))
+
+        self._create_named(DishType, (row.get("dish_type") for row in rows))
+        self._create_named(
+            Ingredient, (name for row in rows for name in row["ingredients"])
+        )
+        type_ids = dict(
+            DishType.objects.filter(
+                name__in={row.get("dish_type") for row in rows}
+            ).values_list("name", "pk")
+        )
+        ingredient_ids = dict(
+            Ingredient.objects.filter(
+                name__in={name for row in rows for name in row["ingredients"]}
+            ).values_list("name", "pk")
+        )
+        cook_ids = dict(
+            cook_model.objects.filter(
+                username__in={name for row in rows for name in row["cooks"]}
+            ).values_list("username", "pk")
+        )
+        existing = set(
+            Dish.objects.filter(name__in=[row["name"] for row in rows]).values_list(
+                "name", flat=True
+            )
+        )
+
+        dishes, accepted = [], []
+        for number, row in enumerate(rows, start=self.rows_read + 1):
+            missing = [name for name in row["cooks"] if name not in cook_ids]
+            if row["name"] in existing:
+                self.skipped += 1
+                continue
+            if missing or not row.get("dish_type"):
+                self.errors.append(
+                    f"row {number}: {row['name']}: unknown cook(s) {', '.join(missing)}"
+                    if missing
+                    else f"row {number}: {row['name']}: missing dish_type"
+                )
+                continue
+            try:
+                price = clean_price(row.get("price"))
+            except ValidationError:
+                self.errors.append(
+                    f"row {number}: {row['name']}: invalid price {row.get('price')!r}"
+                )
+                continue
+            existing.add(row["name"])
+            dishes.append(
+                Dish(
+                    name=row["name"],
+                    description=row.get("description") or "",
+                    price=price,
+                    dish_type_id=type_ids[row["dish_type"]],
+                )
+            )
+            accepted.append(row)
+        Dish.objects.bulk_create(dishes, batch_size=self.batch_size)
+        changes.record("dish", changes.UPSERT, [dish.pk for dish in dishes])
+
+        cook_links = [
+            (dish.pk, cook_ids[name])
+            for dish, row in zip(dishes, accepted)
+            for name in set(row["cooks"])
+        ]
+        Dish.cooks.through.objects.bulk_create(
+            [
+                Dish.cooks.through(dish_id=dish_id, cook_id=cook_id)
+                for dish_id, cook_id in cook_links
+            ],
+            batch_size=self.batch_size,
+        )
+        changes.record_links("dish_cooks", changes.ADD, cook_links)
+        ingredient_links = [
+            (dish.pk, ingredient_ids[name])
+            for dish, row in zip(dishes, accepted)
+            for name in set(row["ingredients"])
+        ]
+        Dish.ingredients.through.objects.bulk_create(
+            [
+                Dish.ingredients.through(dish_id=dish_id, ingredient_id=ingredient_id)
+                for dish_id, ingredient_id in ingredient_links
+            ],
+            batch_size=self.batch_size,
+        )
+        changes.record_links("dish_ingredients", changes.ADD, ingredient_links)
+        self.created += len(dishes)
+
+
+def iter_export_rows(model, chunk_size=2000):
+    """Yield one dict per object, reading the table in chunks."""
+    if model == "dishtype":
+        yield from DishType.objects.values("name").iterator(chunk_size=chunk_size)
+    elif model == "ingredient":
+        yield from Ingredient.objects.values("name").iterator(chunk_size=chunk_size)
+    elif model == "cook":
+        yield from (
+            get_user_model()
+            .objects.order_by("username")
+            .values(*EXPORT_FIELDS["cook"])
+            .iterator(chunk_size=chunk_size)
+        )
+    elif model == "dish":
+        dishes = (
+            Dish.objects.only("name", "description", "price", "dish_type_name")
+            .prefetch_related(
+                Prefetch("cooks", queryset=get_user_model().objects.only("username")),
+                Prefetch("ingredients", queryset=Ingredient.objects.only("name")),
+            )
+        )
+        for dish in dishes.iterator(chunk_size=chunk_size):
+            yield {
+                "name": dish.name,
+                "description": dish.description,
+                "price": dish.price,
+                "dish_type": dish.dish_type_name,
+                "ingredients": [ingredient.name for ingredient in dish.ingredients.all()],
+                "cooks": [cook.username for cook in dish.cooks.all()],
+            }
+    else:
+        raise ValueError(f"Unknown model {model!r}")
+
+
+class Echo:
+    """File-like object whose ``write`` returns the text, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def iter_export_lines(model, fmt, chunk_size=2000):
+    """Yield the export of ``model`` as CSV or JSONL text, line by line."""
+    rows = iter_export_rows(model, chunk_size=chunk_size)
+    if fmt == "jsonl":
+        for row in rows:
+            yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+        return
+    fields = EXPORT_FIELDS[model]
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow(
+            [
+                LIST_SEPARATOR.join(row[field])
+                if isinstance(row[field], list)
+                else row[field]
+                for field in fields
+            ]
+        )
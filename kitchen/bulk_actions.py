@@ -0,0 +1,245 @@
+from decimal import ROUND_HALF_UP, Decimal
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F, Max, Min
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from . import changes, cook_stats, counters, dish_summary, events, tickets, versioning
+from .ingredient_index import index as ingredient_index
+from .models import Dish, DishType, Ingredient, Ticket
+
+MIN_PRICE = Decimal("0.01")
+MAX_PRICE = Decimal("9999.99")
+
+CookLink = Dish.cooks.through
+IngredientLink = Dish.ingredients.through
+
+
+class BulkActionError(ValueError):
+    pass
+
+
+def _ids(queryset):
+    return list(queryset.order_by().values_list("pk", flat=True))
+
+
+def _cook_ids(dish_ids):
+    return set(
+        CookLink.objects.filter(dish_id__in=dish_ids).values_list("cook_id", flat=True)
+    )
+
+
+# The pre_delete and post_delete receivers that _raw_delete skips, each
+# repeated once per batch by the bulk deletes below. The tests compare this
+# with the signal registry, so a receiver connected later fails them until
+# its bulk counterpart is added here and to the delete.
+MIRRORED_RECEIVERS = {
+    "kitchen.Dish": {
+        "kitchen.signals.count_deleted",
+        "kitchen.signals.bump_version",
+        "kitchen.ingredient_index.dish_deleting",
+        "kitchen.ingredient_index.dish_deleted",
+        "kitchen.cook_stats.dish_deleting",
+        "kitchen.cook_stats.dish_deleted",
+        "kitchen.tickets.changed",
+        "kitchen.events.model_deleted",
+        "kitchen.changes.model_deleted",
+    },
+    "kitchen.DishType": {
+        "kitchen.signals.count_deleted",
+        "kitchen.signals.bump_version",
+        "kitchen.changes.model_deleted",
+    },
+    "kitchen.Ingredient": {
+        "kitchen.signals.count_deleted",
+        "kitchen.signals.bump_version",
+        "kitchen.ingredient_index.ingredient_deleted",
+        "kitchen.dish_summary.linked_deleting",
+        "kitchen.dish_summary.linked_deleted",
+        "kitchen.changes.model_deleted",
+    },
+    # Repeated by tickets.delete_tickets_of.
+    "kitchen.Ticket": {
+        "kitchen.tickets.changed",
+        "kitchen.signals.bump_version",
+        "kitchen.events.model_deleted",
+    },
+}
+
+
+def _raw_delete(model, pks):
+    # QuerySet.delete() would collect every row and send per-row signals;
+    # links are removed beforehand and MIRRORED_RECEIVERS repeated by the
+    # caller.
+    queryset = model.objects.filter(pk__in=pks)
+    return queryset._raw_delete(queryset.db)
+
+
+def _on_commit(func, *args):
+    transaction.on_commit(partial(func, *args))
+
+
+def _scale(price, factor):
+    # Rounds like the Round() of the UPDATE.
+    return (price * factor).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+@transaction.atomic
+def change_prices(dishes, percent):
+    """Scale the price of ``dishes`` by ``percent`` (e.g. -10 or 15)."""
+    dish_ids = _ids(dishes)
+    factor = 1 + Decimal(percent) / 100
+    if factor <= 0:
+        raise BulkActionError("Prices must stay above zero.")
+    prices = Dish.objects.filter(pk__in=dish_ids).aggregate(
+        low=Min("price"), high=Max("price")
+    )
+    if prices["low"] is not None and _scale(prices["low"], factor) < MIN_PRICE:
+        raise BulkActionError(f"Prices may not drop below {MIN_PRICE}.")
+    if prices["high"] is not None and _scale(prices["high"], factor) > MAX_PRICE:
+        raise BulkActionError(f"Prices may not exceed {MAX_PRICE}.")
+    updated = Dish.objects.filter(pk__in=dish_ids).update(
+        price=Round(F("price") * factor, 2), updated_at=timezone.now()
+    )
+    cook_stats.refresh(_cook_ids(dish_ids))
+    versioning.bump("kitchen.Dish")
+    events.publish("dish", "updated", dish_ids)
+    changes.record("dish", changes.UPSERT, dish_ids)
+    return updated
+
+
+@transaction.atomic
+def reassign_dish_type(dishes, dish_type):
+    dish_ids = _ids(dishes)
+    updated = Dish.objects.filter(pk__in=dish_ids).update(
+        dish_type=dish_type, dish_type_name=dish_type.name, updated_at=timezone.now()
+    )
+    cook_stats.refresh(_cook_ids(dish_ids))
+    versioning.bump("kitchen.Dish")
+    events.publish("dish", "updated", dish_ids)
+    changes.record("dish", changes.UPSERT, dish_ids)
+    return updated
+
+
+@transaction.atomic
+def add_ingredient(dishes, ingredient):
+    dish_ids = _ids(dishes)
+    IngredientLink.objects.bulk_create(
+        [IngredientLink(dish_id=pk, ingredient_id=ingredient.pk) for pk in dish_ids],
+        ignore_conflicts=True,
+    )
+    updated = Dish.objects.filter(pk__in=dish_ids).update(updated_at=timezone.now())
+    dish_summary.refresh(dish_ids)
+    versioning.bump("kitchen.Dish")
+    events.publish("dish", "updated", dish_ids)
+    changes.record_links(
+        "dish_ingredients", changes.ADD, [(pk, ingredient.pk) for pk in dish_ids]
+    )
+    _on_commit(ingredient_index.link, ingredient.pk, sorted(dish_ids))
+    return updated
+
+
+@transaction.atomic
+def remove_ingredient(dishes, ingredient):
+    dish_ids = _ids(dishes)
+    links = IngredientLink.objects.filter(dish_id__in=dish_ids, ingredient=ingredient)
+    unlinked = list(links.values_list("dish_id", flat=True))
+    links.delete()
+    Dish.objects.filter(pk__in=unlinked).update(updated_at=timezone.now())
+    dish_summary.refresh(unlinked)
+    versioning.bump("kitchen.Dish")
+    events.publish("dish", "updated", unlinked)
+    changes.record_links(
+        "dish_ingredients", changes.REMOVE, [(pk, ingredient.pk) for pk in unlinked]
+    )
+    _on_commit(ingredient_index.unlink, ingredient.pk, unlinked)
+    return len(unlinked)
+
+
+def _delete_dishes(dish_ids):
+    cook_ids = _cook_ids(dish_ids)
+    links = list(
+        IngredientLink.objects.filter(dish_id__in=dish_ids).values_list(
+            "dish_id", "ingredient_id"
+        )
+    )
+    CookLink.objects.filter(dish_id__in=dish_ids).delete()
+    IngredientLink.objects.filter(dish_id__in=dish_ids).delete()
+    tickets.delete_tickets_of(dish_ids)
+    deleted = _raw_delete(Dish, dish_ids)
+
+    ingredients_of = {pk: [] for pk in dish_ids}
+    for dish_id, ingredient_id in links:
+        ingredients_of[dish_id].append(ingredient_id)
+    for dish_id, ingredient_ids in ingredients_of.items():
+        _on_commit(ingredient_index.remove_dish, dish_id, ingredient_ids)
+    _on_commit(counters.increment, "num_dishes", -deleted)
+    _on_commit(tickets.scheduler.invalidate)
+    cook_stats.refresh(cook_ids)
+    versioning.bump("kitchen.Dish")
+    events.publish("dish", "deleted", dish_ids)
+    events.publish("cook", "updated", cook_ids)
+    changes.record("dish", changes.DELETE, dish_ids)
+    return deleted
+
+
+@transaction.atomic
+def delete_dishes(dishes):
+    return _delete_dishes(_ids(dishes))
+
+
+@transaction.atomic
+def delete_dish_types(dish_types):
+    """Delete ``dish_types`` and, as their foreign key cascades, their dishes."""
+    type_ids = _ids(dish_types)
+    deleted_dishes = _delete_dishes(_ids(Dish.objects.filter(dish_type_id__in=type_ids)))
+    deleted = _raw_delete(DishType, type_ids)
+    _on_commit(counters.increment, "num_types", -deleted)
+    changes.record("dishtype", changes.DELETE, type_ids)
+    versioning.bump("kitchen.DishType")
+    return deleted, deleted_dishes
+
+
+@transaction.atomic
+def delete_ingredients(ingredients):
+    ingredient_ids = _ids(ingredients)
+    links = IngredientLink.objects.filter(ingredient_id__in=ingredient_ids)
+    dish_ids = set(links.values_list("dish_id", flat=True))
+    links.delete()
+    deleted = _raw_delete(Ingredient, ingredient_ids)
+    Dish.objects.filter(pk__in=dish_ids).update(updated_at=timezone.now())
+    dish_summary.refresh(dish_ids)
+    for pk in ingredient_ids:
+        _on_commit(ingredient_index.remove_ingredient, pk)
+    _on_commit(counters.increment, "num_ingredients", -deleted)
+    changes.record("ingredient", changes.DELETE, ingredient_ids)
+    versioning.bump("kitchen.Ingredient")
+    if dish_ids:
+        versioning.bump("kitchen.Dish")
+        events.publish("dish", "updated", dish_ids)
+    return deleted
+
+
+def preview_delete(model, queryset, sample_size=10):
+    """
+    Describe what deleting ``queryset`` would remove, with one count query
+    per affected table instead of loading the cascade.
+    """
+    preview = {"count": queryset.count(), "sample": list(queryset[:sample_size])}
+    if model is DishType:
+        dishes = Dish.objects.filter(dish_type__in=queryset.values("pk"))
+        preview["dishes"] = dishes.count()
+    elif model is Dish:
+        dishes = queryset
+    else:
+        preview["dish_links"] = IngredientLink.objects.filter(
+            ingredient__in=queryset.values("pk")
+        ).count()
+        return preview
+    dish_ids = dishes.values("pk")
+    preview["tickets"] = Ticket.objects.filter(dish__in=dish_ids).count()
+    preview["cook_links"] = CookLink.objects.filter(dish__in=dish_ids).count()
+    preview["ingredient_links"] = IngredientLink.objects.filter(dish__in=dish_ids).count()
+    return preview
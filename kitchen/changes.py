@@ -0,0 +1,260 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views import generic
+
+from .api import error_response, parse_limit
+from .models import Change, Dish, DishType, Ingredient, ModelVersion
+from .transactions import on_commit_once
+
+UPSERT = Change.Action.UPSERT
+DELETE = Change.Action.DELETE
+ADD = Change.Action.ADD
+REMOVE = Change.Action.REMOVE
+
+KIND_LABELS = {
+    "dishtype": "kitchen.DishType",
+    "ingredient": "kitchen.Ingredient",
+    "cook": settings.AUTH_USER_MODEL,
+    "dish": "kitchen.Dish",
+}
+LABEL_KINDS = {label: kind for kind, label in KIND_LABELS.items()}
+LINK_KINDS = {"dish_cooks": "cook_id", "dish_ingredients": "ingredient_id"}
+
+# Columns sent for created or updated objects, never the password.
+SYNC_FIELDS = {
+    "dishtype": ("id", "name"),
+    "ingredient": ("id", "name"),
+    "cook": ("id", "username", "first_name", "last_name", "years_of_experience"),
+    "dish": ("id", "name", "description", "price", "dish_type_id"),
+}
+
+# ModelVersion row holding the highest seq whose delete or remove entries
+# compaction dropped; clients behind it must sync from 0 again.
+FLOOR_LABEL = "kitchen.Change.floor"
+# ModelVersion row holding the last seq handed out.
+SEQ_LABEL = "kitchen.Change.seq"
+
+
+def models():
+    return {
+        "dishtype": DishType,
+        "ingredient": Ingredient,
+        "cook": get_user_model(),
+        "dish": Dish,
+    }
+
+
+def _write(entries):
+    Change.objects.bulk_create(
+        [
+            Change(kind=kind, action=action, object_id=object_id, related_id=related_id)
+            for kind, action, object_id, related_id in entries
+        ],
+        batch_size=1000,
+    )
+    # Entries left unnumbered by a crash here wait for the next writer or
+    # compact_changes.
+    on_commit_once(sequence, robust=True)
+
+
+def record(kind, action, object_ids, related_id=0):
+    """
+    Log ``action`` on ``object_ids`` in the current transaction, so the
+    entries commit or roll back with the data they describe. They are
+    numbered by :func:`sequence` once it commits.
+    """
+    entries = [(kind, action, pk, related_id) for pk in object_ids]
+    if entries:
+        _write(entries)
+
+
+def record_links(kind, action, pairs):
+    """Log ``(dish_id, related_id)`` link changes of ``kind``."""
+    entries = [(kind, action, dish_id, related_id) for dish_id, related_id in pairs]
+    if entries:
+        _write(entries)
+
+
+def sequence(batch_size=10000):
+    """
+    Give the committed entries without a seq the next ones, in the order
+    they were written. Numbering under the counter row's lock, after the
+    writers committed, means no entry ever gets a seq below one a client
+    has already read past. Returns how many entries were numbered.
+    """
+    numbered = 0
+    pending = Change.objects.filter(seq__isnull=True).order_by("id")
+    while pending.exists():
+        with transaction.atomic():
+            ModelVersion.objects.get_or_create(
+                label=SEQ_LABEL,
+                defaults={"version": Change.objects.aggregate(top=Max("seq"))["top"] or 0},
+            )
+            counter = ModelVersion.objects.select_for_update().get(label=SEQ_LABEL)
+            ids = list(pending.values_list("id", flat=True)[:batch_size])
+            Change.objects.bulk_update(
+                [Change(id=pk, seq=counter.version + n) for n, pk in enumerate(ids, 1)],
+                ["seq"],
+                batch_size=1000,
+            )
+            ModelVersion.objects.filter(pk=counter.pk).update(
+                version=counter.version + len(ids), updated_at=timezone.now()
+            )
+        numbered += len(ids)
+    return numbered
+
+
+def get_floor():
+    return (
+        ModelVersion.objects.filter(label=FLOOR_LABEL)
+        .values_list("version", flat=True)
+        .first()
+        or 0
+    )
+
+
+def compact(tombstone_age=timedelta(days=30)):
+    """
+    Number the entries a crashed writer left, drop every entry followed by
+    a later one about the same object or link, which no client needs
+    whatever seq it syncs from, then the delete and remove entries older
+    than ``tombstone_age``, raising the floor.
+    Returns ``(superseded, expired)``.
+    """
+    sequence()
+    # By write order, which also covers entries not numbered yet.
+    later = Change.objects.filter(
+        kind=OuterRef("kind"),
+        object_id=OuterRef("object_id"),
+        related_id=OuterRef("related_id"),
+        id__gt=OuterRef("id"),
+    )
+    superseded, _ = Change.objects.filter(Exists(later)).delete()
+
+    old = Change.objects.filter(
+        action__in=[DELETE, REMOVE],
+        seq__isnull=False,
+        created_at__lt=timezone.now() - tombstone_age,
+    )
+    with transaction.atomic():
+        top = old.aggregate(top=Max("seq"))["top"]
+        expired, _ = old.delete()
+        if top and top > get_floor():
+            ModelVersion.objects.update_or_create(
+                label=FLOOR_LABEL, defaults={"version": top}
+            )
+    return superseded, expired
+
+
+def snapshot():
+    """Log an upsert of every object and an add of every link."""
+    for kind, model in models().items():
+        pks = model.objects.order_by("pk").values_list("pk", flat=True)
+        record(kind, UPSERT, pks.iterator(chunk_size=10000))
+    for kind, column in LINK_KINDS.items():
+        through = getattr(Dish, kind.split("_", 1)[1]).through
+        links = through.objects.order_by("pk").values_list("dish_id", column)
+        record_links(kind, ADD, links.iterator(chunk_size=10000))
+
+
+def read_changes(since, limit):
+    """
+    Fold the entries after ``since`` (at most ``limit``) into one operation
+    per object or link, with the current columns of the objects created or
+    updated. Returns ``(changes, last seq read, whether the batch was full)``.
+    """
+    entries = list(
+        Change.objects.filter(seq__gt=since)
+        .order_by("seq")
+        .values_list("seq", "kind", "action", "object_id", "related_id")[:limit]
+    )
+    latest = {}
+    for seq, kind, action, object_id, related_id in entries:
+        latest[kind, object_id, related_id] = action
+
+    changes = defaultdict(lambda: defaultdict(list))
+    upserts = defaultdict(list)
+    for (kind, object_id, related_id), action in latest.items():
+        if kind in LINK_KINDS:
+            changes[kind][action].append([object_id, related_id])
+        elif action == UPSERT:
+            upserts[kind].append(object_id)
+        else:
+            changes[kind][action].append(object_id)
+    for kind, model in models().items():
+        if upserts[kind]:
+            rows = model.objects.filter(pk__in=upserts[kind]).order_by("pk")
+            # Objects deleted since are missing here; their delete follows.
+            changes[kind][UPSERT] = list(rows.values(*SYNC_FIELDS[kind]))
+    return changes, entries[-1][0] if entries else since, len(entries) == limit
+
+
+def model_saved(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw or update_fields == frozenset({"last_login"}):
+        return
+    record(LABEL_KINDS[sender._meta.label], UPSERT, [instance.pk])
+
+
+def model_deleted(sender, instance, **kwargs):
+    # Links of a deleted object go with it, so they are not logged.
+    record(LABEL_KINDS[sender._meta.label], DELETE, [instance.pk])
+
+
+def links_changed(kind, sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        # post_clear has no pk_set, so collect the links before they go.
+        manager = getattr(instance, "dishes" if reverse else kind.split("_", 1)[1])
+        instance._changes_cleared = set(manager.values_list("pk", flat=True))
+        return
+    if action == "post_clear":
+        pk_set, action = getattr(instance, "_changes_cleared", set()), "post_remove"
+    if action not in ("post_add", "post_remove") or not pk_set:
+        return
+    pairs = (
+        [(pk, instance.pk) for pk in pk_set]
+        if reverse
+        else [(instance.pk, pk) for pk in pk_set]
+    )
+    record_links(kind, ADD if action == "post_add" else REMOVE, sorted(pairs))
+
+
+class ChangeFeedView(LoginRequiredMixin, generic.View):
+    """
+    ``GET /api/changes/?since=<seq>&limit=<n>``: what changed after
+    ``since``, one operation per object or link, plus ``next`` to pass as
+    ``since`` on the following call and ``more`` when another batch is
+    waiting. ``since=0`` replays the compacted log, i.e. the whole menu.
+    A client behind the compaction floor gets a 410 and must start over
+    from 0. Deleting a dish, cook or ingredient also deletes its links.
+    """
+
+    raise_exception = True
+
+    def get(self, request, *args, **kwargs):
+        try:
+            since = int(request.GET.get("since") or 0)
+            limit = parse_limit(request.GET.get("limit"))
+        except ValueError:
+            return error_response("since and limit must be non-negative integers.")
+        if since < 0:
+            return error_response("since and limit must be non-negative integers.")
+        floor = get_floor()
+        if 0 < since < floor:
+            return JsonResponse(
+                {"error": "Changes this old were compacted; sync from 0.", "floor": floor},
+                status=410,
+            )
+        changes, last, more = read_changes(since, limit)
+        return JsonResponse(
+            {"since": since, "next": last, "more": more, "changes": changes},
+            encoder=DjangoJSONEncoder,
+        )
@@ -0,0 +1,61 @@
+import re
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.checks import Error, Tags, register
+
+STATIC_TAG = re.compile(r"""{%\s*static\s+(['"])(?P<path>[^'"]+)\1""")
+# A literal STATIC_URL prefix or the STATIC_URL variable skips the manifest
+# and so the hashed file name.
+HARDCODED_STATIC = re.compile(r"""(?:src|href)\s*=\s*['"](?:/static/|{{\s*STATIC_URL)""")
+
+
+def template_dirs():
+    """Template directories holding this project's templates."""
+    dirs = [Path(path) for engine in settings.TEMPLATES for path in engine.get("DIRS", [])]
+    # App templates of this project only, not Django's or third-party ones.
+    dirs += [
+        Path(app.path) / "templates"
+        for app in apps.get_app_configs()
+        if Path(app.path).is_relative_to(settings.BASE_DIR)
+    ]
+    return [path for path in dirs if path.is_dir()]
+
+
+def find_unhashed_static_references(dirs):
+    """
+    Return ``(template, line number, message)`` for every static file
+    reference in ``dirs`` that would not resolve to a hashed asset.
+    """
+    problems = []
+    for directory in dirs:
+        for template in sorted(Path(directory).rglob("*.html")):
+            text = template.read_text(encoding="utf-8")
+            for number, line in enumerate(text.splitlines(), start=1):
+                if HARDCODED_STATIC.search(line):
+                    problems.append(
+                        (template, number, "hard-coded static URL, use {% static %}")
+                    )
+                for match in STATIC_TAG.finditer(line):
+                    if not finders.find(match["path"]):
+                        problems.append(
+                            (template, number, f"static file {match['path']!r} not found")
+                        )
+    return problems
+
+
+@register(Tags.templates)
+def check_static_references(app_configs, **kwargs):
+    return [
+        Error(
+            f"{template}:{number}: {message}.",
+            hint="Reference assets with {% static %} so the manifest storage "
+            "can serve their hashed, compressed versions.",
+            id="kitchen.E001",
+        )
+        for template, number, message in find_unhashed_static_references(
+            template_dirs()
+        )
+    ]
@@ -0,0 +1,109 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, Sum
+
+from .models import CookStats, Dish
+
+STAT_FIELDS = ("dish_count", "dish_type_count", "menu_value")
+
+
+def _rows(cook_ids=None):
+    links = Dish.cooks.through.objects.all()
+    if cook_ids is not None:
+        links = links.filter(cook_id__in=cook_ids)
+    return {
+        row["cook_id"]: row
+        for row in links.values("cook_id").annotate(
+            dish_count=Count("dish_id"),
+            dish_type_count=Count("dish__dish_type_id", distinct=True),
+            menu_value=Sum("dish__price"),
+        )
+    }
+
+
+def _stats(cook_ids, rows):
+    empty = {"dish_count": 0, "dish_type_count": 0, "menu_value": Decimal(0)}
+    return [
+        CookStats(
+            cook_id=cook_id,
+            **{name: rows.get(cook_id, empty)[name] for name in STAT_FIELDS},
+        )
+        for cook_id in cook_ids
+    ]
+
+
+def refresh(cook_ids):
+    """
+    Recompute the stats rows of ``cook_ids`` from their dishes with one
+    grouped query, so list views can sort on them without aggregating.
+    """
+    cook_ids = set(cook_ids)
+    if not cook_ids:
+        return
+    existing = get_user_model().objects.filter(pk__in=cook_ids).values_list(
+        "pk", flat=True
+    )
+    CookStats.objects.bulk_create(
+        _stats(existing, _rows(cook_ids)),
+        update_conflicts=True,
+        unique_fields=["cook"],
+        update_fields=STAT_FIELDS,
+    )
+
+
+def rebuild(batch_size=1000):
+    """Recompute the stats of every cook. Returns the number of rows written."""
+    rows = _rows()
+    cook_ids = list(get_user_model().objects.values_list("pk", flat=True))
+    CookStats.objects.all().delete()
+    CookStats.objects.bulk_create(_stats(cook_ids, rows), batch_size=batch_size)
+    return len(cook_ids)
+
+
+def with_stats(queryset):
+    """
+    Annotate cooks with the columns of their stats row, which every cook
+    gets on creation (``cook_created``) or from ``rebuild()`` after bulk
+    inserts, so sorts and filters can use the stats indexes.
+    """
+    return queryset.annotate(**{name: F(f"stats__{name}") for name in STAT_FIELDS})
+
+
+# Signal handlers, wired up in signals.py.
+
+
+def cooks_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and not reverse:
+        instance._stats_cleared = set(instance.cooks.values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        refresh([instance.pk])
+    elif action == "post_clear":
+        refresh(getattr(instance, "_stats_cleared", ()))
+    else:
+        refresh(pk_set or ())
+
+
+def dish_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # New dishes have no cooks yet; edits may change price or dish type.
+    if created or raw:
+        return
+    if update_fields is not None and not {"price", "dish_type"} & update_fields:
+        return
+    refresh(instance.cooks.values_list("pk", flat=True))
+
+
+def dish_deleting(sender, instance, **kwargs):
+    instance._stats_cooks = list(instance.cooks.values_list("pk", flat=True))
+
+
+def dish_deleted(sender, instance, **kwargs):
+    refresh(getattr(instance, "_stats_cooks", ()))
+
+
+def cook_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        CookStats.objects.get_or_create(cook=instance)
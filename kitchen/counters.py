@@ -0,0 +1,64 @@
+from django.db import transaction
+from django.db.models import F
+
+from .models import Counter, Dish, DishType, Ingredient
+
+
+def counted_models():
+    from users.models import Cook
+
+    return {
+        "num_cooks": Cook,
+        "num_dishes": Dish,
+        "num_types": DishType,
+        "num_ingredients": Ingredient,
+    }
+
+
+def counter_name(model):
+    for name, counted in counted_models().items():
+        if counted is model:
+            return name
+    return None
+
+
+def get_counts():
+    """
+    Return every dashboard total in one query. A total without a row yet
+    (the migration adds them all) is counted once and stored.
+    """
+    models = counted_models()
+    counts = dict(Counter.objects.filter(name__in=models).values_list("name", "value"))
+    for name, model in models.items():
+        if name not in counts:
+            counter, _ = Counter.objects.get_or_create(
+                name=name, defaults={"value": model.objects.count()}
+            )
+            counts[name] = counter.value
+    return {name: counts[name] for name in models}
+
+
+def increment(name, delta=1):
+    # A single UPDATE, so concurrent workers never lose each other's deltas.
+    Counter.objects.filter(name=name).update(value=F("value") + delta)
+
+
+def reconcile():
+    """
+    Recount every total and store it, returning the drift that was
+    corrected as ``{name: (stored, actual)}``.
+    """
+    drift = {}
+    for name, model in counted_models().items():
+        with transaction.atomic():
+            stored = (
+                Counter.objects.select_for_update()
+                .filter(name=name)
+                .values_list("value", flat=True)
+                .first()
+            )
+            actual = model.objects.count()
+            if stored != actual:
+                drift[name] = (stored, actual)
+            Counter.objects.update_or_create(name=name, defaults={"value": actual})
+    return drift
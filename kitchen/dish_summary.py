@@ -0,0 +1,100 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Dish, DishType
+
+SUMMARY_FIELDS = ("dish_type_name", "ingredient_count", "cook_count")
+
+# Columns dish_list.html renders, loaded with ``only()``.
+DISH_LIST_FIELDS = ("id", "name", "price", "dish_type_name", "updated_at")
+
+
+def _link_count(through):
+    links = (
+        through.objects.filter(dish_id=OuterRef("pk"))
+        .order_by()
+        .values("dish_id")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    return Coalesce(Subquery(links), 0)
+
+
+def expected_values():
+    """Expressions computing each summary field from its source rows."""
+    return {
+        "dish_type_name": Subquery(
+            DishType.objects.filter(pk=OuterRef("dish_type_id")).values("name")[:1]
+        ),
+        "ingredient_count": _link_count(Dish.ingredients.through),
+        "cook_count": _link_count(Dish.cooks.through),
+    }
+
+
+def refresh(dish_ids=None):
+    """
+    Recompute the summary columns of ``dish_ids`` (every dish when None)
+    with one UPDATE. Returns the number of rows updated.
+    """
+    dishes = Dish.objects.all()
+    if dish_ids is not None:
+        dish_ids = set(dish_ids)
+        if not dish_ids:
+            return 0
+        dishes = dishes.filter(pk__in=dish_ids)
+    return dishes.update(**expected_values())
+
+
+def repair():
+    """Fix dishes whose summary columns drifted. Returns their ids."""
+    expected = {f"expected_{name}": value for name, value in expected_values().items()}
+    in_sync = Q()
+    for name in SUMMARY_FIELDS:
+        in_sync &= Q(**{name: F(f"expected_{name}")})
+    drifted = list(
+        Dish.objects.annotate(**expected).exclude(in_sync).values_list("pk", flat=True)
+    )
+    refresh(drifted)
+    return drifted
+
+
+# Signal handlers, wired up in signals.py.
+
+
+def dish_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    # A full save writes the instance's copies back, which may be stale.
+    if update_fields is not None and not {"dish_type", *SUMMARY_FIELDS} & update_fields:
+        return
+    refresh([instance.pk])
+
+
+def links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and reverse:
+        instance._summary_cleared = list(instance.dishes.values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        refresh([instance.pk])
+    elif action == "post_clear":
+        refresh(getattr(instance, "_summary_cleared", ()))
+    else:
+        refresh(pk_set or ())
+
+
+def dish_type_saved(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        Dish.objects.filter(dish_type=instance).exclude(
+            dish_type_name=instance.name
+        ).update(dish_type_name=instance.name)
+
+
+def linked_deleting(sender, instance, **kwargs):
+    # Deleting a cook or ingredient drops its links without m2m_changed.
+    instance._summary_dishes = list(instance.dishes.values_list("pk", flat=True))
+
+
+def linked_deleted(sender, instance, **kwargs):
+    refresh(getattr(instance, "_summary_dishes", ()))
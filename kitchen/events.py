@@ -0,0 +1,301 @@
+import asyncio
+import itertools
+import json
+import threading
+import uuid
+from collections import deque
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.views import generic
+
+from . import versioning
+from .api import error_response
+from .async_views import AsyncLoginRequiredMixin, is_asgi
+from .cook_stats import with_stats
+from .dish_summary import DISH_LIST_FIELDS
+from .models import Dish, Ticket
+
+# Event types and the model whose changes they announce.
+KIND_LABELS = {
+    "dish": "kitchen.Dish",
+    "cook": settings.AUTH_USER_MODEL,
+    "ticket": "kitchen.Ticket",
+}
+LABEL_KINDS = {label: kind for kind, label in KIND_LABELS.items()}
+
+# Sent instead of the missed events when a subscriber cannot be caught up.
+RESET = "reset"
+
+
+class Event:
+    __slots__ = ("id", "kind", "action", "ids")
+
+    def __init__(self, id, kind, action, ids):
+        self.id = id
+        self.kind = kind
+        self.action = action
+        self.ids = ids
+
+    def encode(self):
+        data = json.dumps({"action": self.action, "ids": self.ids})
+        return f"id: {self.id}\nevent: {self.kind}\ndata: {data}\n\n"
+
+
+class Subscription:
+    """An event queue read on ``loop`` and filled from any thread."""
+
+    def __init__(self, loop, kinds, size):
+        self.loop = loop
+        self.kinds = kinds
+        self.queue = asyncio.Queue(size)
+
+    def deliver(self, event):
+        if event.kind == RESET or not self.kinds or event.kind in self.kinds:
+            self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up: drop the backlog and have it reload.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(Event(event.id, RESET, "overflow", []))
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class Broadcaster:
+    """
+    In-process fan-out of change events to every open event stream, so a
+    change costs one notification however many screens are listening.
+
+    Events come from the signal handlers below after their transaction
+    commits. Changes made by other worker processes are noticed by one
+    version table query per ``EVENTS_POLL_INTERVAL`` seconds, shared by all
+    subscribers of this process, and announced without ids.
+
+    Event ids carry a per-process token and a sequence number; the last
+    ``history`` events are kept so a reconnecting client sending
+    ``Last-Event-ID`` gets what it missed, or a ``reset`` event otherwise.
+    """
+
+    def __init__(self, history=1000, queue_size=100):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=history)
+        self._seq = itertools.count(1)
+        self._token = uuid.uuid4().hex[:8]
+        self._poller = None
+        self._seen = None
+        self.queue_size = queue_size
+
+    def publish(self, kind, action, ids=()):
+        with self._lock:
+            event = Event(f"{self._token}-{next(self._seq)}", kind, action, sorted(ids))
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.deliver(event)
+            except RuntimeError:
+                # Its event loop is closed.
+                self.unsubscribe(subscription)
+
+    def _missed(self, last_event_id):
+        token, _, seq = (last_event_id or "").partition("-")
+        if not seq.isdigit():
+            return []
+        if token != self._token:
+            return [Event(f"{self._token}-0", RESET, "restart", [])]
+        seq = int(seq)
+        oldest = int(self._history[0].id.rsplit("-", 1)[1]) if self._history else seq + 1
+        if oldest > seq + 1:
+            return [Event(f"{self._token}-0", RESET, "expired", [])]
+        return [event for event in self._history if int(event.id.rsplit("-", 1)[1]) > seq]
+
+    def subscribe(self, kinds=(), last_event_id=None):
+        """Return a subscription read on the running event loop."""
+        loop = asyncio.get_running_loop()
+        subscription = Subscription(loop, frozenset(kinds), self.queue_size)
+        with self._lock:
+            for event in self._missed(last_event_id):
+                subscription.deliver(event)
+            self._subscribers.add(subscription)
+        interval = getattr(settings, "EVENTS_POLL_INTERVAL", 2)
+        if interval and (self._poller is None or self._poller.done()):
+            self._poller = loop.create_task(self._poll(interval))
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def check_versions(self):
+        """
+        Publish a ``changed`` event, without ids, for each kind another
+        process changed since the last call.
+        """
+        labels = tuple(KIND_LABELS.values())
+        versions = versioning.get_versions(labels)
+        local = {label: versioning.local_bumps[label] for label in labels}
+        if self._seen is not None:
+            seen_versions, seen_local = self._seen
+            for label in labels:
+                moved = versions[label][0] - seen_versions[label][0]
+                if moved != local[label] - seen_local[label]:
+                    self.publish(LABEL_KINDS[label], "changed")
+        self._seen = versions, local
+
+    async def _poll(self, interval):
+        while self._subscribers:
+            await sync_to_async(self.check_versions)()
+            await asyncio.sleep(interval)
+        self._seen = None
+
+
+broadcaster = Broadcaster()
+
+
+def publish(kind, action, ids=()):
+    """Publish an event once the current transaction commits."""
+    transaction.on_commit(partial(broadcaster.publish, kind, action, list(ids)))
+
+
+def model_saved(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw or update_fields == frozenset({"last_login"}):
+        return
+    publish(LABEL_KINDS[sender._meta.label], "created" if created else "updated", [instance.pk])
+
+
+def model_deleted(sender, instance, **kwargs):
+    publish(LABEL_KINDS[sender._meta.label], "deleted", [instance.pk])
+
+
+def cooks_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        publish("cook", "updated", [instance.pk])
+        publish("dish", "updated", pk_set or [])
+    else:
+        publish("dish", "updated", [instance.pk])
+        publish("cook", "updated", pk_set or [])
+
+
+def ingredients_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        publish("dish", "updated", (pk_set or []) if reverse else [instance.pk])
+
+
+# Comment lines keep proxies from closing idle streams.
+HEARTBEAT_INTERVAL = 15
+
+
+class EventStreamView(AsyncLoginRequiredMixin, generic.View):
+    """
+    Server-sent events for kitchen screens, e.g. ``?types=dish,ticket``.
+    Each event names the kind of object, the action and the changed ids
+    (none when another process made the change).
+
+    Only served through ``kitchen_service.asgi``: under WSGI an endless
+    stream never sends a byte and holds its worker for good, so the answer
+    there is 501 and screens simply do not update live.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        if not is_asgi(request):
+            return HttpResponse(
+                "Live updates need the ASGI server.", status=501, content_type="text/plain"
+            )
+        kinds = {kind for kind in request.GET.get("types", "").split(",") if kind}
+        subscription = broadcaster.subscribe(
+            kinds & set(KIND_LABELS), request.headers.get("Last-Event-ID")
+        )
+        response = StreamingHttpResponse(
+            self.stream(subscription), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    async def stream(self, subscription):
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                else:
+                    yield event.encode()
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+
+def _open_tickets(request):
+    tickets = Ticket.objects.filter(status__in=Ticket.ACTIVE).select_related(
+        "order", "dish", "cook"
+    )
+    if request.GET.get("mine"):
+        tickets = tickets.filter(cook=request.user)
+    return tickets
+
+
+# Page parts live.js re-renders when an event names their object:
+# fragment name -> (context name, queryset for the request, template).
+FRAGMENTS = {
+    "dish-row": (
+        "dish",
+        lambda request: Dish.objects.only(*DISH_LIST_FIELDS),
+        "includes/dish_row.html",
+    ),
+    "dish-item": ("dish", lambda request: Dish.objects.only("name"), "includes/dish_item.html"),
+    "ticket-row": ("ticket", _open_tickets, "includes/ticket_row.html"),
+    "cook-card": (
+        "cook",
+        lambda request: with_stats(get_user_model().objects.prefetch_related("dishes")),
+        "includes/cook_card.html",
+    ),
+}
+MAX_FRAGMENT_IDS = 100
+
+
+class FragmentView(LoginRequiredMixin, generic.View):
+    """
+    ``GET ?fragment=<name>&ids=1,2``: the markup of one page part per id,
+    as ``{"fragments": {id: html}}``, so a screen receiving an event
+    re-renders only the rows it shows. Ids left out no longer belong on
+    the page (deleted, or a ticket that is no longer open).
+    """
+
+    raise_exception = True
+
+    def get(self, request, *args, **kwargs):
+        try:
+            name, queryset, template = FRAGMENTS[request.GET.get("fragment")]
+        except KeyError:
+            return error_response("Unknown fragment.")
+        try:
+            ids = {int(pk) for pk in request.GET.get("ids", "").split(",") if pk}
+        except ValueError:
+            return error_response("ids must be integers.")
+        if len(ids) > MAX_FRAGMENT_IDS:
+            return error_response(f"At most {MAX_FRAGMENT_IDS} ids.")
+        objects = queryset(request).filter(pk__in=ids)
+        return JsonResponse(
+            {
+                "fragments": {
+                    obj.pk: render_to_string(template, {name: obj}, request)
+                    for obj in objects
+                }
+            }
+        )
@@ -0,0 +1,74 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import generic
+from django.views.decorators.gzip import gzip_page
+
+from .async_views import is_asgi
+from .bulk import FORMAT_CHOICES, iter_export_lines
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+# Lines are joined into blocks of about this many characters, so gzip
+# compresses (and flushes) whole blocks instead of single rows.
+BLOCK_SIZE = 64 * 1024
+
+
+def iter_blocks(lines, size=BLOCK_SIZE):
+    block, length = [], 0
+    for line in lines:
+        block.append(line)
+        length += len(line)
+        if length >= size:
+            yield "".join(block)
+            block, length = [], 0
+    if block:
+        yield "".join(block)
+
+
+async def aiter_blocks(blocks):
+    """
+    Step a block iterator in the thread that owns the database connection.
+    Under ASGI, Django buffers a sync iterator whole with ``list()`` before
+    sending it, so a stream has to be async there.
+    """
+    step = sync_to_async(next)
+    try:
+        while (block := await step(blocks, None)) is not None:
+            yield block
+    finally:
+        await sync_to_async(blocks.close)()
+
+
+@method_decorator(gzip_page, name="dispatch")
+class ExportView(LoginRequiredMixin, UserPassesTestMixin, generic.View):
+    """
+    Stream every row of ``model`` as CSV or JSONL (``?format=``), reading
+    the table in chunks so memory use does not grow with its size.
+    """
+
+    model = None
+    filename = None
+    chunk_size = 2000
+    block_size = BLOCK_SIZE
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        fmt = request.GET.get("format", "csv")
+        if fmt not in FORMAT_CHOICES:
+            return HttpResponseBadRequest(f"Unknown format: {fmt}")
+        lines = iter_export_lines(self.model, fmt, chunk_size=self.chunk_size)
+        blocks = iter_blocks(lines, self.block_size)
+        if is_asgi(request):
+            blocks = aiter_blocks(blocks)
+        response = StreamingHttpResponse(blocks, content_type=CONTENT_TYPES[fmt])
+        response["Content-Disposition"] = (
+            f'attachment; filename="{self.filename}.{fmt}"'
+        )
+        return response
@@ -0,0 +1,148 @@
+import hashlib
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Q, Value, When
+
+from . import versioning
+from .models import Dish
+
+# (key, label, lower bound inclusive, upper bound exclusive)
+PRICE_BANDS = (
+    ("under-5", "Under $5", None, 5),
+    ("5-10", "$5 - $10", 5, 10),
+    ("10-20", "$10 - $20", 10, 20),
+    ("20-up", "$20 and up", 20, None),
+)
+FACET_CACHE_TIMEOUT = 600
+FACET_VERSION_LABELS = ("kitchen.Dish", "kitchen.DishType", "kitchen.Ingredient")
+TOP_INGREDIENTS = 10
+
+
+def price_band_q(key):
+    for band, _, low, high in PRICE_BANDS:
+        if band == key:
+            condition = Q()
+            if low is not None:
+                condition &= Q(price__gte=low)
+            if high is not None:
+                condition &= Q(price__lt=high)
+            return condition
+    raise ValueError(f"Unknown price band: {key}")
+
+
+def price_band_expression():
+    whens = []
+    for band, _, low, high in PRICE_BANDS:
+        if high is not None:
+            whens.append(When(price__lt=high, then=Value(band)))
+    return Case(*whens, default=Value(PRICE_BANDS[-1][0]), output_field=CharField())
+
+
+class Facets:
+    def __init__(self, dish_types, price_bands, ingredients):
+        self.dish_types = dish_types
+        self.price_bands = price_bands
+        self.ingredients = ingredients
+
+
+def _facet_queries(queryset, dish_type, price_band):
+    rows = (
+        queryset.order_by()
+        .annotate(price_band=price_band_expression())
+        .values_list("dish_type_id", "dish_type_name", "price_band")
+        .annotate(count=Count("pk"))
+    )
+    matching = queryset
+    if dish_type is not None:
+        matching = matching.filter(dish_type_id=dish_type)
+    if price_band is not None:
+        matching = matching.filter(price_band_q(price_band))
+    ingredients = (
+        Dish.ingredients.through.objects.filter(dish_id__in=matching.order_by().values("pk"))
+        .values_list("ingredient_id", "ingredient__name")
+        .annotate(count=Count("dish_id"))
+        .order_by("-count", "ingredient__name")[:TOP_INGREDIENTS]
+    )
+    return rows, ingredients
+
+
+def count_facets(queryset, dish_type=None, price_band=None):
+    """
+    Count dishes per dish type and price band with one grouped query over
+    ``queryset`` (filtered by everything but those two facets), each facet
+    honouring the other's selection, and the top ingredients of the dishes
+    matching both.
+    """
+    rows, ingredients = _facet_queries(queryset, dish_type, price_band)
+    return _tally(list(rows), list(ingredients), dish_type, price_band)
+
+
+async def acount_facets(queryset, dish_type=None, price_band=None):
+    """``count_facets`` for async views."""
+    rows, ingredients = _facet_queries(queryset, dish_type, price_band)
+    rows = [row async for row in rows]
+    ingredients = [row async for row in ingredients]
+    return _tally(rows, ingredients, dish_type, price_band)
+
+
+def _tally(rows, ingredients, dish_type, price_band):
+    type_counts = defaultdict(int)
+    band_counts = defaultdict(int)
+    names = {}
+    for type_id, type_name, band, count in rows:
+        names[type_id] = type_name
+        if price_band in (None, band):
+            type_counts[type_id] += count
+        if dish_type in (None, type_id):
+            band_counts[band] += count
+
+    return Facets(
+        dish_types=sorted(
+            ((pk, names[pk], count) for pk, count in type_counts.items()),
+            key=lambda item: item[1],
+        ),
+        price_bands=[
+            (band, label, band_counts[band])
+            for band, label, _, _ in PRICE_BANDS
+            if band_counts[band]
+        ],
+        ingredients=ingredients,
+    )
+
+
+def _cache_key(key_parts, dish_type, price_band, versions):
+    parts = [str(part) for part in key_parts] + [str(dish_type), str(price_band)]
+    parts += [
+        f"{label}:{versions[label][0]}:{versions[label][1]}"
+        for label in FACET_VERSION_LABELS
+    ]
+    return "kitchen:facets:" + hashlib.md5("|".join(parts).encode()).hexdigest()
+
+
+def get_facets(queryset, key_parts, dish_type=None, price_band=None, versions=None):
+    """
+    ``count_facets`` cached per data version: ``key_parts`` must identify the
+    filters already applied to ``queryset``. ``versions`` may pass on a
+    ``versioning.get_versions`` result covering ``FACET_VERSION_LABELS``.
+    """
+    if versions is None or not set(FACET_VERSION_LABELS) <= set(versions):
+        versions = versioning.get_versions(FACET_VERSION_LABELS)
+    key = _cache_key(key_parts, dish_type, price_band, versions)
+    facets = cache.get(key)
+    if facets is None:
+        facets = count_facets(queryset, dish_type, price_band)
+        cache.set(key, facets, FACET_CACHE_TIMEOUT)
+    return facets
+
+
+async def aget_facets(queryset, key_parts, dish_type=None, price_band=None, versions=None):
+    """``get_facets`` for async views."""
+    if versions is None or not set(FACET_VERSION_LABELS) <= set(versions):
+        versions = await versioning.aget_versions(FACET_VERSION_LABELS)
+    key = _cache_key(key_parts, dish_type, price_band, versions)
+    facets = await cache.aget(key)
+    if facets is None:
+        facets = await acount_facets(queryset, dish_type, price_band)
+        await cache.aset(key, facets, FACET_CACHE_TIMEOUT)
+    return facets
@@ -1,30 +1,243 @@
+from asgiref.sync import sync_to_async
 from django import forms
-from .models import Dish
+from django.urls import reverse_lazy
+
+from .facets import PRICE_BANDS, aget_facets, get_facets, price_band_q
+from .ingredient_index import filter_dishes, resolve_names
+from .models import Dish, DishType, Ingredient
+from .search import SearchFormMixin
+
+
+class AutocompleteSelectMultiple(forms.SelectMultiple):
+    """
+    Multiple select rendering only the selected options, which
+    static/js/autocomplete.js turns into a search-as-you-type box fed by
+    the JSON endpoint at ``url``.
+    """
+
+    def __init__(self, url, attrs=None):
+        super().__init__({"data-autocomplete-url": url, **(attrs or {})})
+
+    def optgroups(self, name, value, attrs=None):
+        choices = self.choices
+        ids = [pk for pk in value if pk.isdigit()]
+        queryset = choices.queryset.filter(pk__in=ids) if ids else []
+        self.choices = [(obj.pk, choices.field.label_from_instance(obj)) for obj in queryset]
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = choices
 
 
 class DishForm(forms.ModelForm):
     class Meta:
         model = Dish
         fields = "__all__"
+        # Submitted ids are checked with one IN query per field.
         widgets = {
-            "cooks": forms.CheckboxSelectMultiple(),
-            "ingredients": forms.CheckboxSelectMultiple(),
+            "cooks": AutocompleteSelectMultiple(
+                reverse_lazy("kitchen:api-autocomplete-cooks")
+            ),
+            "ingredients": AutocompleteSelectMultiple(
+                reverse_lazy("kitchen:api-autocomplete-ingredients")
+            ),
         }
 
 
-class DishSearchForm(forms.Form):
+class DishSearchForm(SearchFormMixin, forms.Form):
     name = forms.CharField(
         max_length=255, required=False, label="Search dish by name"
     )
+    with_ingredients = forms.CharField(
+        required=False,
+        label="With all of these ingredients",
+        help_text="Comma separated ingredient names.",
+    )
+    any_ingredients = forms.CharField(
+        required=False, label="With any of these ingredients"
+    )
+    without_ingredients = forms.CharField(
+        required=False, label="Without these ingredients"
+    )
+    # Facets, picked from the links next to the list.
+    dish_type = forms.IntegerField(required=False, widget=forms.HiddenInput)
+    price_band = forms.ChoiceField(
+        choices=[("", "")] + [(band, label) for band, label, _, _ in PRICE_BANDS],
+        required=False,
+        widget=forms.HiddenInput,
+    )
+    ingredient = forms.IntegerField(required=False, widget=forms.HiddenInput)
+
+    def _names(self, field):
+        value = self.cleaned_data.get(field) or ""
+        return [name.strip() for name in value.split(",") if name.strip()]
+
+    def has_ingredient_filters(self):
+        if not self.is_valid():
+            return False
+        return bool(
+            self._names("with_ingredients")
+            or self._names("any_ingredients")
+            or self._names("without_ingredients")
+            or self.cleaned_data.get("ingredient") is not None
+        )
+
+    def filter_by_ingredients(self, queryset):
+        """Apply the ingredient filters through the in-memory inverted index."""
+        if not self.has_ingredient_filters():
+            return queryset
+        with_names = self._names("with_ingredients")
+        any_names = self._names("any_ingredients")
+        without_names = self._names("without_ingredients")
+        facet = self.cleaned_data.get("ingredient")
+
+        all_of, missing = resolve_names(with_names)
+        if facet is not None:
+            all_of.append(facet)
+        any_of, _ = resolve_names(any_names)
+        none_of, _ = resolve_names(without_names)
+        if missing or (any_names and not any_of):
+            return queryset.none()
+        return filter_dishes(queryset, all_of, any_of, none_of)
+
+    async def afilter_by_ingredients(self, queryset):
+        """``filter_by_ingredients`` for async views."""
+        if not self.has_ingredient_filters():
+            return queryset
+        # The index is shared between threads behind a lock, so it is
+        # refreshed and queried off the event loop.
+        return await sync_to_async(self.filter_by_ingredients)(queryset)
+
+    def filter_by_facets(self, queryset):
+        """Apply the dish type and price band facets."""
+        if not self.is_valid():
+            return queryset
+        if self.cleaned_data["dish_type"] is not None:
+            queryset = queryset.filter(dish_type_id=self.cleaned_data["dish_type"])
+        if self.cleaned_data["price_band"]:
+            queryset = queryset.filter(price_band_q(self.cleaned_data["price_band"]))
+        return queryset
+
+    def facets(self, queryset, versions=None):
+        """
+        Facet counts for ``queryset``, already filtered by
+        ``filter_by_ingredients`` but not ``filter_by_facets``.
+        """
+        if not self.is_valid():
+            return None
+        return get_facets(*self._facet_arguments(queryset), versions=versions)
+
+    async def afacets(self, queryset, versions=None):
+        """``facets`` for async views."""
+        if not self.is_valid():
+            return None
+        return await aget_facets(*self._facet_arguments(queryset), versions=versions)
+
+    def _facet_arguments(self, queryset):
+        data = self.cleaned_data
+        key_parts = [
+            data[field]
+            for field in (
+                "name",
+                "with_ingredients",
+                "any_ingredients",
+                "without_ingredients",
+                "ingredient",
+            )
+        ]
+        return (
+            self.search(queryset, rank=False),
+            key_parts,
+            data["dish_type"],
+            data["price_band"] or None,
+        )
+
+
+class DishBulkActionForm(forms.Form):
+    ACTION_FIELDS = {
+        "price": "percent",
+        "dish_type": "dish_type",
+        "add_ingredient": "ingredient",
+        "remove_ingredient": "ingredient",
+        "delete": None,
+    }
+
+    action = forms.ChoiceField(
+        choices=[
+            ("price", "Change price by %"),
+            ("dish_type", "Move to dish type"),
+            ("add_ingredient", "Add ingredient"),
+            ("remove_ingredient", "Remove ingredient"),
+            ("delete", "Delete"),
+        ]
+    )
+    dishes = forms.ModelMultipleChoiceField(
+        queryset=Dish.objects.all(), required=False, widget=forms.MultipleHiddenInput
+    )
+    select_all = forms.BooleanField(
+        required=False, label="Every dish matching the current filters"
+    )
+    percent = forms.DecimalField(
+        max_digits=5, decimal_places=2, required=False, label="Price change %"
+    )
+    # Typed names, so the list page does not render every row as an option.
+    dish_type = forms.ModelChoiceField(
+        DishType.objects.all(),
+        to_field_name="name",
+        required=False,
+        widget=forms.TextInput,
+        label="Dish type name",
+    )
+    ingredient = forms.ModelChoiceField(
+        Ingredient.objects.all(),
+        to_field_name="name",
+        required=False,
+        widget=forms.TextInput,
+        label="Ingredient name",
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get("dishes") and not cleaned_data.get("select_all"):
+            raise forms.ValidationError("Select at least one dish.")
+        field = self.ACTION_FIELDS.get(cleaned_data.get("action"))
+        if field and cleaned_data.get(field) is None and field not in self.errors:
+            self.add_error(field, "This action needs a value.")
+        return cleaned_data
+
+
+class BulkDeleteForm(forms.Form):
+    selected = forms.ModelMultipleChoiceField(queryset=None)
+
+    def __init__(self, *args, queryset, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["selected"].queryset = queryset
+
+
+class OrderForm(forms.Form):
+    table = forms.CharField(max_length=50, required=False)
+    dishes = forms.ModelMultipleChoiceField(
+        queryset=Dish.objects.only("name"),
+        widget=AutocompleteSelectMultiple(reverse_lazy("kitchen:api-autocomplete-dishes")),
+    )
+    priority = forms.IntegerField(
+        min_value=-10, max_value=10, initial=0, help_text="Higher is cooked sooner."
+    )
+
+
+class TicketTransitionForm(forms.Form):
+    action = forms.ChoiceField(
+        choices=[("start", "Start"), ("complete", "Complete"), ("cancel", "Cancel")]
+    )
 
 
-class DishTypeSearchForm(forms.Form):
+class DishTypeSearchForm(SearchFormMixin, forms.Form):
     name = forms.CharField(
         max_length=255, required=False, label="Search type by name"
     )
 
 
-class IngredientSearchForm(forms.Form):
+class IngredientSearchForm(SearchFormMixin, forms.Form):
     name = forms.CharField(
         max_length=255, required=False, label="Search ingredient by name"
     )
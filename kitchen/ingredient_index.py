@@ -0,0 +1,244 @@
+import threading
+from array import array
+from bisect import bisect_left
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from . import versioning
+from .models import Dish, Ingredient
+
+TRACKED_LABELS = ("kitchen.Dish", "kitchen.Ingredient")
+
+# Above this many matching ids the filter runs as a subquery on the through
+# table instead of an IN list, which SQLite caps at 32766 parameters.
+MAX_INLINE_IDS = 1000
+
+
+def _contains(postings, dish_id):
+    i = bisect_left(postings, dish_id)
+    return i < len(postings) and postings[i] == dish_id
+
+
+def _insert(postings, dish_id):
+    i = bisect_left(postings, dish_id)
+    if i == len(postings) or postings[i] != dish_id:
+        postings.insert(i, dish_id)
+
+
+def _remove(postings, dish_id):
+    i = bisect_left(postings, dish_id)
+    if i < len(postings) and postings[i] == dish_id:
+        del postings[i]
+
+
+class IngredientIndex:
+    """
+    Inverted index from ingredient id to the sorted ids of the dishes using
+    it, answering "all of / any of / none of" ingredient queries in memory.
+
+    The index is kept current by the ``Dish.ingredients`` signal handlers
+    below and rebuilt with one query over the through table whenever the
+    version table shows dish or ingredient changes made by another process.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = None
+        self._all = None
+        self._state = None
+        self._local_bumps = None
+
+    def invalidate(self):
+        with self._lock:
+            self._postings = None
+
+    def _current_state(self):
+        return versioning.get_versions(TRACKED_LABELS)
+
+    def _is_fresh(self, state):
+        if self._postings is None:
+            return False
+        for label in TRACKED_LABELS:
+            built_version, built_at = self._state[label]
+            version, updated_at = state[label]
+            own = versioning.local_bumps[label] - self._local_bumps[label]
+            if version - built_version != own:
+                return False
+            if own == 0 and updated_at != built_at:
+                return False
+        return True
+
+    def _build(self, state):
+        postings = {}
+        links = Dish.ingredients.through.objects.order_by("ingredient_id", "dish_id")
+        for ingredient_id, dish_id in links.values_list("ingredient_id", "dish_id").iterator(
+            chunk_size=10000
+        ):
+            postings.setdefault(ingredient_id, array("q")).append(dish_id)
+        self._postings = postings
+        self._all = array("q", Dish.objects.order_by("pk").values_list("pk", flat=True))
+        self._adopt(state)
+
+    def _adopt(self, state):
+        self._state = state
+        self._local_bumps = {label: versioning.local_bumps[label] for label in TRACKED_LABELS}
+
+    def ensure_fresh(self):
+        with self._lock:
+            state = self._current_state()
+            if self._is_fresh(state):
+                self._adopt(state)
+            else:
+                self._build(state)
+
+    def query(self, all_of=(), any_of=(), none_of=()):
+        """Return the sorted ids of dishes matching the ingredient ids."""
+        self.ensure_fresh()
+        with self._lock:
+            empty = array("q")
+            if all_of:
+                lists = sorted(
+                    (self._postings.get(pk, empty) for pk in set(all_of)), key=len
+                )
+                result = set(lists[0])
+                for postings in lists[1:]:
+                    result = {pk for pk in result if _contains(postings, pk)}
+            elif any_of:
+                result = set()
+            else:
+                result = set(self._all)
+            if any_of:
+                matches = set()
+                for pk in set(any_of):
+                    matches.update(self._postings.get(pk, empty))
+                result = matches if not all_of else result & matches
+            for pk in set(none_of):
+                result.difference_update(self._postings.get(pk, empty))
+            return sorted(result)
+
+    def excluded(self, none_of):
+        """Return the ids of dishes using any of ``none_of``."""
+        return self.query(any_of=none_of) if none_of else []
+
+    # Deltas, applied after the transaction that made them commits.
+
+    def _apply(self, func, *args):
+        with self._lock:
+            if self._postings is not None:
+                func(*args)
+
+    def _link(self, ingredient_id, dish_ids):
+        postings = self._postings.setdefault(ingredient_id, array("q"))
+        for dish_id in dish_ids:
+            _insert(postings, dish_id)
+
+    def _unlink(self, ingredient_id, dish_ids):
+        postings = self._postings.get(ingredient_id)
+        if postings is not None:
+            for dish_id in dish_ids:
+                _remove(postings, dish_id)
+
+    def link(self, ingredient_id, dish_ids):
+        self._apply(self._link, ingredient_id, dish_ids)
+
+    def unlink(self, ingredient_id, dish_ids):
+        self._apply(self._unlink, ingredient_id, dish_ids)
+
+    def add_dish(self, dish_id):
+        self._apply(_insert, self._all, dish_id)
+
+    def remove_dish(self, dish_id, ingredient_ids):
+        def remove():
+            _remove(self._all, dish_id)
+            for ingredient_id in ingredient_ids:
+                self._unlink(ingredient_id, [dish_id])
+
+        self._apply(remove)
+
+    def remove_ingredient(self, ingredient_id):
+        self._apply(lambda: self._postings.pop(ingredient_id, None))
+
+
+index = IngredientIndex()
+
+
+def update_links(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        # post_clear has no pk_set, so collect the links before they go.
+        related = (
+            instance.dishes.values_list("pk", flat=True)
+            if reverse
+            else instance.ingredients.values_list("pk", flat=True)
+        )
+        instance._index_cleared = set(related)
+        return
+    if action == "post_clear":
+        pk_set = getattr(instance, "_index_cleared", set())
+        action = "post_remove"
+    if action not in ("post_add", "post_remove") or not pk_set:
+        return
+
+    handler = index.link if action == "post_add" else index.unlink
+    if reverse:
+        calls = [(instance.pk, sorted(pk_set))]
+    else:
+        calls = [(ingredient_id, [instance.pk]) for ingredient_id in pk_set]
+    for ingredient_id, dish_ids in calls:
+        transaction.on_commit(lambda i=ingredient_id, d=dish_ids: handler(i, d))
+
+
+def dish_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: index.add_dish(instance.pk))
+
+
+def dish_deleting(sender, instance, **kwargs):
+    instance._index_ingredients = list(
+        instance.ingredients.values_list("pk", flat=True)
+    )
+
+
+def dish_deleted(sender, instance, **kwargs):
+    pk, ingredient_ids = instance.pk, getattr(instance, "_index_ingredients", [])
+    transaction.on_commit(lambda: index.remove_dish(pk, ingredient_ids))
+
+
+def ingredient_deleted(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: index.remove_ingredient(pk))
+
+
+def _links(ingredient_ids):
+    return Dish.ingredients.through.objects.filter(
+        dish_id=OuterRef("pk"), ingredient_id__in=ingredient_ids
+    )
+
+
+def filter_dishes(queryset, all_of=(), any_of=(), none_of=()):
+    """
+    Narrow ``queryset`` to dishes matching the ingredient ids, passing the
+    ids found in the index while they are few enough for an IN list.
+    """
+    if all_of or any_of:
+        ids = index.query(all_of, any_of, none_of)
+        if len(ids) <= MAX_INLINE_IDS:
+            return queryset.filter(pk__in=ids)
+    else:
+        ids = index.excluded(none_of)
+        if len(ids) <= MAX_INLINE_IDS:
+            return queryset.exclude(pk__in=ids)
+    for pk in set(all_of):
+        queryset = queryset.filter(Exists(_links([pk])))
+    if any_of:
+        queryset = queryset.filter(Exists(_links(set(any_of))))
+    if none_of:
+        queryset = queryset.exclude(Exists(_links(set(none_of))))
+    return queryset
+
+
+def resolve_names(names):
+    """Map ingredient names to ids, returning ``(ids, unknown_names)``."""
+    names = {name for name in names if name}
+    found = dict(Ingredient.objects.filter(name__in=names).values_list("name", "pk"))
+    return list(found.values()), names - set(found)
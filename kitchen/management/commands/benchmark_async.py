@@ -0,0 +1,91 @@
+import json
+import platform
+
+from django.db import connection
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from kitchen import visits
+from kitchen.benchmark import run_concurrency_benchmarks, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database, add a fixed latency to every query and "
+        "compare the async views served serially by the WSGI handler with the "
+        "same views served concurrently by the ASGI handler."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dishes", type=int, default=2000)
+        parser.add_argument("--cooks", type=int, default=200)
+        parser.add_argument("--dish-types", type=int, default=20)
+        parser.add_argument("--ingredients", type=int, default=500)
+        parser.add_argument("--links-per-dish", type=int, default=3)
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument("--concurrency", type=int, default=10)
+        parser.add_argument(
+            "--latency-ms", type=float, default=5.0, help="Added to every query."
+        )
+        parser.add_argument(
+            "--url", action="append", dest="urls", help="Only benchmark this URL name."
+        )
+        parser.add_argument("--output", help="Write the JSON results to this file.")
+
+    def handle(self, *args, **options):
+        dataset = {
+            "dishes": options["dishes"],
+            "cooks": options["cooks"],
+            "dish_types": options["dish_types"],
+            "ingredients": options["ingredients"],
+            "links_per_dish": options["links_per_dish"],
+        }
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0)
+        try:
+            self.stderr.write(f"Seeding {dataset} ...")
+            user = seed_dataset(**dataset)
+            client = Client()
+            client.force_login(user)
+            async_client = AsyncClient()
+            async_client.force_login(user)
+            results = run_concurrency_benchmarks(
+                client,
+                async_client,
+                user,
+                requests=options["requests"],
+                concurrency=options["concurrency"],
+                latency=options["latency_ms"] / 1000,
+                only=options["urls"],
+            )
+            visits.get_buffer().flush()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            "created_at": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "dataset": dataset,
+            "concurrency": options["concurrency"],
+            "latency_ms": options["latency_ms"],
+            "results": results,
+        }
+        for result in results:
+            for mode in ("sync", "async"):
+                stats = result[mode]
+                self.stderr.write(
+                    f"{result['url_name']:<24} {mode:<5} {stats['status']} "
+                    f"{stats['rps']:>9} req/s  p50 {stats['p50_ms']:>8} ms  "
+                    f"p99 {stats['p99_ms']:>8} ms"
+                )
+        payload = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as stream:
+                stream.write(payload)
+        else:
+            self.stdout.write(payload)
@@ -0,0 +1,63 @@
+import json
+import platform
+
+from django.db import connection
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from kitchen.benchmark import benchmark_tickets, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database and measure how many ticket state "
+        "transitions per second the order scheduler sustains."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dishes", type=int, default=1000)
+        parser.add_argument("--cooks", type=int, default=100)
+        parser.add_argument("--tickets", type=int, default=10000)
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--capacity", type=int, help="Open tickets per cook before tickets wait."
+        )
+        parser.add_argument("--output", help="Write the JSON results to this file.")
+
+    def handle(self, *args, **options):
+        dataset = {"dishes": options["dishes"], "cooks": options["cooks"]}
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0)
+        try:
+            self.stderr.write(f"Seeding {dataset} ...")
+            seed_dataset(**dataset)
+            result = benchmark_tickets(
+                tickets=options["tickets"],
+                batch_size=options["batch_size"],
+                capacity=options["capacity"],
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stderr.write(
+            f"{result['transitions']} transitions, "
+            f"{result['transitions_per_second']} per second, {result['queries']} queries"
+        )
+        payload = json.dumps(
+            {
+                "created_at": timezone.now().isoformat(),
+                "python": platform.python_version(),
+                "database": connection.vendor,
+                "dataset": dataset,
+                "result": result,
+            },
+            indent=2,
+        )
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as stream:
+                stream.write(payload)
+        else:
+            self.stdout.write(payload)
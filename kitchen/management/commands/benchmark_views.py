@@ -0,0 +1,74 @@
+import json
+import platform
+
+from django.db import connection
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from kitchen import visits
+from kitchen.benchmark import run_benchmarks, seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database and measure requests/second, p50/p99 "
+        "latency and query counts for every kitchen and users URL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dishes", type=int, default=10000)
+        parser.add_argument("--cooks", type=int, default=500)
+        parser.add_argument("--dish-types", type=int, default=50)
+        parser.add_argument("--ingredients", type=int, default=2000)
+        parser.add_argument("--links-per-dish", type=int, default=3)
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument(
+            "--url", action="append", dest="urls", help="Only benchmark this URL name."
+        )
+        parser.add_argument("--output", help="Write the JSON results to this file.")
+
+    def handle(self, *args, **options):
+        dataset = {
+            "dishes": options["dishes"],
+            "cooks": options["cooks"],
+            "dish_types": options["dish_types"],
+            "ingredients": options["ingredients"],
+            "links_per_dish": options["links_per_dish"],
+        }
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0)
+        try:
+            self.stderr.write(f"Seeding {dataset} ...")
+            user = seed_dataset(**dataset)
+            client = Client()
+            client.force_login(user)
+            results = run_benchmarks(
+                client, user, requests=options["requests"], only=options["urls"]
+            )
+            visits.get_buffer().flush()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            "created_at": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "dataset": dataset,
+            "results": results,
+        }
+        for result in results:
+            self.stderr.write(
+                f"{result['url_name']:<28} {result['status']} "
+                f"{result['rps']:>9} req/s  p50 {result['p50_ms']:>8} ms  "
+                f"p99 {result['p99_ms']:>8} ms  {result['queries']} queries"
+            )
+        payload = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as stream:
+                stream.write(payload)
+        else:
+            self.stdout.write(payload)
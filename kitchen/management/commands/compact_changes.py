@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from kitchen import changes
+
+
+class Command(BaseCommand):
+    help = (
+        "Number change feed entries a crashed writer left without a seq, drop "
+        "entries superseded by later ones and delete/remove entries older than "
+        "--days, raising the floor clients may sync from."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30)
+
+    def handle(self, *args, **options):
+        superseded, expired = changes.compact(timedelta(days=options["days"]))
+        self.stdout.write(
+            f"Dropped {superseded} superseded and {expired} expired entries; "
+            f"floor is {changes.get_floor()}."
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from kitchen.bulk import FORMAT_CHOICES, MODEL_CHOICES, iter_export_lines
+
+
+class Command(BaseCommand):
+    help = "Stream dish types, ingredients, cooks or dishes as CSV or JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", choices=MODEL_CHOICES)
+        parser.add_argument("--format", choices=FORMAT_CHOICES, default="csv")
+        parser.add_argument("--output", help="File to write, defaults to stdout.")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        lines = iter_export_lines(
+            options["model"], options["format"], chunk_size=options["chunk_size"]
+        )
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as stream:
+                stream.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
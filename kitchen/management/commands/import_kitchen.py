@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from kitchen.bulk import FORMAT_CHOICES, MODEL_CHOICES, Importer, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk import dish types, ingredients, cooks or dishes from a CSV or "
+        "JSONL file. Dish rows name their dish_type, ingredients and cooks; "
+        "CSV list columns are separated by ';'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", choices=MODEL_CHOICES)
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=FORMAT_CHOICES)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fmt = detect_format(options["path"], options["format"])
+        importer = Importer(batch_size=options["batch_size"])
+        try:
+            with open(options["path"], newline="", encoding="utf-8") as stream:
+                importer.run(options["model"], read_rows(stream, fmt))
+        except (OSError, KeyError, ValueError, DatabaseError) as error:
+            raise CommandError(f"Import failed: {error!r}") from error
+
+        for error in importer.errors:
+            self.stderr.write(error)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {importer.created}, skipped {importer.skipped} existing, "
+                f"rejected {len(importer.errors)}."
+            )
+        )
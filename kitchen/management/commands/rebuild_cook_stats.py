@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from kitchen import cook_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-cook dish statistics from the Dish.cooks links."
+
+    def handle(self, *args, **options):
+        written = cook_stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {written} cook(s)."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from kitchen import counters
+
+
+class Command(BaseCommand):
+    help = "Recount the stored dashboard totals and correct any drift."
+
+    def handle(self, *args, **options):
+        drift = counters.reconcile()
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Counters are in sync."))
+            return
+        for name, (cached, actual) in drift.items():
+            self.stdout.write(f"{name}: {cached} -> {actual}")
+        self.stdout.write(self.style.SUCCESS(f"Corrected {len(drift)} counter(s)."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from kitchen import dish_summary
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the denormalized dish type name, ingredient count and cook "
+        "count of dishes whose copies drifted."
+    )
+
+    def handle(self, *args, **options):
+        drifted = dish_summary.repair()
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Dish summaries are in sync."))
+            return
+        self.stdout.write(
+            self.style.SUCCESS(f"Repaired the summaries of {len(drifted)} dish(es).")
+        )
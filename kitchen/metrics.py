@@ -0,0 +1,252 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import connection
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views import generic
+
+# Upper bounds of the request duration histogram, in seconds.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+UNRESOLVED = "<unresolved>"
+
+
+class ViewStats:
+    FIELDS = ("requests", "duration_sum", "db_sum", "template_sum", "queries")
+
+    def __init__(self):
+        self.requests = 0
+        self.duration_sum = 0.0
+        self.db_sum = 0.0
+        self.template_sum = 0.0
+        self.queries = 0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+
+    def as_dict(self):
+        return {**{name: getattr(self, name) for name in self.FIELDS}, "buckets": self.buckets}
+
+    def add(self, data):
+        for name in self.FIELDS:
+            setattr(self, name, getattr(self, name) + data[name])
+        self.buckets = [mine + theirs for mine, theirs in zip(self.buckets, data["buckets"])]
+
+
+class MetricsRegistry:
+    """
+    Per-process aggregates keyed by URL name (e.g. ``kitchen:dish-list``).
+
+    With ``METRICS_DIR`` set, each process also writes its aggregates to a
+    file of its own there every ``METRICS_WRITE_INTERVAL`` seconds and at
+    exit, and the rendered metrics add up every file, so a scrape reaching
+    any worker sees the whole host. Files of exited workers stay, keeping
+    the counters from going back.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = defaultdict(ViewStats)
+        self._pid = None
+        self._directory = None
+        self._path = None
+        self._written = time.monotonic()
+
+    def observe(self, view, duration, db_time, queries, template_time):
+        with self._lock:
+            stats = self._views[view]
+            stats.requests += 1
+            stats.duration_sum += duration
+            stats.db_sum += db_time
+            stats.template_sum += template_time
+            stats.queries += queries
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    stats.buckets[i] += 1
+            due = time.monotonic() - self._written >= getattr(
+                settings, "METRICS_WRITE_INTERVAL", 5
+            )
+        if due and getattr(settings, "METRICS_DIR", ""):
+            self.write()
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def _own_path(self, directory):
+        if self._pid is None:
+            atexit.register(self.write)
+        # A forked worker must not share its parent's file.
+        if (self._pid, self._directory) != (os.getpid(), directory):
+            self._pid, self._directory = os.getpid(), directory
+            self._path = os.path.join(directory, f"{self._pid}-{uuid.uuid4().hex}.json")
+        return self._path
+
+    def write(self):
+        directory = getattr(settings, "METRICS_DIR", "")
+        if not directory:
+            return
+        with self._lock:
+            data = {view: stats.as_dict() for view, stats in self._views.items()}
+            self._written = time.monotonic()
+            path = self._own_path(directory)
+        try:
+            with open(path + ".tmp", "w") as stream:
+                json.dump(data, stream)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            # Metrics never fail a request; the next write tries again.
+            pass
+
+    def collect(self):
+        """Return ``{view: ViewStats}`` summed over every process."""
+        views = defaultdict(ViewStats)
+        with self._lock:
+            for view, stats in self._views.items():
+                views[view].add(stats.as_dict())
+            own = self._path if self._pid == os.getpid() else None
+        directory = getattr(settings, "METRICS_DIR", "")
+        paths = glob.glob(os.path.join(directory, "*.json")) if directory else []
+        for path in paths:
+            if path == own:
+                continue
+            try:
+                with open(path) as stream:
+                    data = json.load(stream)
+            except (OSError, ValueError):
+                continue
+            for view, stats in data.items():
+                views[view].add(stats)
+        return views
+
+    def render_prometheus(self):
+        views = sorted(self.collect().items())
+        lines = [
+            "# HELP kitchen_request_duration_seconds Wall time per request.",
+            "# TYPE kitchen_request_duration_seconds histogram",
+        ]
+        for view, stats in views:
+            for bound, count in zip(DURATION_BUCKETS, stats.buckets):
+                lines.append(
+                    f'kitchen_request_duration_seconds_bucket{{view="{view}",le="{bound}"}} {count}'
+                )
+            lines.append(
+                f'kitchen_request_duration_seconds_bucket{{view="{view}",le="+Inf"}} {stats.requests}'
+            )
+            lines.append(
+                f'kitchen_request_duration_seconds_sum{{view="{view}"}} {stats.duration_sum:.6f}'
+            )
+            lines.append(
+                f'kitchen_request_duration_seconds_count{{view="{view}"}} {stats.requests}'
+            )
+        for name, attr, help_text in (
+            ("kitchen_request_db_seconds_total", "db_sum", "Time spent in SQL."),
+            (
+                "kitchen_request_template_seconds_total",
+                "template_sum",
+                "Time spent rendering templates.",
+            ),
+            ("kitchen_request_queries_total", "queries", "SQL queries executed."),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for view, stats in views:
+                value = getattr(stats, attr)
+                value = f"{value:.6f}" if isinstance(value, float) else value
+                lines.append(f'{name}{{view="{view}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += time.perf_counter() - start
+            self.count += 1
+
+
+class RequestMetricsMiddleware:
+    """
+    Record wall, SQL and template time plus the query count of each request,
+    add them as a ``Server-Timing`` header and aggregate them per URL name.
+    Enabled with the ``REQUEST_METRICS`` setting; list it first in
+    ``MIDDLEWARE`` so the timing covers the other middleware too.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "REQUEST_METRICS", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._metrics_template_time = 0.0
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else UNRESOLVED
+        template_time = request._metrics_template_time
+        registry.observe(view, duration, timer.elapsed, timer.count, template_time)
+        response["Server-Timing"] = ", ".join(
+            [
+                f'db;desc="{timer.count} queries";dur={timer.elapsed * 1000:.2f}',
+                f"tpl;dur={template_time * 1000:.2f}",
+                f"total;dur={duration * 1000:.2f}",
+            ]
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        # Called last among middleware, right before the response renders.
+        start = time.perf_counter()
+
+        def stop(rendered):
+            request._metrics_template_time += time.perf_counter() - start
+
+        response.add_post_render_callback(stop)
+        return response
+
+
+class MetricsView(generic.View):
+    """
+    The metrics in Prometheus text format, for staff sessions and for
+    scrapers sending ``Authorization: Bearer <METRICS_TOKEN>`` or connecting
+    from one of ``METRICS_ALLOWED_IPS``.
+    """
+
+    def allowed(self, request):
+        if request.user.is_staff:
+            return True
+        token = getattr(settings, "METRICS_TOKEN", "")
+        if token and constant_time_compare(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        ):
+            return True
+        return request.META.get("REMOTE_ADDR") in getattr(settings, "METRICS_ALLOWED_IPS", ())
+
+    def get(self, request, *args, **kwargs):
+        if not self.allowed(request):
+            raise PermissionDenied
+        return HttpResponse(
+            registry.render_prometheus(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+from kitchen.search import create_search_index, drop_search_index
+
+TABLES = [
+    ("kitchen_dish", "name"),
+    ("kitchen_dishtype", "name"),
+    ("kitchen_ingredient", "name"),
+]
+
+
+def forwards(apps, schema_editor):
+    for table, column in TABLES:
+        create_search_index(schema_editor, table, column)
+
+
+def backwards(apps, schema_editor):
+    for table, column in TABLES:
+        drop_search_index(schema_editor, table, column)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitchen', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
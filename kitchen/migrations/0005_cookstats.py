@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate(apps, schema_editor):
+    Cook = apps.get_model(settings.AUTH_USER_MODEL)
+    CookStats = apps.get_model('kitchen', 'CookStats')
+    cooks = Cook.objects.annotate(
+        dish_count=Count('dishes'),
+        dish_type_count=Count('dishes__dish_type', distinct=True),
+        menu_value=Sum('dishes__price'),
+    ).values_list('pk', 'dish_count', 'dish_type_count', 'menu_value')
+    CookStats.objects.bulk_create(
+        [
+            CookStats(
+                cook_id=pk,
+                dish_count=dish_count,
+                dish_type_count=dish_type_count,
+                menu_value=menu_value or 0,
+            )
+            for pk, dish_count, dish_type_count, menu_value in cooks
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitchen', '0004_modelversion_updated_at'),
+        ('users', '0003_cook_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CookStats',
+            fields=[
+                ('cook', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('dish_count', models.PositiveIntegerField(default=0)),
+                ('dish_type_count', models.PositiveIntegerField(default=0)),
+                ('menu_value', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'verbose_name_plural': 'cook stats',
+                'indexes': [models.Index(fields=['dish_count'], name='kitchen_coo_dish_co_6c1c25_idx'), models.Index(fields=['dish_type_count'], name='kitchen_coo_dish_ty_b2690e_idx'), models.Index(fields=['menu_value'], name='kitchen_coo_menu_va_993512_idx')],
+            },
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
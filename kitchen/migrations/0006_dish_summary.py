@@ -0,0 +1,54 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:18
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate(apps, schema_editor):
+    Dish = apps.get_model('kitchen', 'Dish')
+    DishType = apps.get_model('kitchen', 'DishType')
+
+    def link_count(through):
+        links = (
+            through.objects.filter(dish_id=OuterRef('pk'))
+            .order_by()
+            .values('dish_id')
+            .annotate(count=Count('pk'))
+            .values('count')
+        )
+        return Coalesce(Subquery(links), 0)
+
+    Dish.objects.update(
+        dish_type_name=Subquery(
+            DishType.objects.filter(pk=OuterRef('dish_type_id')).values('name')[:1]
+        ),
+        ingredient_count=link_count(Dish.ingredients.through),
+        cook_count=link_count(Dish.cooks.through),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitchen', '0005_cookstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dish',
+            name='cook_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='dish',
+            name='dish_type_name',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='dish',
+            name='ingredient_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitchen', '0006_dish_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dish',
+            index=models.Index(fields=['dish_type', 'price'], name='kitchen_dish_type_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dish',
+            index=models.Index(fields=['dish_type', 'name'], name='kitchen_dish_type_name_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitchen', '0007_dish_facet_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(blank=True, max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Ticket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('assigned', 'Assigned'), ('cooking', 'Cooking'), ('done', 'Done'), ('cancelled', 'Cancelled')], default='queued', max_length=10)),
+                ('priority', models.SmallIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('cook', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tickets', to=settings.AUTH_USER_MODEL)),
+                ('dish', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tickets', to='kitchen.dish')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tickets', to='kitchen.order')),
+            ],
+            options={
+                'ordering': ['-priority', 'pk'],
+                'indexes': [models.Index(condition=models.Q(('status__in', ['queued', 'assigned', 'cooking'])), fields=['status', 'cook'], name='kitchen_ticket_active_idx')],
+            },
+        ),
+    ]
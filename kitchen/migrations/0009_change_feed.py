@@ -0,0 +1,64 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:44
+
+from itertools import count
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate(apps, schema_editor):
+    # Start the feed with one entry per existing object and link, so a
+    # client syncing from 0 gets the whole menu.
+    Change = apps.get_model('kitchen', 'Change')
+    Dish = apps.get_model('kitchen', 'Dish')
+    sources = [
+        ('dishtype', apps.get_model('kitchen', 'DishType').objects.values_list('pk', flat=True)),
+        ('ingredient', apps.get_model('kitchen', 'Ingredient').objects.values_list('pk', flat=True)),
+        ('cook', apps.get_model(settings.AUTH_USER_MODEL).objects.values_list('pk', flat=True)),
+        ('dish', Dish.objects.values_list('pk', flat=True)),
+    ]
+    seq = count(1)
+    for kind, pks in sources:
+        entries = (
+            Change(seq=next(seq), kind=kind, action='upsert', object_id=pk)
+            for pk in pks.order_by('pk').iterator()
+        )
+        Change.objects.bulk_create(entries, batch_size=1000)
+    for kind, through, column in (
+        ('dish_cooks', Dish.cooks.through, 'cook_id'),
+        ('dish_ingredients', Dish.ingredients.through, 'ingredient_id'),
+    ):
+        links = through.objects.order_by('pk').values_list('dish_id', column).iterator()
+        entries = (
+            Change(seq=next(seq), kind=kind, action='add', object_id=dish_id, related_id=related_id)
+            for dish_id, related_id in links
+        )
+        Change.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitchen', '0008_orders_tickets'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('seq', models.BigIntegerField(null=True, unique=True)),
+                ('kind', models.CharField(max_length=20)),
+                ('action', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete'), ('add', 'Add'), ('remove', 'Remove')], max_length=6)),
+                ('object_id', models.BigIntegerField()),
+                ('related_id', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['seq'],
+                'indexes': [models.Index(fields=['kind', 'object_id', 'related_id', 'id'], name='kitchen_cha_kind_4cae90_idx')],
+            },
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
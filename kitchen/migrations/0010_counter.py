@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-18 20:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate(apps, schema_editor):
+    # Start every dashboard total from the rows already there.
+    Counter = apps.get_model('kitchen', 'Counter')
+    counted = {
+        'num_cooks': apps.get_model(settings.AUTH_USER_MODEL),
+        'num_dishes': apps.get_model('kitchen', 'Dish'),
+        'num_types': apps.get_model('kitchen', 'DishType'),
+        'num_ingredients': apps.get_model('kitchen', 'Ingredient'),
+    }
+    Counter.objects.bulk_create(
+        Counter(name=name, value=model.objects.count()) for name, model in counted.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitchen', '0009_change_feed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-18 20:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kitchen', '0010_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionVisits',
+            fields=[
+                ('session_key', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('expire_date', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name_plural': 'session visits',
+            },
+        ),
+    ]
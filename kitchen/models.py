@@ -6,6 +6,7 @@ from django.conf import settings
 
 class DishType(models.Model):
     name = models.CharField(max_length=255, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["name"]
@@ -16,6 +17,7 @@ class DishType(models.Model):
 
 class Ingredient(models.Model):
     name = models.CharField(max_length=255, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["name"]
@@ -33,12 +35,165 @@ class Dish(models.Model):
     )
     cooks = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name="dishes")
     ingredients = models.ManyToManyField(Ingredient, related_name="dishes", blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Copies kept current by kitchen.dish_summary so lists read one table.
+    dish_type_name = models.CharField(max_length=255, blank=True, editable=False)
+    ingredient_count = models.PositiveIntegerField(default=0, editable=False)
+    cook_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ["name"]
+        indexes = [
+            # Facet filters narrow by type first, then by price band or name.
+            models.Index(fields=["dish_type", "price"], name="kitchen_dish_type_price_idx"),
+            models.Index(fields=["dish_type", "name"], name="kitchen_dish_type_name_idx"),
+        ]
 
     def __str__(self):
         return self.name
 
     def get_absolute_url(self):
         return reverse("kitchen:dish-detail", kwargs={"pk": self.pk})
+
+
+class ModelVersion(models.Model):
+    label = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.label} v{self.version}"
+
+
+class Counter(models.Model):
+    """A dashboard total kept current by kitchen.counters."""
+
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+class SessionVisits(models.Model):
+    """Home page visits of a session, added in batches by kitchen.visits."""
+
+    session_key = models.CharField(max_length=40, primary_key=True)
+    count = models.PositiveBigIntegerField(default=0)
+    expire_date = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name_plural = "session visits"
+
+    def __str__(self):
+        return f"{self.session_key}: {self.count}"
+
+
+class CookStats(models.Model):
+    cook = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+    )
+    dish_count = models.PositiveIntegerField(default=0)
+    dish_type_count = models.PositiveIntegerField(default=0)
+    menu_value = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = "cook stats"
+        indexes = [
+            models.Index(fields=["dish_count"]),
+            models.Index(fields=["dish_type_count"]),
+            models.Index(fields=["menu_value"]),
+        ]
+
+    def __str__(self):
+        return f"{self.cook_id}: {self.dish_count} dishes"
+
+
+class Order(models.Model):
+    table = models.CharField(max_length=50, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Order {self.pk} ({self.table})" if self.table else f"Order {self.pk}"
+
+
+class Ticket(models.Model):
+    """One dish of an order, queued for or cooked by one of the dish's cooks."""
+
+    class Status(models.TextChoices):
+        QUEUED = "queued"
+        ASSIGNED = "assigned"
+        COOKING = "cooking"
+        DONE = "done"
+        CANCELLED = "cancelled"
+
+    ACTIVE = (Status.QUEUED, Status.ASSIGNED, Status.COOKING)
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="tickets")
+    dish = models.ForeignKey(Dish, on_delete=models.CASCADE, related_name="tickets")
+    cook = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="tickets",
+    )
+    status = models.CharField(max_length=10, choices=Status, default=Status.QUEUED)
+    # Higher numbers are served first.
+    priority = models.SmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-priority", "pk"]
+        indexes = [
+            # The scheduler loads only open tickets; finished ones pile up.
+            models.Index(
+                fields=["status", "cook"],
+                name="kitchen_ticket_active_idx",
+                condition=models.Q(status__in=["queued", "assigned", "cooking"]),
+            ),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.dish} ({self.status})"
+
+
+class Change(models.Model):
+    """
+    One entry of the change feed read by delta sync clients. ``seq`` only
+    grows and is given once the entry committed, so it is empty meanwhile;
+    ``related_id`` is the cook or ingredient of a link entry and 0
+    otherwise.
+    """
+
+    class Action(models.TextChoices):
+        UPSERT = "upsert"
+        DELETE = "delete"
+        ADD = "add"
+        REMOVE = "remove"
+
+    id = models.BigAutoField(primary_key=True)
+    seq = models.BigIntegerField(null=True, unique=True)
+    kind = models.CharField(max_length=20)
+    action = models.CharField(max_length=6, choices=Action)
+    object_id = models.BigIntegerField()
+    related_id = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["seq"]
+        indexes = [
+            # Compaction looks for later entries about the same object.
+            models.Index(fields=["kind", "object_id", "related_id", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.seq}: {self.action} {self.kind} {self.object_id}"
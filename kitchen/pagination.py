@@ -0,0 +1,164 @@
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.http import QueryDict
+
+CURSOR_PARAM = "cursor"
+CURSOR_SALT = "kitchen.pagination.cursor"
+
+
+def encode_cursor(values, direction):
+    values = [v if isinstance(v, (int, str)) else str(v) for v in values]
+    return signing.dumps({"v": values, "d": direction}, salt=CURSOR_SALT)
+
+
+def decode_cursor(token):
+    try:
+        payload = signing.loads(token, salt=CURSOR_SALT)
+        return payload["v"], payload["d"]
+    except (signing.BadSignature, KeyError, TypeError):
+        return None, None
+
+
+def keyset_filter(fields, values, direction):
+    lookup = "gt" if direction == "next" else "lt"
+    condition = Q()
+    for i, field in enumerate(fields):
+        step = Q(**{f"{field}__{lookup}": values[i]})
+        for prev_field, prev_value in zip(fields[:i], values[:i]):
+            step &= Q(**{prev_field: prev_value})
+        condition |= step
+    return condition
+
+
+class KeysetPage:
+    is_keyset = True
+
+    def __init__(self, object_list, next_cursor, previous_cursor, params):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self._params = params if params is not None else QueryDict()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def _querystring(self, cursor):
+        params = self._params.copy()
+        params[CURSOR_PARAM] = cursor
+        params.pop("page", None)
+        return params.urlencode()
+
+    @property
+    def next_querystring(self):
+        return self._querystring(self.next_cursor)
+
+    @property
+    def previous_querystring(self):
+        return self._querystring(self.previous_cursor)
+
+
+def _keyset_query(queryset, fields, page_size, token):
+    values, direction = decode_cursor(token) if token else (None, None)
+    if len(values or ()) != len(fields):
+        values, direction = None, "next"
+
+    if direction == "prev":
+        queryset = queryset.filter(keyset_filter(fields, values, "prev"))
+        queryset = queryset.order_by(*[f"-{field}" for field in fields])
+    else:
+        if values is not None:
+            queryset = queryset.filter(keyset_filter(fields, values, "next"))
+        queryset = queryset.order_by(*fields)
+    return queryset[: page_size + 1], values, direction
+
+
+def paginate_keyset(queryset, fields, page_size, token=None, params=None):
+    queryset, values, direction = _keyset_query(queryset, fields, page_size, token)
+    rows = list(queryset)
+    return _keyset_page(rows, fields, page_size, values, direction, params)
+
+
+async def apaginate_keyset(queryset, fields, page_size, token=None, params=None):
+    """``paginate_keyset`` for async views."""
+    queryset, values, direction = _keyset_query(queryset, fields, page_size, token)
+    rows = [row async for row in queryset]
+    return _keyset_page(rows, fields, page_size, values, direction, params)
+
+
+def _keyset_page(rows, fields, page_size, values, direction, params):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == "prev":
+        rows.reverse()
+
+    def key(obj):
+        if isinstance(obj, dict):
+            return [obj[field] for field in fields]
+        return [getattr(obj, field) for field in fields]
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if direction == "prev":
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        if has_next:
+            next_cursor = encode_cursor(key(rows[-1]), "next")
+        if has_previous:
+            previous_cursor = encode_cursor(key(rows[0]), "prev")
+    return KeysetPage(rows, next_cursor, previous_cursor, params)
+
+
+class KeysetPaginationMixin:
+    """
+    Cursor based pagination for ListView and AsyncListView, enabled per
+    view with ``keyset_pagination = True``, project wide with the
+    ``KEYSET_PAGINATION`` setting or per request by passing ``?cursor=``.
+    """
+
+    keyset_pagination = None
+    keyset_fields = ("name", "pk")
+
+    def use_keyset_pagination(self):
+        if CURSOR_PARAM in self.request.GET:
+            return True
+        if self.keyset_pagination is not None:
+            return self.keyset_pagination
+        return getattr(settings, "KEYSET_PAGINATION", False)
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_keyset_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        page = paginate_keyset(
+            queryset,
+            self.keyset_fields,
+            page_size,
+            token=self.request.GET.get(CURSOR_PARAM),
+            params=self.request.GET,
+        )
+        return None, page, page.object_list, page.has_other_pages()
+
+    async def apaginate_queryset(self, queryset, page_size):
+        if not self.use_keyset_pagination():
+            return await super().apaginate_queryset(queryset, page_size)
+        page = await apaginate_keyset(
+            queryset,
+            self.keyset_fields,
+            page_size,
+            token=self.request.GET.get(CURSOR_PARAM),
+            params=self.request.GET,
+        )
+        return None, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,182 @@
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, F, FloatField, Func, IntegerField, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+# (table, column) pairs covered by a trigram / full-text index.
+SEARCH_INDEXES = [
+    ("kitchen_dish", "name"),
+    ("kitchen_dishtype", "name"),
+    ("kitchen_ingredient", "name"),
+    ("users_cook", "username"),
+]
+
+# The trigram tokenizer cannot match terms shorter than one trigram.
+MIN_TRIGRAM_LENGTH = 3
+
+
+def _sqlite_has_trigram(connection):
+    return connection.Database.sqlite_version_info >= (3, 34, 0)
+
+
+def _postgres_index_name(table, column):
+    return f"{table}_{column}_trgm"
+
+
+def _fts_table(table):
+    return f"{table}_fts"
+
+
+def _sqlite_trigger_sql(table, column):
+    fts = _fts_table(table)
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) "
+        f"VALUES ('delete', old.id, old.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) "
+        f"VALUES ('delete', old.id, old.{column}); "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+    ]
+
+
+def create_search_index(schema_editor, table, column):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {_postgres_index_name(table, column)} "
+            f"ON {table} USING gin (UPPER({column}) gin_trgm_ops)"
+        )
+    elif vendor == "sqlite" and _sqlite_has_trigram(schema_editor.connection):
+        fts = _fts_table(table)
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{column}, content='{table}', content_rowid='id', tokenize='trigram')"
+        )
+        for sql in _sqlite_trigger_sql(table, column):
+            schema_editor.execute(sql)
+        schema_editor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def drop_search_index(schema_editor, table, column):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            f"DROP INDEX IF EXISTS {_postgres_index_name(table, column)}"
+        )
+    elif vendor == "sqlite":
+        fts = _fts_table(table)
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {fts}")
+
+
+def repair_sqlite_search_indexes(using="default", **kwargs):
+    """
+    SQLite drops a table's triggers when a migration rebuilds the table,
+    so reinstall any missing ones after migrate and resync the index.
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite" or not _sqlite_has_trigram(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master")
+        existing = {row[0] for row in cursor.fetchall()}
+        for table, column in SEARCH_INDEXES:
+            fts = _fts_table(table)
+            if fts not in existing or f"{fts}_ai" in existing:
+                continue
+            for sql in _sqlite_trigger_sql(table, column):
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def match_rank(field, term):
+    return Case(
+        When(**{f"{field}__iexact": term}, then=Value(0)),
+        When(**{f"{field}__istartswith": term}, then=Value(1)),
+        default=Value(2),
+        output_field=IntegerField(),
+    )
+
+
+class SearchBackend:
+    """Substring search that works on every database."""
+
+    def filter(self, queryset, field, term):
+        return queryset.filter(**{f"{field}__icontains": term})
+
+    def rank(self, queryset, field, term):
+        return queryset.annotate(search_rank=match_rank(field, term)).order_by(
+            "search_rank", field
+        )
+
+    def search(self, queryset, field, term):
+        return self.rank(self.filter(queryset, field, term), field, term)
+
+
+class PostgresTrigramSearchBackend(SearchBackend):
+    """
+    ``icontains`` compiles to ``UPPER(col) LIKE UPPER(%term%)`` which the
+    ``gin_trgm_ops`` index on ``UPPER(col)`` serves directly.
+    """
+
+    def rank(self, queryset, field, term):
+        similarity = Func(
+            F(field), Value(term), function="SIMILARITY", output_field=FloatField()
+        )
+        return queryset.annotate(
+            search_rank=match_rank(field, term), similarity=similarity
+        ).order_by("search_rank", "-similarity", field)
+
+
+class SQLiteFTSSearchBackend(SearchBackend):
+    def filter(self, queryset, field, term):
+        if len(term) < MIN_TRIGRAM_LENGTH:
+            return super().filter(queryset, field, term)
+        fts = _fts_table(queryset.model._meta.db_table)
+        phrase = '"{}"'.format(term.replace('"', '""'))
+        return queryset.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s", (phrase,))
+        )
+
+
+VENDOR_BACKENDS = {
+    "postgresql": PostgresTrigramSearchBackend,
+    "sqlite": SQLiteFTSSearchBackend,
+}
+
+
+def get_search_backend(using="default"):
+    backend_path = getattr(settings, "SEARCH_BACKEND", None)
+    if backend_path:
+        return import_string(backend_path)()
+    connection = connections[using]
+    if connection.vendor == "sqlite" and not _sqlite_has_trigram(connection):
+        return SearchBackend()
+    return VENDOR_BACKENDS.get(connection.vendor, SearchBackend)()
+
+
+class SearchFormMixin:
+    """
+    Search form whose ``search_field`` is matched against a queryset with
+    the configured search backend.
+    """
+
+    search_field = "name"
+
+    def search(self, queryset, rank=True):
+        """Filter on the search term, ordering by relevance unless ``rank`` is False."""
+        if not self.is_valid():
+            return queryset
+        term = self.cleaned_data.get(self.search_field)
+        if not term:
+            return queryset
+        backend = get_search_backend(queryset.db)
+        if not rank:
+            return backend.filter(queryset, self.search_field, term)
+        return backend.search(queryset, self.search_field, term)
@@ -0,0 +1,138 @@
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+
+from . import (
+    auth,
+    changes,
+    cook_stats,
+    counters,
+    dish_summary,
+    events,
+    ingredient_index,
+    tickets,
+    versioning,
+    visits,
+)
+from .models import Dish, DishType, Ingredient, Ticket
+
+COUNTED_SENDERS = (
+    "kitchen.Dish",
+    "kitchen.DishType",
+    "kitchen.Ingredient",
+    settings.AUTH_USER_MODEL,
+)
+VERSIONED_SENDERS = COUNTED_SENDERS
+
+
+def _increment_on_commit(model, delta):
+    name = counters.counter_name(model)
+    if name:
+        transaction.on_commit(partial(counters.increment, name, delta))
+
+
+def count_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        _increment_on_commit(sender, 1)
+
+
+def count_deleted(sender, instance, **kwargs):
+    _increment_on_commit(sender, -1)
+
+
+for label in COUNTED_SENDERS:
+    post_save.connect(count_created, sender=label, dispatch_uid=f"counters-save-{label}")
+    post_delete.connect(
+        count_deleted, sender=label, dispatch_uid=f"counters-delete-{label}"
+    )
+
+
+def bump_version(sender, update_fields=None, raw=False, **kwargs):
+    if raw or update_fields == frozenset({"last_login"}):
+        return
+    versioning.bump(sender._meta.label)
+
+
+def bump_dish_version(sender, action, **kwargs):
+    if action.startswith("post_"):
+        versioning.bump(Dish._meta.label)
+
+
+for label in VERSIONED_SENDERS:
+    post_save.connect(bump_version, sender=label, dispatch_uid=f"version-save-{label}")
+    post_delete.connect(
+        bump_version, sender=label, dispatch_uid=f"version-delete-{label}"
+    )
+
+for through in (Dish.cooks.through, Dish.ingredients.through):
+    m2m_changed.connect(bump_dish_version, sender=through)
+
+m2m_changed.connect(ingredient_index.update_links, sender=Dish.ingredients.through)
+post_save.connect(ingredient_index.dish_saved, sender=Dish)
+pre_delete.connect(ingredient_index.dish_deleting, sender=Dish)
+post_delete.connect(ingredient_index.dish_deleted, sender=Dish)
+post_delete.connect(ingredient_index.ingredient_deleted, sender=Ingredient)
+
+m2m_changed.connect(cook_stats.cooks_changed, sender=Dish.cooks.through)
+post_save.connect(cook_stats.dish_saved, sender=Dish, dispatch_uid="cook-stats-dish-save")
+pre_delete.connect(cook_stats.dish_deleting, sender=Dish)
+post_delete.connect(cook_stats.dish_deleted, sender=Dish, dispatch_uid="cook-stats-dish-delete")
+post_save.connect(
+    cook_stats.cook_created,
+    sender=settings.AUTH_USER_MODEL,
+    dispatch_uid="cook-stats-cook-save",
+)
+
+post_save.connect(dish_summary.dish_saved, sender=Dish, dispatch_uid="summary-dish-save")
+post_save.connect(dish_summary.dish_type_saved, sender=DishType)
+for through in (Dish.cooks.through, Dish.ingredients.through):
+    m2m_changed.connect(dish_summary.links_changed, sender=through)
+for label in ("kitchen.Ingredient", settings.AUTH_USER_MODEL):
+    pre_delete.connect(
+        dish_summary.linked_deleting, sender=label, dispatch_uid=f"summary-deleting-{label}"
+    )
+    post_delete.connect(
+        dish_summary.linked_deleted, sender=label, dispatch_uid=f"summary-deleted-{label}"
+    )
+
+# The ticket scheduler reloads when cooks, dishes or tickets change outside it.
+m2m_changed.connect(tickets.cooks_changed, sender=Dish.cooks.through)
+for label in ("kitchen.Dish", "kitchen.Order", settings.AUTH_USER_MODEL):
+    post_delete.connect(tickets.changed, sender=label, dispatch_uid=f"tickets-deleted-{label}")
+post_save.connect(tickets.changed, sender=Ticket, dispatch_uid="tickets-ticket-save")
+post_delete.connect(tickets.changed, sender=Ticket, dispatch_uid="tickets-ticket-delete")
+post_save.connect(bump_version, sender=Ticket, dispatch_uid="version-save-kitchen.Ticket")
+post_delete.connect(bump_version, sender=Ticket, dispatch_uid="version-delete-kitchen.Ticket")
+
+for label in events.KIND_LABELS.values():
+    post_save.connect(events.model_saved, sender=label, dispatch_uid=f"events-save-{label}")
+    post_delete.connect(
+        events.model_deleted, sender=label, dispatch_uid=f"events-delete-{label}"
+    )
+m2m_changed.connect(events.cooks_changed, sender=Dish.cooks.through)
+m2m_changed.connect(events.ingredients_changed, sender=Dish.ingredients.through)
+
+user_logged_out.connect(visits.session_ended, dispatch_uid="visits-logout")
+
+post_save.connect(
+    auth.cook_changed, sender=settings.AUTH_USER_MODEL, dispatch_uid="auth-cook-save"
+)
+post_delete.connect(
+    auth.cook_changed, sender=settings.AUTH_USER_MODEL, dispatch_uid="auth-cook-delete"
+)
+
+for label in changes.KIND_LABELS.values():
+    post_save.connect(changes.model_saved, sender=label, dispatch_uid=f"changes-save-{label}")
+    post_delete.connect(
+        changes.model_deleted, sender=label, dispatch_uid=f"changes-delete-{label}"
+    )
+for kind in changes.LINK_KINDS:
+    m2m_changed.connect(
+        partial(changes.links_changed, kind),
+        sender=getattr(Dish, kind.split("_", 1)[1]).through,
+        weak=False,
+        dispatch_uid=f"changes-links-{kind}",
+    )
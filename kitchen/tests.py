@@ -1,10 +1,83 @@
+import asyncio
+import gzip
+import json
 import pytest
-from django.urls import reverse
-from kitchen.models import DishType, Dish, Ingredient
-from kitchen.forms import DishForm
+import time
+from datetime import timedelta
+from io import StringIO
+from django.core.management import CommandError, call_command
+from django.apps import apps
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.signals import request_started
+from django.db import connection, connections, transaction
+from django.db.models import F, Max
+from django.db.models.signals import post_delete, pre_delete
+from django.db.utils import ConnectionHandler
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from kitchen import (
+    auth,
+    autocomplete,
+    bulk_actions,
+    changes,
+    cook_stats,
+    counters,
+    dish_summary,
+    events,
+    ingredient_index,
+    metrics,
+    tickets,
+    versioning,
+    visits,
+)
+from django.templatetags.static import static
+from django.test import AsyncClient, Client, RequestFactory
+from kitchen.exports import ExportView
+from kitchen.checks import check_static_references, find_unhashed_static_references
+from kitchen.benchmark import (
+    ASYNC_URLS,
+    benchmark_tickets,
+    collect_urls,
+    run_benchmarks,
+    run_concurrency_benchmarks,
+    seed_dataset,
+)
+from kitchen.models import (
+    Change,
+    CookStats,
+    Counter,
+    DishType,
+    Dish,
+    Ingredient,
+    ModelVersion,
+    Order,
+    SessionVisits,
+    Ticket,
+)
+from kitchen.facets import count_facets
+from kitchen.forms import DishForm, DishSearchForm
+from kitchen_service.settings.database import postgres_from_env
 from users.models import Cook
 
 
+def assert_query_budget(client, url, budget, grow=None, data=None):
+    """
+    Request ``url`` and fail if it runs more than ``budget`` queries, then
+    call ``grow`` to add rows and check the same budget still holds.
+    """
+    for step in range(2 if grow else 1):
+        if step:
+            grow()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, data)
+        assert response.status_code == 200
+        assert len(queries) <= budget, (
+            f"{url} ran {len(queries)} queries, budget is {budget}:\n"
+            + "\n".join(query["sql"] for query in queries.captured_queries)
+        )
+
+
 @pytest.mark.django_db
 def test_dish_type_str():
     dish_type = DishType.objects.create(name="Salad")
@@ -61,6 +134,14 @@ def test_index_view(client):
     assert "num_dishes" in response.context
 
 
+def bump_elsewhere(label):
+    """Advance ``label`` as another process would, unseen by local_bumps."""
+    if not ModelVersion.objects.filter(label=label).update(
+        version=F("version") + 1, updated_at=timezone.now()
+    ):
+        ModelVersion.objects.create(label=label, version=1)
+
+
 @pytest.mark.django_db
 def test_dish_list_view(client):
     cook = Cook.objects.create_user(username="chef", password="test12345")
@@ -153,3 +234,1591 @@ def test_ingredient_list_view_with_search(client):
     ingredients = response.context["ingredient_list"]
     assert len(ingredients) == 1
     assert ingredients[0].name == "Tomato"
+
+
+@pytest.mark.django_db
+def test_dish_list_view_keyset_pagination(client):
+    Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    dish_type = DishType.objects.create(name="Pizza")
+    names = [f"Dish {i:02d}" for i in range(12)]
+    for name in names:
+        Dish.objects.create(name=name, description="", price=5, dish_type=dish_type)
+
+    url = reverse("kitchen:dish-list")
+    response = client.get(url, {"cursor": ""})
+    page = response.context["page_obj"]
+    assert [dish.name for dish in page] == names[:5]
+    assert not page.has_previous()
+
+    response = client.get(url, {"cursor": page.next_cursor})
+    page = response.context["page_obj"]
+    assert [dish.name for dish in page] == names[5:10]
+
+    response = client.get(url, {"cursor": page.next_cursor})
+    last_page = response.context["page_obj"]
+    assert [dish.name for dish in last_page] == names[10:]
+    assert not last_page.has_next()
+
+    response = client.get(url, {"cursor": last_page.previous_cursor})
+    assert [dish.name for dish in response.context["page_obj"]] == names[5:10]
+
+
+@pytest.mark.django_db
+def test_keyset_pagination_keeps_search_and_ignores_bad_cursor(client):
+    Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    for i in range(7):
+        DishType.objects.create(name=f"Soup {i}")
+    DishType.objects.create(name="Salad")
+
+    url = reverse("kitchen:dishtype-list")
+    response = client.get(url, {"cursor": "garbage", "name": "Soup"})
+    page = response.context["page_obj"]
+    assert len(page) == 5
+    assert "name=Soup" in page.next_querystring
+    assert "Page 1 of" not in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_dish_search_ranks_exact_and_prefix_matches_first(client):
+    Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    dish_type = DishType.objects.create(name="Soup")
+    for name in ["Tomato Soup", "Cold soup", "Soup", "Salad"]:
+        Dish.objects.create(name=name, description="", price=5, dish_type=dish_type)
+
+    response = client.get(reverse("kitchen:dish-list"), {"name": "soup"})
+    names = [dish.name for dish in response.context["dish_list"]]
+    assert names == ["Soup", "Cold soup", "Tomato Soup"]
+
+
+@pytest.mark.django_db
+def test_search_index_follows_updates_and_deletes():
+    dish_type = DishType.objects.create(name="Soup")
+    dish = Dish.objects.create(name="Borscht", description="", price=5, dish_type=dish_type)
+    dish.name = "Okroshka"
+    dish.save()
+
+    assert list(DishSearchForm({"name": "rosh"}).search(Dish.objects.all())) == [dish]
+    assert not DishSearchForm({"name": "orsch"}).search(Dish.objects.all()).exists()
+
+    dish.delete()
+    assert not DishSearchForm({"name": "rosh"}).search(Dish.objects.all()).exists()
+
+
+@pytest.mark.django_db
+def test_index_counters_are_stored_and_updated_by_signals(
+    client, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    Counter.objects.all().delete()
+    Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    client.get(reverse("kitchen:index"))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        DishType.objects.create(name="Soup")
+        Ingredient.objects.create(name="Beet").delete()
+
+    with django_assert_num_queries(1):
+        counts = counters.get_counts()
+    assert counts == {"num_cooks": 1, "num_dishes": 0, "num_types": 1, "num_ingredients": 0}
+
+    response = client.get(reverse("kitchen:index"))
+    assert response.context["num_types"] == 1
+
+
+@pytest.mark.django_db
+def test_reconcile_counters_command_fixes_drift():
+    Counter.objects.all().delete()
+    DishType.objects.create(name="Soup")
+    counters.get_counts()
+    DishType.objects.bulk_create([DishType(name="Salad")])
+    assert counters.get_counts()["num_types"] == 1
+
+    out = StringIO()
+    call_command("reconcile_counters", stdout=out)
+    assert "num_types: 1 -> 2" in out.getvalue()
+    assert counters.get_counts()["num_types"] == 2
+
+
+@pytest.mark.django_db
+def test_index_view_buffers_visits_without_saving_session(client, settings):
+    settings.VISIT_COUNTER = "buffered"
+    Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    buffer = visits.get_buffer()
+    buffer.flush()
+    url = reverse("kitchen:index")
+
+    response = client.get(url)
+    assert response.context["num_visits"] == 1
+    response = client.get(url)
+    assert response.context["num_visits"] == 2
+    assert "sessionid" not in response.cookies
+
+    # Data the session gained meanwhile survives the flush untouched.
+    session = client.session
+    session["cart"] = [1]
+    session.save()
+    buffer.flush()
+    session = client.session
+    assert session["cart"] == [1] and "num_visits" not in session
+    key = session.session_key
+    assert SessionVisits.objects.get(session_key=key).count == 2
+    response = client.get(url)
+    assert response.context["num_visits"] == 3
+
+    client.logout()
+    SessionVisits.objects.create(
+        session_key="gone", count=1, expire_date=timezone.now() - timedelta(days=1)
+    )
+    buffer.flush()
+    assert not SessionVisits.objects.filter(session_key__in=[key, "gone"]).exists()
+
+
+@pytest.mark.django_db
+def test_index_view_session_visit_counter(client, settings):
+    settings.VISIT_COUNTER = "session"
+    Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    url = reverse("kitchen:index")
+
+    client.get(url)
+    response = client.get(url)
+    assert response.context["num_visits"] == 2
+    assert client.session["num_visits"] == 2
+
+
+@pytest.mark.django_db
+def test_dish_api_list_selects_fields_and_pages_by_cursor(client, django_assert_num_queries):
+    cook = Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    dish_type = DishType.objects.create(name="Soup")
+    beet = Ingredient.objects.create(name="Beet")
+    for i in range(3):
+        dish = Dish.objects.create(name=f"Soup {i}", description="", price=5, dish_type=dish_type)
+        dish.cooks.add(cook)
+        dish.ingredients.add(beet)
+
+    url = reverse("kitchen:api-dish-list")
+    response = client.get(url, {"fields": "name,price", "limit": 2})
+    data = response.json()
+    assert data["results"] == [
+        {"name": "Soup 0", "price": "5.00"},
+        {"name": "Soup 1", "price": "5.00"},
+    ]
+    assert data["previous"] is None
+
+    # Session, page, ingredients and cooks; the user comes from the cache.
+    with django_assert_num_queries(4):
+        response = client.get(url, {"limit": 2, "cursor": data["next"]})
+    data = response.json()
+    assert data["next"] is None
+    assert data["results"] == [
+        {
+            "id": dish.id,
+            "name": "Soup 2",
+            "description": "",
+            "price": "5.00",
+            "dish_type": {"id": dish_type.id, "name": "Soup"},
+            "ingredients": [{"id": beet.id, "name": "Beet"}],
+            "cooks": [{"id": cook.id, "username": "chef", "first_name": "", "last_name": ""}],
+        }
+    ]
+
+
+@pytest.mark.django_db
+def test_dish_api_rejects_unknown_fields_and_anonymous_users(client):
+    assert client.get(reverse("kitchen:api-dish-list")).status_code == 403
+
+    Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    response = client.get(reverse("kitchen:api-dish-list"), {"fields": "name,secret"})
+    assert response.status_code == 400
+    assert client.get(reverse("kitchen:api-dish-detail", args=[999])).status_code == 404
+
+
+@pytest.mark.django_db
+def test_dish_detail_view_answers_conditional_requests(
+    client, django_assert_max_num_queries, django_capture_on_commit_callbacks
+):
+    Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    with django_capture_on_commit_callbacks(execute=True):
+        dish_type = DishType.objects.create(name="Soup")
+        dish = Dish.objects.create(name="Borscht", description="", price=5, dish_type=dish_type)
+    url = reverse("kitchen:dish-detail", args=[dish.pk])
+
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response["ETag"]
+    assert response["Last-Modified"]
+
+    with django_assert_max_num_queries(3):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+    with django_capture_on_commit_callbacks(execute=True):
+        dish.ingredients.add(Ingredient.objects.create(name="Beet"))
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+@pytest.mark.django_db
+def test_versions_are_bumped_once_per_transaction_after_commit(
+    django_capture_on_commit_callbacks,
+):
+    def version():
+        return versioning.get_versions(["kitchen.DishType"])["kitchen.DishType"][0]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        with transaction.atomic():
+            DishType.objects.create(name="Gone")
+            transaction.set_rollback(True)
+        DishType.objects.create(name="Soup")
+        DishType.objects.create(name="Salad")
+        assert version() == 0
+    assert version() == 1
+
+
+@pytest.mark.django_db
+def test_dish_list_etag_depends_on_query_and_user(client):
+    Cook.objects.create_user(username="chef", password="test12345")
+    Cook.objects.create_user(username="sous", password="test12345")
+    client.login(username="chef", password="test12345")
+    url = reverse("kitchen:dish-list")
+    etag = client.get(url)["ETag"]
+
+    assert client.get(url, {"name": "soup"}, HTTP_IF_NONE_MATCH=etag).status_code == 200
+    client.login(username="sous", password="test12345")
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.django_db
+def test_pending_messages_and_new_csrf_secret_skip_not_modified(client):
+    Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    url = reverse("kitchen:dish-list")
+    etag = client.get(url)["ETag"]
+
+    client.post(reverse("kitchen:dish-bulk"), {"action": "price"})
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert "ETag" not in response
+    assert list(response.context["messages"])
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    client.logout()
+    client.login(username="chef", password="test12345")
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+def add_dishes(dish_type, count, cooks=(), ingredients=()):
+    start = Dish.objects.count()
+    for i in range(start, start + count):
+        dish = Dish.objects.create(
+            name=f"Dish {i}", description="", price=5, dish_type=dish_type
+        )
+        dish.cooks.add(*cooks)
+        dish.ingredients.add(*ingredients)
+        yield dish
+
+
+@pytest.mark.django_db
+def test_dish_detail_view_query_budget(client):
+    chef = Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    dish_type = DishType.objects.create(name="Soup")
+    (dish,) = add_dishes(dish_type, 1, [chef], [Ingredient.objects.create(name="Beet")])
+
+    def grow():
+        for i in range(10):
+            dish.cooks.add(Cook.objects.create(username=f"cook{i}"))
+            dish.ingredients.add(Ingredient.objects.create(name=f"Ingredient {i}"))
+
+    assert_query_budget(client, reverse("kitchen:dish-detail", args=[dish.pk]), 6, grow)
+
+
+@pytest.mark.django_db
+def test_dishtype_detail_view_query_budget(client):
+    Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    dish_type = DishType.objects.create(name="Soup")
+    list(add_dishes(dish_type, 1))
+
+    response = client.get(reverse("kitchen:dishtype-detail", args=[dish_type.pk]))
+    assert "Dish 0" in response.content.decode()
+    assert_query_budget(
+        client,
+        reverse("kitchen:dishtype-detail", args=[dish_type.pk]),
+        5,
+        lambda: list(add_dishes(dish_type, 10)),
+    )
+
+
+@pytest.mark.django_db
+def test_dish_list_view_query_budget(client):
+    chef = Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    dish_type = DishType.objects.create(name="Soup")
+    ingredient = Ingredient.objects.create(name="Beet")
+    list(add_dishes(dish_type, 1, [chef], [ingredient]))
+
+    assert_query_budget(
+        client,
+        reverse("kitchen:dish-list"),
+        7,
+        lambda: list(add_dishes(dish_type, 10, [chef], [ingredient])),
+    )
+
+
+@pytest.mark.django_db
+def test_dish_row_fragments_follow_dish_and_type_changes(client):
+    Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    dish_type = DishType.objects.create(name="Soup")
+    (dish,) = add_dishes(dish_type, 1)
+    url = reverse("kitchen:dish-list")
+    assert "Soup" in client.get(url).content.decode()
+
+    dish_type.name = "Broth"
+    dish_type.save()
+    assert "Broth" in client.get(url).content.decode()
+
+    dish.price = 7
+    dish.save()
+    assert "$7.00" in client.get(url).content.decode()
+
+
+@pytest.mark.django_db
+def test_import_and_export_kitchen_commands(tmp_path):
+    Cook.objects.create_user(username="chef", password="test12345")
+    Counter.objects.all().delete()
+    path = tmp_path / "menu.csv"
+    path.write_text(
+        "name,description,price,dish_type,ingredients,cooks\n"
+        "Borscht,Beet soup,12.50,Soup,Beet;Potato,chef\n"
+        "Olivier,,8,Salad,Potato,\n"
+        "Ghost,,1,Soup,,nobody\n",
+        encoding="utf-8",
+    )
+    out, err = StringIO(), StringIO()
+    call_command("import_kitchen", "dish", str(path), stdout=out, stderr=err)
+    assert "Created 2, skipped 0 existing, rejected 1" in out.getvalue()
+    assert "Ghost: unknown cook(s) nobody" in err.getvalue()
+
+    borscht = Dish.objects.get(name="Borscht")
+    assert borscht.dish_type.name == "Soup"
+    assert sorted(borscht.ingredients.values_list("name", flat=True)) == ["Beet", "Potato"]
+    assert list(borscht.cooks.values_list("username", flat=True)) == ["chef"]
+    assert counters.get_counts()["num_ingredients"] == 2
+
+    out = StringIO()
+    call_command("export_kitchen", "dish", "--format", "jsonl", stdout=out)
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert rows[0]["name"] == "Borscht"
+    assert sorted(rows[0]["ingredients"]) == ["Beet", "Potato"]
+    assert rows[1] == {
+        "name": "Olivier",
+        "description": "",
+        "price": "8.00",
+        "dish_type": "Salad",
+        "ingredients": ["Potato"],
+        "cooks": [],
+    }
+
+    call_command("import_kitchen", "dish", str(path), stdout=out, stderr=StringIO())
+    assert Dish.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_import_rejects_bad_prices_and_resyncs_after_a_failed_batch(tmp_path):
+    chef = Cook.objects.create_user(username="chef", password="test12345")
+    path = tmp_path / "menu.jsonl"
+    rows = [
+        {"name": "Borscht", "price": "12.50", "dish_type": "Soup",
+         "ingredients": ["Beet"], "cooks": ["chef"]},
+        {"name": "Shchi", "price": "twelve", "dish_type": "Soup"},
+        {"name": "Ukha", "price": "-3", "dish_type": "Soup"},
+        {"name": "Kulebyaka", "price": "12345.678", "dish_type": "Soup"},
+        {"name": "Pelmeni", "price": 123456, "dish_type": "Soup"},
+        {"description": "no name"},
+    ]
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows), encoding="utf-8")
+    err = StringIO()
+    with pytest.raises(CommandError):
+        call_command(
+            "import_kitchen", "dish", str(path), "--batch-size", "1",
+            stdout=StringIO(), stderr=err,
+        )
+
+    borscht = Dish.objects.get()
+    assert (borscht.dish_type_name, borscht.ingredient_count, borscht.cook_count) == ("Soup", 1, 1)
+    assert CookStats.objects.get(cook=chef).dish_count == 1
+    assert counters.get_counts()["num_dishes"] == 1
+
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows[1:5]), encoding="utf-8")
+    call_command("import_kitchen", "dish", str(path), stdout=StringIO(), stderr=err)
+    assert "row 1: Shchi: invalid price 'twelve'" in err.getvalue()
+    assert "row 2: Ukha: invalid price '-3'" in err.getvalue()
+    assert "row 3: Kulebyaka: invalid price '12345.678'" in err.getvalue()
+    assert "row 4: Pelmeni: invalid price 123456" in err.getvalue()
+    assert Dish.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_benchmark_covers_every_url_and_reports_latency(client):
+    user = seed_dataset(dishes=30, cooks=5, dish_types=3, ingredients=10)
+    assert Dish.objects.count() == 30
+    assert Dish.cooks.through.objects.count() == 90
+    client.force_login(user)
+
+    results = run_benchmarks(client, user, requests=2)
+    assert {result["url_name"] for result in results} == {
+        name for name, _ in collect_urls(user)
+    }
+    assert all(result["status"] == 200 for result in results)
+    dish_list = next(r for r in results if r["url_name"] == "kitchen:dish-list")
+    assert dish_list["queries"] > 0
+    assert dish_list["p99_ms"] >= dish_list["p50_ms"] > 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrency_benchmark_compares_sync_and_async_views(client):
+    user = seed_dataset(dishes=10, cooks=3, dish_types=2, ingredients=5)
+    client.force_login(user)
+    async_client = AsyncClient()
+    async_client.force_login(user)
+
+    results = run_concurrency_benchmarks(
+        client, async_client, user, requests=4, concurrency=2, latency=0.001
+    )
+    assert len(results) == 6
+    for result in results:
+        assert result["sync"]["status"] == result["async"]["status"] == 200
+        assert result["async"]["rps"] > 0
+
+
+@pytest.mark.django_db
+def test_request_metrics_middleware_and_endpoint(client, settings, tmp_path):
+    settings.REQUEST_METRICS = True
+    settings.METRICS_DIR = str(tmp_path)
+    metrics.registry.reset()
+    Cook.objects.create_user(username="chef", password="test12345")
+    Cook.objects.create_user(username="boss", password="test12345", is_staff=True)
+    client.login(username="chef", password="test12345")
+
+    response = client.get(reverse("kitchen:dish-list"))
+    assert "db;desc=" in response["Server-Timing"]
+    assert "tpl;dur=" in response["Server-Timing"]
+    assert client.get(reverse("kitchen:metrics")).status_code == 403
+
+    client.login(username="boss", password="test12345")
+    body = client.get(reverse("kitchen:metrics")).content.decode()
+    assert 'kitchen_request_duration_seconds_count{view="kitchen:dish-list"} 1' in body
+    assert 'kitchen_request_queries_total{view="kitchen:dish-list"}' in body
+
+    # Other workers' files add up with this process's live numbers.
+    other = metrics.ViewStats()
+    other.add({**dict.fromkeys(metrics.ViewStats.FIELDS, 2), "buckets": [2] * 10})
+    (tmp_path / "1-other.json").write_text(json.dumps({"kitchen:dish-list": other.as_dict()}))
+    metrics.registry.write()
+    assert len(list(tmp_path.glob("*.json"))) == 2
+    body = client.get(reverse("kitchen:metrics")).content.decode()
+    assert 'kitchen_request_duration_seconds_count{view="kitchen:dish-list"} 3' in body
+
+    # Scrapers get in with the token or from an allowed address.
+    scraper = Client()
+    settings.METRICS_TOKEN = "s3cret"
+    assert scraper.get(reverse("kitchen:metrics")).status_code == 403
+    assert scraper.get(reverse("kitchen:metrics"), HTTP_AUTHORIZATION="Bearer nope").status_code == 403
+    assert scraper.get(reverse("kitchen:metrics"), HTTP_AUTHORIZATION="Bearer s3cret").status_code == 200
+    settings.METRICS_ALLOWED_IPS = ["127.0.0.1"]
+    assert scraper.get(reverse("kitchen:metrics")).status_code == 200
+
+
+@pytest.mark.django_db
+def test_dish_list_filters_by_ingredients_with_inverted_index(
+    client, django_capture_on_commit_callbacks, monkeypatch
+):
+    Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    dish_type = DishType.objects.create(name="Salad")
+    egg, nut, milk = (Ingredient.objects.create(name=n) for n in ("Egg", "Nut", "Milk"))
+    caesar, waldorf, greek = add_dishes(dish_type, 3)
+    caesar.ingredients.add(egg)
+    waldorf.ingredients.add(egg, nut)
+    greek.ingredients.add(milk)
+
+    def names(**params):
+        response = client.get(reverse("kitchen:dish-list"), params)
+        return {dish.pk for dish in response.context["dish_list"]}
+
+    # Large matches are filtered with EXISTS subqueries instead of IN lists.
+    for max_inline_ids in (ingredient_index.MAX_INLINE_IDS, 0):
+        monkeypatch.setattr(ingredient_index, "MAX_INLINE_IDS", max_inline_ids)
+        assert names(with_ingredients="Egg, Nut") == {waldorf.pk}
+        assert names(any_ingredients="Nut,Milk") == {waldorf.pk, greek.pk}
+        assert names(with_ingredients="Egg", without_ingredients="Nut") == {caesar.pk}
+        assert names(without_ingredients="Egg") == {greek.pk}
+        assert names(with_ingredients="Egg,Unknown") == set()
+    queryset = ingredient_index.filter_dishes(Dish.objects.all(), any_of=[egg.pk])
+    assert "EXISTS" in str(queryset.query)
+    monkeypatch.undo()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        greek.ingredients.add(nut)
+        waldorf.ingredients.remove(nut)
+        caesar.delete()
+
+    def fail_rebuild(state):
+        raise AssertionError("local changes should not force a rebuild")
+
+    monkeypatch.setattr(ingredient_index.index, "_build", fail_rebuild)
+    assert names(with_ingredients="Nut") == {greek.pk}
+    assert names(without_ingredients="Nut") == {waldorf.pk}
+
+
+@pytest.mark.django_db
+def test_ingredient_index_rebuilds_after_changes_from_other_processes():
+    dish_type = DishType.objects.create(name="Soup")
+    (dish,) = add_dishes(dish_type, 1)
+    beet = Ingredient.objects.create(name="Beet")
+    index = ingredient_index.IngredientIndex()
+    assert index.query(all_of=[beet.pk]) == []
+
+    # A through row written without signals, as another worker's change
+    # would look to this process once it bumps the version.
+    Dish.ingredients.through.objects.create(dish=dish, ingredient=beet)
+    bump_elsewhere("kitchen.Dish")
+    assert index.query(all_of=[beet.pk]) == [dish.pk]
+
+
+@pytest.mark.django_db
+def test_dish_views_are_async(client, django_capture_on_commit_callbacks):
+    # Rolled back tests rewind the versions the shared index was built at.
+    ingredient_index.index.invalidate()
+    with django_capture_on_commit_callbacks(execute=True):
+        dish_type = DishType.objects.create(name="Pizza")
+        cheese = Ingredient.objects.create(name="Cheese")
+        (dish,) = add_dishes(dish_type, 1, ingredients=[cheese])
+        list(add_dishes(dish_type, 1))
+    url = reverse("kitchen:dish-list")
+    assert client.get(url).status_code == 302
+
+    chef = Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    paths = dict(collect_urls(chef))
+    for name in ASYNC_URLS:
+        assert resolve(paths[name]).func.view_class.view_is_async
+    response = client.get(url, {"with_ingredients": "Cheese"})
+    assert response.status_code == 200
+    assert list(response.context["dish_list"]) == [dish]
+    assert response.context["paginator"].count == 1
+    expected = count_facets(Dish.objects.filter(pk=dish.pk))
+    assert vars(response.context["facets"]) == vars(expected)
+    assert 'name="action"' in response.content.decode()
+    assert client.get(url, {"page": 2}).status_code == 404
+
+    response = client.get(reverse("kitchen:dish-detail", args=[dish.pk]))
+    assert response.context["dish"] == dish
+    response = client.get(reverse("kitchen:dishtype-detail", args=[dish_type.pk]))
+    assert dish.name in response.content.decode()
+    assert client.get(reverse("kitchen:dish-detail", args=[0])).status_code == 404
+
+
+POSTGRES_ENV = {
+    "POSTGRES_DB": "kitchen",
+    "POSTGRES_USER": "kitchen",
+    "POSTGRES_PASSWORD": "secret",
+    "POSTGRES_HOST": "localhost",
+    "POSTGRES_DB_PORT": "5432",
+}
+
+
+def test_postgres_settings_choose_persistent_connections_or_pool():
+    database = postgres_from_env({**POSTGRES_ENV, "DB_POOL": "False"})
+    assert database["ENGINE"] == "django.db.backends.postgresql"
+    assert database["PORT"] == 5432
+    assert database["CONN_MAX_AGE"] == 60
+    assert database["CONN_HEALTH_CHECKS"] is True
+    assert "OPTIONS" not in database
+
+    database = postgres_from_env(
+        {
+            **POSTGRES_ENV,
+            "DB_POOL": "False",
+            "DB_CONN_MAX_AGE": "",
+            "DB_CONN_HEALTH_CHECKS": "False",
+        }
+    )
+    assert database["CONN_MAX_AGE"] is None
+    assert database["CONN_HEALTH_CHECKS"] is False
+    database = postgres_from_env({**POSTGRES_ENV, "DB_POOL": "False", "DB_CONN_MAX_AGE": "0"})
+    assert database["CONN_MAX_AGE"] == 0
+
+
+def test_postgres_pool_settings_disable_persistent_connections():
+    # The pool is the default: production serves ASGI.
+    database = postgres_from_env(POSTGRES_ENV)
+    # Django refuses a pool combined with persistent connections.
+    assert database["CONN_MAX_AGE"] == 0
+    assert database["OPTIONS"] == {"pool": {"min_size": 2, "max_size": 10, "timeout": 10.0}}
+
+    database = postgres_from_env(
+        {
+            **POSTGRES_ENV,
+            "DB_POOL": "True",
+            "DB_CONN_MAX_AGE": "600",
+            "DB_POOL_MIN_SIZE": "1",
+            "DB_POOL_MAX_SIZE": "4",
+            "DB_POOL_TIMEOUT": "2.5",
+        }
+    )
+    assert database["CONN_MAX_AGE"] == 0
+    assert database["OPTIONS"]["pool"] == {"min_size": 1, "max_size": 4, "timeout": 2.5}
+
+
+@pytest.mark.parametrize("max_age, reused", [(60, True), (0, False)])
+def test_connection_is_reused_across_requests(
+    tmp_path, monkeypatch, django_db_blocker, max_age, reused
+):
+    # A file database stands in for Postgres: unlike the in-memory test
+    # database, closing it really drops the connection. Requests go through
+    # the WSGI handler itself, since the test client skips the
+    # close_old_connections call that ends each request.
+    standin = ConnectionHandler(
+        {
+            "default": {
+                "ENGINE": "django.db.backends.sqlite3",
+                "NAME": tmp_path / "standin.sqlite3",
+                "CONN_MAX_AGE": max_age,
+                "CONN_HEALTH_CHECKS": True,
+            }
+        }
+    )
+    monkeypatch.setitem(connections.settings, "standin", standin.settings["default"])
+    seen = []
+
+    def query(**kwargs):
+        # Runs after close_old_connections, like a view's first query.
+        with connections["standin"].cursor() as cursor:
+            cursor.execute("SELECT 1")
+        seen.append(connections["standin"].connection)
+
+    request_started.connect(query)
+    handler = WSGIHandler()
+    try:
+        with django_db_blocker.unblock():
+            for _ in range(2):
+                environ = RequestFactory().get(reverse("login")).environ
+                response = handler(environ, lambda status, headers: None)
+                assert response.status_code == 200
+                response.close()
+    finally:
+        request_started.disconnect(query)
+        connections["standin"].close()
+        del connections["standin"]
+    assert (seen[0] is seen[1]) is reused
+
+
+@pytest.mark.django_db
+def test_cook_stats_follow_dish_and_link_changes():
+    chef = Cook.objects.create_user(username="chef", password="test12345")
+    soup, salad = DishType.objects.create(name="Soup"), DishType.objects.create(name="Salad")
+    borscht, okroshka = add_dishes(soup, 2, cooks=[chef])
+    (caesar,) = add_dishes(salad, 1)
+
+    def stats():
+        row = CookStats.objects.get(cook=chef)
+        return row.dish_count, row.dish_type_count, row.menu_value
+
+    assert stats() == (2, 1, 10)
+    chef.dishes.add(caesar)
+    assert stats() == (3, 2, 15)
+    caesar.price = 12
+    caesar.save()
+    assert stats() == (3, 2, 22)
+    borscht.dish_type = salad
+    borscht.save(update_fields=["dish_type"])
+    assert stats() == (3, 2, 22)
+    caesar.cooks.remove(chef)
+    assert stats() == (2, 2, 10)
+    okroshka.delete()
+    assert stats() == (1, 1, 5)
+    borscht.cooks.clear()
+    assert stats() == (0, 0, 0)
+
+    chef.dishes.add(caesar)
+    CookStats.objects.all().delete()
+    assert cook_stats.rebuild() == 1
+    assert stats() == (1, 1, 12)
+
+
+@pytest.mark.django_db
+def test_dish_summary_columns_follow_changes_and_repair():
+    chef = Cook.objects.create_user(username="chef", password="test12345")
+    soup = DishType.objects.create(name="Soup")
+    beet, salt = Ingredient.objects.create(name="Beet"), Ingredient.objects.create(name="Salt")
+    (borscht,) = add_dishes(soup, 1, cooks=[chef], ingredients=[beet, salt])
+
+    def summary():
+        return Dish.objects.values_list(*dish_summary.SUMMARY_FIELDS).get(pk=borscht.pk)
+
+    assert summary() == ("Soup", 2, 1)
+    soup.name = "Soups"
+    soup.save()
+    assert summary() == ("Soups", 2, 1)
+    salt.dishes.clear()
+    assert summary() == ("Soups", 1, 1)
+    beet.delete()
+    chef.delete()
+    assert summary() == ("Soups", 0, 0)
+    borscht.refresh_from_db()
+    borscht.ingredients.add(salt)
+    borscht.save()
+    assert summary() == ("Soups", 1, 0)
+
+    Dish.objects.update(dish_type_name="", ingredient_count=7)
+    out = StringIO()
+    call_command("repair_dish_summaries", stdout=out)
+    assert "1 dish" in out.getvalue()
+    assert summary() == ("Soups", 1, 0)
+    assert dish_summary.repair() == []
+
+
+@pytest.mark.django_db
+def test_dish_list_reads_only_the_dish_table(client):
+    Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    list(add_dishes(DishType.objects.create(name="Soup"), 3))
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(reverse("kitchen:dish-list"))
+    assert "Soup" in response.content.decode()
+    rows = [q["sql"] for q in queries if q["sql"].startswith('SELECT "kitchen_dish"."id"')]
+    assert len(rows) == 1
+    assert "JOIN" not in rows[0] and '"description"' not in rows[0]
+
+
+@pytest.mark.django_db
+def test_dish_list_facets_filter_and_count(
+    client, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    with django_capture_on_commit_callbacks(execute=True):
+        soup, salad = DishType.objects.create(name="Soup"), DishType.objects.create(name="Salad")
+        beet = Ingredient.objects.create(name="Beet")
+        for name, dish_type, price in [
+            ("Borscht", soup, 4),
+            ("Solyanka", soup, 12),
+            ("Caesar", salad, 7),
+            ("Olivier", salad, 8),
+        ]:
+            dish = Dish.objects.create(name=name, description="", price=price, dish_type=dish_type)
+            if dish_type is soup:
+                dish.ingredients.add(beet)
+
+    url = reverse("kitchen:dish-list")
+    response = client.get(url, {"price_band": "5-10"})
+    assert {d.name for d in response.context["dish_list"]} == {"Caesar", "Olivier"}
+    facets = response.context["facets"]
+    # Type counts honour the price band, band counts ignore their own facet.
+    assert facets.dish_types == [(salad.pk, "Salad", 2)]
+    assert facets.price_bands == [("under-5", "Under $5", 1), ("5-10", "$5 - $10", 2), ("10-20", "$10 - $20", 1)]
+    assert facets.ingredients == []
+
+    response = client.get(url, {"dish_type": soup.pk, "ingredient": beet.pk})
+    assert {d.name for d in response.context["dish_list"]} == {"Borscht", "Solyanka"}
+    assert response.context["facets"].ingredients == [(beet.pk, "Beet", 2)]
+    assert "price_band=10-20" in response.content.decode()
+
+    # Cached until one of the counted models changes.
+    form = DishSearchForm({"dish_type": soup.pk})
+    assert form.is_valid()
+    queryset = form.filter_by_ingredients(Dish.objects.all())
+    form.facets(queryset)
+    with django_assert_num_queries(1):
+        form.facets(queryset)
+    with django_capture_on_commit_callbacks(execute=True):
+        Dish.objects.filter(name="Borscht").get().save()
+    with django_assert_num_queries(3):
+        assert form.facets(queryset).price_bands[0] == ("under-5", "Under $5", 1)
+
+
+@pytest.mark.django_db
+def test_dish_admin_filters_count_with_cached_facets(
+    client, monkeypatch, django_capture_on_commit_callbacks
+):
+    Cook.objects.create_superuser(username="boss", password="test12345")
+    client.login(username="boss", password="test12345")
+    with django_capture_on_commit_callbacks(execute=True):
+        soup, salad = DishType.objects.create(name="Soup"), DishType.objects.create(name="Salad")
+        for name, dish_type, price in [("Borscht", soup, 4), ("Solyanka", soup, 12), ("Caesar", salad, 7)]:
+            Dish.objects.create(name=name, description="", price=price, dish_type=dish_type)
+
+    url = reverse("admin:kitchen_dish_changelist")
+    content = client.get(url, {"price_band": "5-10"}).content.decode()
+    # As on the dish list, type counts honour the price band and band
+    # counts ignore their own filter.
+    assert "Salad (1)" in content and "Soup (0)" in content
+    assert "Under $5 (1)" in content and "$10 - $20 (1)" in content
+
+    def count_again(*args, **kwargs):
+        raise AssertionError("facets counted again")
+
+    monkeypatch.setattr("kitchen.facets.count_facets", count_again)
+    response = client.get(url, {"price_band": "5-10"})
+    assert "Salad (1)" in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_export_views_stream_csv_and_gzipped_jsonl(client, django_assert_max_num_queries):
+    Cook.objects.create_user(username="chef", password="test12345")
+    boss = Cook.objects.create_user(username="boss", password="test12345", is_staff=True)
+    soup = DishType.objects.create(name="Soup")
+    beet = Ingredient.objects.create(name="Beet")
+    list(add_dishes(soup, 5, cooks=[boss], ingredients=[beet]))
+    url = reverse("kitchen:export-dishes")
+
+    client.login(username="chef", password="test12345")
+    assert client.get(url).status_code == 403
+
+    client.login(username="boss", password="test12345")
+    response = client.get(url, {"format": "csv"})
+    assert response.streaming
+    assert response["Content-Disposition"] == 'attachment; filename="dishes.csv"'
+    with django_assert_max_num_queries(3):
+        lines = b"".join(response.streaming_content).decode().splitlines()
+    assert lines[0] == "name,description,price,dish_type,ingredients,cooks"
+    assert lines[1] == "Dish 0,,5.00,Soup,Beet,boss"
+    assert len(lines) == 6
+
+    response = client.get(
+        reverse("kitchen:export-cooks"), {"format": "jsonl"}, HTTP_ACCEPT_ENCODING="gzip"
+    )
+    assert response["Content-Encoding"] == "gzip"
+    body = gzip.decompress(b"".join(response.streaming_content)).decode()
+    assert [json.loads(line)["username"] for line in body.splitlines()] == ["boss", "chef"]
+    assert client.get(url, {"format": "xml"}).status_code == 400
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_view_streams_chunks_under_asgi(monkeypatch):
+    boss = Cook.objects.create_user(username="boss", password="test12345", is_staff=True)
+    list(add_dishes(DishType.objects.create(name="Soup"), 5, cooks=[boss]))
+    monkeypatch.setattr(ExportView, "block_size", 1)
+    async_client = AsyncClient()
+    async_client.force_login(boss)
+
+    async def export():
+        response = await async_client.get(reverse("kitchen:export-dishes"))
+        return response, [chunk async for chunk in response.streaming_content]
+
+    response, chunks = asyncio.run(export())
+    # An async iterator is sent block by block instead of buffered whole.
+    assert response.is_async
+    assert len(chunks) == 6
+    assert b"".join(chunks).decode().splitlines()[1] == "Dish 0,,5.00,Soup,,boss"
+
+
+def test_templates_reference_only_hashed_static_files(tmp_path):
+    assert check_static_references(None) == []
+
+    (tmp_path / "bad.html").write_text(
+        '<link href="/static/css/kitchen.css">\n'
+        '<script src="{% static \'js/missing.js\' %}"></script>\n'
+    )
+    problems = find_unhashed_static_references([tmp_path])
+    assert [(number, message.split(",")[0]) for _, number, message in problems] == [
+        (1, "hard-coded static URL"),
+        (2, "static file 'js/missing.js' not found"),
+    ]
+
+
+@pytest.mark.django_db
+def test_collectstatic_writes_hashed_compressed_assets(tmp_path, settings):
+    settings.STATIC_ROOT = tmp_path
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "staticfiles": {
+            "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"
+        },
+    }
+    call_command("collectstatic", interactive=False, verbosity=0)
+
+    url = static("css/kitchen.css")
+    assert url != "/static/css/kitchen.css"
+    hashed = tmp_path / url.removeprefix(settings.STATIC_URL)
+    assert hashed.exists()
+    assert hashed.with_name(hashed.name + ".gz").exists()
+
+    response = Client().get(url, HTTP_ACCEPT_ENCODING="gzip")
+    assert response["Content-Encoding"] == "gzip"
+    assert "immutable" in response["Cache-Control"]
+
+
+@pytest.mark.django_db
+def test_bulk_dish_actions_keep_derived_state_in_sync(
+    client, django_capture_on_commit_callbacks
+):
+    chef = Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    soup, salad = DishType.objects.create(name="Soup"), DishType.objects.create(name="Salad")
+    beet = Ingredient.objects.create(name="Beet")
+    borscht, okroshka, shchi = add_dishes(soup, 3, cooks=[chef])
+    url = reverse("kitchen:dish-bulk")
+    selected = [borscht.pk, okroshka.pk]
+
+    client.post(url, {"action": "price", "percent": "20", "dishes": selected})
+    assert CookStats.objects.get(cook=chef).menu_value == 17
+    client.post(url, {"action": "dish_type", "dish_type": "Salad", "dishes": selected})
+    assert set(Dish.objects.filter(dish_type=salad).values_list("dish_type_name", flat=True)) == {"Salad"}
+    assert CookStats.objects.get(cook=chef).dish_type_count == 2
+
+    ingredient_index.index.ensure_fresh()
+    with django_capture_on_commit_callbacks(execute=True):
+        client.post(url, {"action": "add_ingredient", "ingredient": "Beet", "dishes": selected})
+    assert ingredient_index.index.query(all_of=[beet.pk]) == sorted(selected)
+    assert Dish.objects.get(pk=borscht.pk).ingredient_count == 1
+    with django_capture_on_commit_callbacks(execute=True):
+        client.post(
+            url, {"action": "remove_ingredient", "ingredient": "Beet", "dishes": [borscht.pk]}
+        )
+    assert ingredient_index.index.query(all_of=[beet.pk]) == [okroshka.pk]
+    assert dish_summary.repair() == []
+
+    response = client.post(url, {"action": "price", "percent": "-100", "dishes": selected})
+    assert response.status_code == 302
+    assert Dish.objects.get(pk=borscht.pk).price == 6
+    # 6 * 0.0005 would round to 0.00.
+    response = client.post(
+        url, {"action": "price", "percent": "-99.95", "dishes": [borscht.pk]}, follow=True
+    )
+    assert "may not drop below 0.01" in response.content.decode()
+    assert Dish.objects.get(pk=borscht.pk).price == 6
+
+    # Select all applies the list filters carried in the query string.
+    client.post(
+        f"{url}?dish_type={salad.pk}",
+        {"action": "price", "percent": "50", "select_all": "on"},
+    )
+    assert sorted(Dish.objects.values_list("price", flat=True)) == [5, 9, 9]
+
+
+def test_bulk_deletes_mirror_every_skipped_delete_receiver():
+    for label, mirrored in bulk_actions.MIRRORED_RECEIVERS.items():
+        model = apps.get_model(label)
+        connected = set()
+        for signal in (pre_delete, post_delete):
+            for receivers in signal._live_receivers(model):
+                connected.update(f"{r.__module__}.{r.__qualname__}" for r in receivers)
+        assert connected == mirrored, label
+
+
+@pytest.mark.django_db
+def test_bulk_delete_previews_then_deletes_in_constant_queries(
+    client, django_capture_on_commit_callbacks
+):
+    chef = Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    soup = DishType.objects.create(name="Soup")
+    beet = Ingredient.objects.create(name="Beet")
+    url = reverse("kitchen:dish-bulk")
+
+    def delete(count):
+        dishes = list(add_dishes(soup, count, cooks=[chef], ingredients=[beet]))
+        data = {"action": "delete", "dishes": [dish.pk for dish in dishes]}
+        response = client.post(url, data)
+        assert response.context["preview"]["count"] == count
+        assert response.context["preview"]["ingredient_links"] == count
+        assert Dish.objects.count() == count
+        Counter.objects.all().delete()
+        counters.get_counts()
+        with CaptureQueriesContext(connection) as queries:
+            with django_capture_on_commit_callbacks(execute=True):
+                response = client.post(url, {**data, "confirm": "1"})
+        assert response.status_code == 302
+        assert not Dish.objects.exists()
+        return len(queries)
+
+    assert delete(2) == delete(10)
+    assert counters.get_counts()["num_dishes"] == 0
+    assert CookStats.objects.get(cook=chef).dish_count == 0
+    assert ingredient_index.index.query(any_of=[beet.pk]) == []
+
+
+@pytest.mark.django_db
+def test_bulk_delete_dish_types_and_ingredients(client):
+    Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    soup, salad = DishType.objects.create(name="Soup"), DishType.objects.create(name="Salad")
+    beet, salt = Ingredient.objects.create(name="Beet"), Ingredient.objects.create(name="Salt")
+    list(add_dishes(soup, 2, ingredients=[beet, salt]))
+    (caesar,) = add_dishes(salad, 1, ingredients=[salt])
+
+    url = reverse("kitchen:dishtype-bulk-delete")
+    assert client.delete(url).status_code == 405
+    assert "DELETE" not in client.options(url)["Allow"]
+    response = client.post(url, {"selected": [soup.pk]})
+    assert response.context["preview"]["dishes"] == 2
+    assert DishType.objects.count() == 2
+    response = client.post(url, {"selected": [soup.pk], "confirm": "1"})
+    assert response.url == reverse("kitchen:dishtype-list")
+    assert list(DishType.objects.all()) == [salad]
+    assert list(Dish.objects.all()) == [caesar]
+
+    url = reverse("kitchen:ingredient-bulk-delete")
+    assert client.post(url, {"selected": [salt.pk]}).context["preview"]["dish_links"] == 1
+    client.post(url, {"selected": [salt.pk], "confirm": "1"})
+    assert list(Ingredient.objects.all()) == [beet]
+    assert Dish.objects.get(pk=caesar.pk).ingredient_count == 0
+    assert bulk_actions.preview_delete(Ingredient, Ingredient.objects.all())["count"] == 1
+
+
+@pytest.mark.django_db
+def test_scheduler_assigns_least_loaded_qualified_cook_and_drains_by_priority(
+    django_assert_num_queries, django_capture_on_commit_callbacks, monkeypatch
+):
+    ann, bob, eve = (Cook.objects.create_user(username=name) for name in ("ann", "bob", "eve"))
+    soup = DishType.objects.create(name="Soup")
+    borscht, okroshka, shchi = add_dishes(soup, 3)
+    borscht.cooks.add(ann, bob)
+    okroshka.cooks.add(ann)
+    scheduler = tickets.Scheduler(capacity=2)
+    monkeypatch.setattr(tickets, "scheduler", scheduler)
+
+    order = tickets.place_order([okroshka, borscht, borscht, borscht, shchi])
+    assert [t.cook_id for t in order.tickets.order_by("pk")] == [ann.pk, bob.pk, ann.pk, bob.pk, None]
+    assert scheduler.loads() == {ann.pk: 2, bob.pk: 2}
+
+    # Every qualified cook is at capacity, so these wait.
+    (low,), (high,), (urgent,) = (
+        tickets.place_order(dishes, priority=priority).tickets.all()
+        for dishes, priority in (([borscht], 0), ([borscht], 1), ([okroshka], 5))
+    )
+    unassigned = order.tickets.get(dish=shchi)
+    assert scheduler.open_tickets("queued") == [unassigned.pk, low.pk, high.pk, urgent.pk]
+
+    mine = order.tickets.filter(cook=bob).first()
+    assert scheduler.start([mine.pk], cook_id=ann.pk) == []
+    with django_capture_on_commit_callbacks(execute=True):
+        assert scheduler.start([mine.pk], cook_id=bob.pk) == [mine.pk]
+    with monkeypatch.context() as patch:
+        patch.setattr(scheduler, "_build", None)  # its own writes keep it fresh
+        # Version check, savepoint, one UPDATE per status, bump, release.
+        with django_assert_num_queries(6), django_capture_on_commit_callbacks(execute=True):
+            assert scheduler.complete([mine.pk]) == [mine.pk]
+    assert Ticket.objects.get(pk=mine.pk).status == "done"
+    assert Ticket.objects.get(pk=high.pk).cook == bob
+
+    # Ann frees a slot and takes the most urgent ticket among her dishes.
+    scheduler.cancel([order.tickets.filter(cook=ann).first().pk])
+    assert Ticket.objects.get(pk=urgent.pk).cook == ann
+    assert Ticket.objects.get(pk=low.pk).status == "queued"
+
+    # A cook linked to shchi by another process gets its ticket on reload.
+    Dish.cooks.through.objects.create(dish=shchi, cook=eve)
+    bump_elsewhere("kitchen.Dish")
+    assert scheduler.loads()[eve.pk] == 1
+    assert Ticket.objects.get(pk=unassigned.pk).cook == eve
+
+
+@pytest.mark.django_db
+def test_scheduler_with_stale_state_cannot_reopen_finished_tickets(
+    django_capture_on_commit_callbacks,
+):
+    chef = Cook.objects.create_user(username="chef", password="test12345")
+    (borscht,) = add_dishes(DishType.objects.create(name="Soup"), 1, cooks=[chef])
+    ours, theirs = tickets.Scheduler(), tickets.Scheduler()
+    order = Order.objects.create()
+    ticket = Ticket.objects.create(order=order, dish=borscht)
+    ours.submit([ticket])
+    theirs.ensure_fresh()
+
+    # Both share this process's bump counter, so "theirs" keeps stale state,
+    # like a second worker acting before it notices the change.
+    with django_capture_on_commit_callbacks(execute=True):
+        assert ours.complete([ticket.pk]) == [ticket.pk]
+    assert theirs.start([ticket.pk]) == []
+    assert Ticket.objects.get(pk=ticket.pk).status == "done"
+    assert theirs.loads() == {}
+
+
+@pytest.mark.django_db
+def test_scheduler_with_stale_state_cannot_overwrite_assignments(
+    django_capture_on_commit_callbacks,
+):
+    ann, bob = (Cook.objects.create_user(username=name) for name in ("ann", "bob"))
+    (borscht,) = add_dishes(DishType.objects.create(name="Soup"), 1, cooks=[ann, bob])
+    ours, theirs = tickets.Scheduler(capacity=1), tickets.Scheduler(capacity=1)
+    order = Order.objects.create()
+    first, second, waiting = (Ticket.objects.create(order=order, dish=borscht) for _ in range(3))
+    ours.submit([first, second, waiting])
+    theirs.ensure_fresh()
+    assert theirs.open_tickets("queued") == [waiting.pk]
+
+    # Bob finishes, so "ours" hands him the waiting ticket. "theirs" still
+    # sees it queued and would give it to Ann once she finishes too.
+    with django_capture_on_commit_callbacks(execute=True):
+        assert ours.complete([second.pk]) == [second.pk]
+    assert Ticket.objects.get(pk=waiting.pk).cook == bob
+    with django_capture_on_commit_callbacks(execute=True):
+        assert theirs.complete([first.pk]) == [first.pk]
+    assert Ticket.objects.get(pk=waiting.pk).cook == bob
+    assert theirs.loads() == {bob.pk: 1}
+
+
+@pytest.mark.django_db
+def test_scheduler_forgets_state_of_rolled_back_transactions(
+    django_capture_on_commit_callbacks, monkeypatch
+):
+    chef = Cook.objects.create_user(username="chef")
+    (borscht,) = add_dishes(DishType.objects.create(name="Soup"), 1, cooks=[chef])
+    scheduler = tickets.Scheduler()
+    monkeypatch.setattr(tickets, "scheduler", scheduler)
+
+    with pytest.raises(RuntimeError), transaction.atomic():
+        tickets.place_order([borscht])
+        assert scheduler.loads() == {chef.pk: 1}
+        raise RuntimeError
+    assert Ticket.objects.count() == 0
+    assert scheduler.loads() == {}
+    assert scheduler.open_tickets("assigned") == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        order = tickets.place_order([borscht])
+    assert scheduler.loads() == {chef.pk: 1}
+    assert scheduler.open_tickets("assigned") == [order.tickets.get().pk]
+
+
+@pytest.mark.django_db
+def test_order_and_ticket_views_and_bulk_dish_delete(
+    client, django_capture_on_commit_callbacks, monkeypatch
+):
+    monkeypatch.setattr(tickets, "scheduler", tickets.Scheduler())
+    chef = Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    soup = DishType.objects.create(name="Soup")
+    borscht, shchi = add_dishes(soup, 2, cooks=[chef])
+    html = client.get(reverse("kitchen:order-create")).content.decode()
+    assert reverse("kitchen:api-autocomplete-dishes") in html
+    assert borscht.name not in html
+
+    response = client.post(
+        reverse("kitchen:order-create"),
+        {"table": "7", "dishes": [borscht.pk, shchi.pk], "priority": 0},
+    )
+    assert response.url == reverse("kitchen:ticket-list")
+    ticket = Ticket.objects.get(dish=borscht)
+    assert ticket.cook == chef
+
+    url = reverse("kitchen:ticket-transition", args=[ticket.pk])
+    client.post(url, {"action": "start"})
+    client.post(url, {"action": "complete"})
+    assert Ticket.objects.get(pk=ticket.pk).status == "done"
+    response = client.get(reverse("kitchen:ticket-list"), {"mine": 1})
+    assert [t.dish for t in response.context["ticket_list"]] == [shchi]
+    assert response.context["my_load"] == 1
+
+    response = client.post(reverse("kitchen:dish-bulk"), {"action": "delete", "dishes": [shchi.pk]})
+    assert response.context["preview"]["tickets"] == 1
+    with django_capture_on_commit_callbacks(execute=True):
+        client.post(
+            reverse("kitchen:dish-bulk"), {"action": "delete", "dishes": [shchi.pk], "confirm": "1"}
+        )
+    assert list(Ticket.objects.values_list("dish", flat=True)) == [borscht.pk]
+    assert tickets.scheduler.loads() == {}
+
+
+@pytest.mark.django_db
+def test_ticket_benchmark_drives_every_ticket_to_done():
+    seed_dataset(dishes=20, cooks=5, dish_types=2, ingredients=5)
+    result = benchmark_tickets(tickets=60, batch_size=25, capacity=2)
+    assert result["done"] == 60
+    assert result["transitions"] == 180
+    assert result["transitions_per_second"] > 0
+
+
+@pytest.mark.django_db
+def test_broadcaster_fans_out_committed_changes(
+    django_capture_on_commit_callbacks, monkeypatch, settings
+):
+    settings.EVENTS_POLL_INTERVAL = 0
+    broadcaster = events.Broadcaster(queue_size=4)
+    monkeypatch.setattr(events, "broadcaster", broadcaster)
+    chef = Cook.objects.create_user(username="chef")
+    loop = asyncio.new_event_loop()
+
+    async def subscribe(*args):
+        return broadcaster.subscribe(*args)
+
+    def received(subscription):
+        loop.run_until_complete(asyncio.sleep(0))
+        queue = subscription.queue
+        items = [queue.get_nowait() for _ in range(queue.qsize())]
+        return [(event.kind, event.action, event.ids) for event in items]
+
+    dishes = loop.run_until_complete(subscribe({"dish"}))
+    everything = loop.run_until_complete(subscribe())
+    with django_capture_on_commit_callbacks(execute=True):
+        (borscht,) = add_dishes(DishType.objects.create(name="Soup"), 1, cooks=[chef])
+    assert received(dishes) == [("dish", "created", [borscht.pk]), ("dish", "updated", [borscht.pk])]
+    assert ("cook", "updated", [chef.pk]) in received(everything)
+
+    # Reconnecting clients get what they missed, or a reset.
+    first = broadcaster._history[0].id
+    replay = loop.run_until_complete(subscribe({"dish"}, first))
+    assert received(replay) == [("dish", "updated", [borscht.pk])]
+    assert received(loop.run_until_complete(subscribe((), "other-1"))) == [("reset", "restart", [])]
+
+    for _ in range(5):
+        broadcaster.publish("dish", "updated", [borscht.pk])
+    assert received(dishes) == [("reset", "overflow", [])]
+
+    # Versions bumped by another process are announced without ids.
+    broadcaster.check_versions()
+    bump_elsewhere("kitchen.Ticket")
+    broadcaster.check_versions()
+    assert received(everything)[-1] == ("ticket", "changed", [])
+    loop.close()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_event_stream_pushes_changes_to_screens(settings):
+    settings.EVENTS_POLL_INTERVAL = 0
+    user = Cook.objects.create_user(username="screen", password="test12345")
+    soup = DishType.objects.create(name="Soup")
+    async_client = AsyncClient()
+    async_client.force_login(user)
+
+    async def watch():
+        response = await async_client.get(reverse("kitchen:events"), {"types": "dish"})
+        assert response["Content-Type"] == "text/event-stream"
+        stream = aiter(response.streaming_content)
+        assert await anext(stream) == b"retry: 3000\n\n"
+        dish = await Dish.objects.acreate(name="Borscht", description="", price=5, dish_type=soup)
+        chunk = await asyncio.wait_for(anext(stream), 5)
+        await stream.aclose()
+        return dish, chunk.decode()
+
+    dish, chunk = asyncio.run(watch())
+    assert "event: dish\n" in chunk
+    assert json.loads(chunk.split("data: ")[1]) == {"action": "created", "ids": [dish.pk]}
+    assert not events.broadcaster._subscribers
+
+
+@pytest.mark.django_db
+def test_event_stream_needs_asgi_and_fragments_patch_changed_rows(client):
+    chef = Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    assert client.get(reverse("kitchen:events")).status_code == 501
+
+    borscht, shchi = add_dishes(DishType.objects.create(name="Soup"), 2, cooks=[chef])
+    url = reverse("kitchen:live-fragments")
+    page = client.get(reverse("kitchen:dish-list")).content.decode()
+    assert f'data-live-fragment="dish-row" data-live-id="{borscht.pk}"' in page
+
+    borscht.name = "Red borscht"
+    borscht.save()
+    deleted = shchi.pk
+    shchi.delete()
+    response = client.get(url, {"fragment": "dish-row", "ids": f"{borscht.pk},{deleted}"})
+    fragments = response.json()["fragments"]
+    assert list(fragments) == [str(borscht.pk)]
+    assert "Red borscht" in fragments[str(borscht.pk)]
+    assert fragments[str(borscht.pk)].strip().startswith("<tr")
+
+    order = Order.objects.create()
+    ticket = Ticket.objects.create(order=order, dish=borscht)
+    fragment = {"fragment": "ticket-row", "ids": ticket.pk}
+    assert list(client.get(url, fragment).json()["fragments"]) == [str(ticket.pk)]
+    assert client.get(url, {**fragment, "mine": 1}).json()["fragments"] == {}
+    assert client.get(url, {"fragment": "page", "ids": "1"}).status_code == 400
+    assert client.get(url, {"fragment": "dish-row", "ids": "x"}).status_code == 400
+
+
+def sync(client, since=0, limit=None):
+    params = {"since": since, **({"limit": limit} if limit else {})}
+    return client.get(reverse("kitchen:api-changes"), params)
+
+
+@pytest.mark.django_db
+def test_change_feed_folds_entries_and_pages_by_seq(
+    client, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        chef = Cook.objects.create_user(username="chef", password="test12345")
+        soup = DishType.objects.create(name="Soup")
+        beet = Ingredient.objects.create(name="Beet")
+        (borscht,) = add_dishes(soup, 1, cooks=[chef], ingredients=[beet])
+        borscht.price = 7
+        borscht.save()
+    client.login(username="chef", password="test12345")
+    full = sync(client).json()
+    assert full["since"] == 0 and full["more"] is False
+    assert full["next"] == Change.objects.latest("seq").seq
+    feed = full["changes"]
+    assert feed["dish"]["upsert"] == [
+        {"id": borscht.pk, "name": "Dish 0", "description": "", "price": "7.00", "dish_type_id": soup.pk}
+    ]
+    assert feed["dish_cooks"] == {"add": [[borscht.pk, chef.pk]]}
+    assert feed["dish_ingredients"] == {"add": [[borscht.pk, beet.pk]]}
+    assert feed["cook"]["upsert"][0]["username"] == "chef"
+    assert "password" not in json.dumps(feed["cook"])
+
+    with django_capture_on_commit_callbacks(execute=True):
+        borscht.ingredients.clear()
+        soup_pk, borscht_pk = soup.pk, borscht.pk
+        soup.delete()
+    delta = sync(client, full["next"]).json()["changes"]
+    assert delta == {
+        "dish_ingredients": {"remove": [[borscht_pk, beet.pk]]},
+        "dishtype": {"delete": [soup_pk]},
+        "dish": {"delete": [borscht_pk]},
+    }
+
+    pages, since, more = [], 0, True
+    while more:
+        page = sync(client, since, limit=3).json()
+        pages.append(page["changes"])
+        since, more = page["next"], page["more"]
+    assert since == Change.objects.latest("seq").seq and len(pages) > 2
+    assert sync(client, since).json() == {"since": since, "next": since, "more": False, "changes": {}}
+    assert sync(client, -1).status_code == 400
+
+
+@pytest.mark.django_db
+def test_compaction_keeps_latest_entries_and_raises_floor(
+    client, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    with django_capture_on_commit_callbacks(execute=True):
+        soup = DishType.objects.create(name="Soup")
+        salad = DishType.objects.create(name="Salad")
+        for price in range(3):
+            soup.name = f"Soup {price}"
+            soup.save()
+        salad.delete()
+    before = sync(client).json()["changes"]
+    out = StringIO()
+    call_command("compact_changes", stdout=out)
+    assert "Dropped 4 superseded and 0 expired entries; floor is 0." in out.getvalue()
+    assert sync(client).json()["changes"] == before
+    assert Change.objects.filter(kind="dishtype").count() == 2
+
+    since = Change.objects.latest("seq").seq
+    assert changes.compact(tombstone_age=timedelta(0)) == (0, 1)
+    assert changes.get_floor() == since
+    assert sync(client, since - 1).status_code == 410
+    assert sync(client, since).status_code == 200
+    assert sync(client).json()["changes"]["dishtype"] == {"upsert": [{"id": soup.pk, "name": "Soup 2"}]}
+
+
+@pytest.mark.django_db
+def test_change_entries_commit_with_the_data_and_are_numbered_after(
+    client, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    with transaction.atomic():
+        DishType.objects.create(name="Gone")
+        transaction.set_rollback(True)
+    assert not Change.objects.filter(kind="dishtype").exists()
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        soup = DishType.objects.create(name="Soup")
+    entry = Change.objects.get(kind="dishtype")
+    assert entry.object_id == soup.pk and entry.seq is None
+    # Reads never number entries; the writer does once it committed.
+    top = sync(client).json()["next"]
+    assert sync(client, top).json()["changes"] == {}
+    for callback in callbacks:
+        callback()
+    assert sync(client, top).json()["changes"] == {
+        "dishtype": {"upsert": [{"id": soup.pk, "name": "Soup"}]}
+    }
+    entries = list(Change.objects.order_by("id").values_list("seq", flat=True))
+    assert entries == sorted(entries) and entries[-1] == top + 1
+
+    # A seq is never handed out twice, even once its entry is compacted.
+    with django_capture_on_commit_callbacks(execute=True):
+        soup.delete()
+    assert changes.compact(tombstone_age=timedelta(0)) == (1, 1)
+    with django_capture_on_commit_callbacks(execute=True):
+        salad = DishType.objects.create(name="Salad")
+    page = sync(client, top + 2).json()
+    assert page["next"] == top + 3
+    assert page["changes"] == {"dishtype": {"upsert": [{"id": salad.pk, "name": "Salad"}]}}
+
+
+@pytest.mark.django_db
+def test_bulk_actions_and_imports_record_changes(
+    tmp_path, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        chef = Cook.objects.create_user(username="chef")
+        soup = DishType.objects.create(name="Soup")
+        beet = Ingredient.objects.create(name="Beet")
+        dishes = list(add_dishes(soup, 2))
+    ids = [dish.pk for dish in dishes]
+    since = Change.objects.aggregate(top=Max("seq"))["top"] or 0
+    with django_capture_on_commit_callbacks(execute=True):
+        bulk_actions.add_ingredient(Dish.objects.all(), beet)
+        bulk_actions.change_prices(Dish.objects.all(), percent=10)
+        bulk_actions.delete_dishes(Dish.objects.filter(pk=ids[0]))
+    feed, _, _ = changes.read_changes(since, 100)
+    assert feed["dish_ingredients"] == {"add": [[ids[0], beet.pk], [ids[1], beet.pk]]}
+    assert [row["id"] for row in feed["dish"]["upsert"]] == ids[1:]
+    assert feed["dish"]["delete"] == ids[:1]
+
+    path = tmp_path / "menu.csv"
+    path.write_text("name,description,price,dish_type,ingredients,cooks\nOlivier,,8,Salad,Potato,chef\n")
+    since = Change.objects.latest("seq").seq
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command("import_kitchen", "dish", str(path), stdout=StringIO())
+    feed, _, _ = changes.read_changes(since, 100)
+    olivier = Dish.objects.get(name="Olivier")
+    potato = Ingredient.objects.get(name="Potato")
+    assert [row["name"] for row in feed["dishtype"]["upsert"]] == ["Salad"]
+    assert [row["name"] for row in feed["ingredient"]["upsert"]] == ["Potato"]
+    assert feed["dish_cooks"] == {"add": [[olivier.pk, chef.pk]]}
+    assert feed["dish_ingredients"] == {"add": [[olivier.pk, potato.pk]]}
+
+
+@pytest.mark.django_db
+def test_session_user_is_cached_until_the_cook_changes(
+    client, django_capture_on_commit_callbacks, monkeypatch, settings
+):
+    chef = Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    other = Client()
+    other.login(username="chef", password="test12345")
+    url = reverse("kitchen:dish-list")
+
+    def get(client):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        loaded = any('"users_cook"."password"' in query["sql"] for query in queries)
+        return response, loaded
+
+    assert get(client)[1]
+    response, loaded = get(client)
+    assert response.status_code == 200 and not loaded
+    assert not get(other)[1]
+    assert response.wsgi_request.user.get_deferred_fields() == {"password"}
+    cache, keys = auth.get_cache(), auth._keys(chef.pk)
+    assert chef.password not in repr(cache.get_many(keys))
+
+    # Versions expire along with the entries instead of piling up.
+    later = time.time() + settings.AUTH_USER_CACHE_TIMEOUT + 1
+    with monkeypatch.context() as patch:
+        patch.setattr(time, "time", lambda: later)
+        assert cache.get_many(keys) == {}
+
+    with django_capture_on_commit_callbacks(execute=True):
+        chef.first_name = "Ivan"
+        chef.save()
+    response, loaded = get(client)
+    assert loaded and response.wsgi_request.user.first_name == "Ivan"
+    assert asyncio.run(response.wsgi_request.auser()).first_name == "Ivan"
+
+    # A new password logs other sessions out; a lost version reloads.
+    with django_capture_on_commit_callbacks(execute=True):
+        chef.set_password("new12345")
+        chef.save()
+    assert get(other)[0].status_code == 302
+    client.login(username="chef", password="new12345")
+    assert get(client)[0].status_code == 200
+    auth.get_cache().delete(auth._keys(chef.pk)[0])
+    assert get(client)[1]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        chef.delete()
+    assert get(client)[0].status_code == 302
+
+
+@pytest.mark.django_db
+def test_autocomplete_matches_name_and_word_prefixes(
+    client, django_assert_max_num_queries, django_capture_on_commit_callbacks
+):
+    assert client.get(reverse("kitchen:api-autocomplete-cooks"), {"q": "a"}).status_code == 403
+    Cook.objects.create_user(username="chef", password="test12345")
+    Cook.objects.create_user(username="ivanp", first_name="Ivan", last_name="Petrenko")
+    client.login(username="chef", password="test12345")
+    with django_capture_on_commit_callbacks(execute=True):
+        for name in ("Beet", "Beetroot", "Red onion", "Potato"):
+            Ingredient.objects.create(name=name)
+    url = reverse("kitchen:api-autocomplete-ingredients")
+
+    def labels(url, q, **params):
+        results = client.get(url, {"q": q, **params}).json()["results"]
+        return [result["label"] for result in results]
+
+    assert labels(url, "BE") == ["Beet", "Beetroot"]
+    assert labels(url, "on") == ["Red onion"]
+    assert labels(url, "red  o") == ["Red onion"]
+    assert labels(url, "be", limit=1) == ["Beet"]
+    assert labels(url, " ") == []
+    cooks = reverse("kitchen:api-autocomplete-cooks")
+    assert labels(cooks, "petr") == labels(cooks, "ivan p") == ["ivanp (Ivan Petrenko)"]
+    assert client.get(url, {"q": "b", "limit": "x"}).status_code == 400
+
+    # Lookups read the version table only, until a change rebuilds the index.
+    with django_assert_max_num_queries(2):
+        labels(url, "po")
+    with django_capture_on_commit_callbacks(execute=True):
+        Ingredient.objects.create(name="Beetle")
+    assert labels(url, "beet") == ["Beet", "Beetle", "Beetroot"]
+    with django_capture_on_commit_callbacks(execute=True):
+        Ingredient.objects.filter(name="Beet").delete()
+    assert autocomplete.indexes["ingredient"].search("beet") == [
+        (pk, name)
+        for pk, name in Ingredient.objects.filter(name__in=["Beetle", "Beetroot"])
+        .order_by("name")
+        .values_list("pk", "name")
+    ]
+
+
+@pytest.mark.django_db
+def test_dish_form_renders_selected_items_and_checks_ids_in_one_query(client):
+    chef = Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    Ingredient.objects.bulk_create(Ingredient(name=f"Ingredient {i}") for i in range(50))
+    beet = Ingredient.objects.create(name="Beet")
+    (dish,) = add_dishes(DishType.objects.create(name="Soup"), 1, [chef], [beet])
+
+    response = client.get(reverse("kitchen:dish-update", args=[dish.pk]))
+    form = response.context["form"]
+    html = str(form["ingredients"])
+    assert html.count("<option") == 1 and f'value="{beet.pk}" selected' in html
+    assert reverse("kitchen:api-autocomplete-ingredients") in html
+
+    potato = Ingredient.objects.get(name="Ingredient 7")
+    data = {
+        "name": dish.name,
+        "description": "Beet soup",
+        "price": "5",
+        "dish_type": dish.dish_type_id,
+        "cooks": [chef.pk],
+        "ingredients": [beet.pk, potato.pk],
+    }
+    form = DishForm(data, instance=dish)
+    with CaptureQueriesContext(connection) as queries:
+        assert form.is_valid()
+    ingredient_queries = [q for q in queries if 'FROM "kitchen_ingredient"' in q["sql"]]
+    assert len(ingredient_queries) == 1 and " IN (" in ingredient_queries[0]["sql"]
+    form.save()
+    assert set(dish.ingredients.all()) == {beet, potato}
+
+    form = DishForm({**data, "ingredients": [beet.pk, 10**9]}, instance=dish)
+    assert not form.is_valid() and "ingredients" in form.errors
+    assert str(form["ingredients"]).count("<option") == 1
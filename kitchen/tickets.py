@@ -0,0 +1,440 @@
+import heapq
+import itertools
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, F, Q, Value, When
+from django.utils import timezone
+
+from . import events, versioning
+from .models import Dish, Order, Ticket
+
+TRACKED_LABELS = ("kitchen.Ticket", "kitchen.Dish", settings.AUTH_USER_MODEL)
+
+QUEUED = Ticket.Status.QUEUED
+ASSIGNED = Ticket.Status.ASSIGNED
+COOKING = Ticket.Status.COOKING
+DONE = Ticket.Status.DONE
+CANCELLED = Ticket.Status.CANCELLED
+
+# Allowed transitions: target status -> statuses a ticket may leave for it.
+TRANSITIONS = {
+    COOKING: (ASSIGNED,),
+    DONE: (ASSIGNED, COOKING),
+    CANCELLED: (QUEUED, ASSIGNED, COOKING),
+}
+
+# Times a batch is retried on rebuilt state after losing a race to another
+# process before TicketConflict propagates.
+CONFLICT_RETRIES = 2
+
+
+class TicketConflict(Exception):
+    """Another process moved some of the tickets being written."""
+
+
+class OpenTicket:
+    __slots__ = ("pk", "dish_id", "cook_id", "status", "priority")
+
+    def __init__(self, pk, dish_id, cook_id, status, priority):
+        self.pk = pk
+        self.dish_id = dish_id
+        self.cook_id = cook_id
+        self.status = status
+        self.priority = priority
+
+
+class _Pending:
+    """An ``on_commit`` callback telling whether its transaction committed."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.committed = False
+
+    def __call__(self):
+        self.committed = True
+
+    def rolled_back(self):
+        # A rollback drops the callbacks queued since its savepoint.
+        return not self.committed and not any(
+            queued is self for _, queued, _ in self.connection.run_on_commit
+        )
+
+
+class Scheduler:
+    """
+    Assign open tickets to the least-loaded cook among ``Dish.cooks`` of
+    their dish, a cook's load being their assigned and cooking tickets.
+
+    Each dish keeps a min-heap of ``(load, cook_id)``. Entries are fixed
+    lazily: one whose load is below the cook's current load is pushed back
+    with the current value, and one above it is dropped, since a fresh entry
+    is pushed whenever a load goes down. Tickets nobody can take (no cook
+    for the dish, or every cook at ``capacity``) wait in a per-dish heap of
+    ``(-priority, seq, ticket_id)`` and are handed out as cooks free up.
+
+    Transitions change the in-memory state and are written by ``_flush()``
+    as one ``UPDATE`` per distinct ``(status, cook)`` pair. The state is
+    rebuilt from the open tickets when another process changes tickets,
+    dishes or cooks, or when a signal handler below invalidates it.
+
+    Each ``UPDATE`` only matches rows still in the status and with the cook
+    the state had for them, so a process acting on stale state can neither
+    reopen a finished ticket nor overwrite another process's assignment;
+    the batch is then rolled back and replayed on rebuilt state.
+
+    State changed inside a transaction is kept until that transaction ends
+    and thrown away if it rolls back instead of committing.
+    """
+
+    def __init__(self, capacity=None):
+        self.capacity = capacity
+        self._lock = threading.RLock()
+        self._seq = itertools.count()
+        self._tickets = None
+        self._state = None
+        self._local_bumps = None
+        self._pending = []
+
+    def invalidate(self):
+        with self._lock:
+            self._tickets = None
+
+    # Loading
+
+    def _current_state(self):
+        return versioning.get_versions(TRACKED_LABELS)
+
+    def _is_fresh(self, state):
+        if self._tickets is None:
+            return False
+        for label in TRACKED_LABELS:
+            built_version, built_at = self._state[label]
+            version, updated_at = state[label]
+            own = versioning.local_bumps[label] - self._local_bumps[label]
+            if version - built_version != own:
+                return False
+            if own == 0 and updated_at != built_at:
+                return False
+        return True
+
+    def _adopt(self, state):
+        self._state = state
+        self._local_bumps = {label: versioning.local_bumps[label] for label in TRACKED_LABELS}
+
+    def _until_commit(self):
+        """Keep track of the current transaction having changed the state."""
+        connection = transaction.get_connection()
+        if connection.in_atomic_block:
+            pending = _Pending(connection)
+            self._pending.append(pending)
+            transaction.on_commit(pending)
+
+    def _discard_rolled_back(self):
+        """Drop the state if a transaction that changed it was rolled back."""
+        if any(pending.rolled_back() for pending in self._pending):
+            self._tickets = None
+            self._pending = []
+        else:
+            self._pending = [pending for pending in self._pending if not pending.committed]
+
+    def _build(self, state):
+        self._tickets = {}
+        self._load = defaultdict(int)
+        self._cooks_of = {}
+        self._dishes_of = defaultdict(set)
+        self._free = {}
+        self._waiting = defaultdict(list)
+        self._dirty = {}
+        self._expected = {}
+        self._reassigned = set()
+        self._pending = []
+        rows = Ticket.objects.filter(status__in=Ticket.ACTIVE).order_by("-priority", "pk")
+        tickets = [
+            OpenTicket(*row)
+            for row in rows.values_list("pk", "dish_id", "cook_id", "status", "priority")
+        ]
+        self._qualify({ticket.dish_id for ticket in tickets})
+        for ticket in tickets:
+            self._tickets[ticket.pk] = ticket
+            if ticket.status == COOKING:
+                if ticket.cook_id is not None:
+                    self._load[ticket.cook_id] += 1
+            elif ticket.cook_id in self._cooks_of[ticket.dish_id]:
+                self._load[ticket.cook_id] += 1
+            elif ticket.status != QUEUED or ticket.cook_id is not None:
+                # Lost its cook (deleted or unlinked from the dish), so requeue.
+                self._set(ticket, QUEUED, None)
+        for ticket in tickets:
+            if ticket.status == QUEUED:
+                self._schedule(ticket)
+        self._adopt(state)
+        # Rows read inside a transaction may vanish with its rollback.
+        self._until_commit()
+
+    def _qualify(self, dish_ids):
+        """Load the cooks of ``dish_ids`` not seen yet, in one query."""
+        missing = [pk for pk in dish_ids if pk not in self._cooks_of]
+        if not missing:
+            return
+        for pk in missing:
+            self._cooks_of[pk] = set()
+        links = Dish.cooks.through.objects.filter(dish_id__in=missing)
+        for dish_id, cook_id in links.values_list("dish_id", "cook_id"):
+            self._cooks_of[dish_id].add(cook_id)
+            self._dishes_of[cook_id].add(dish_id)
+        for pk in missing:
+            self._free[pk] = [(self._load[cook_id], cook_id) for cook_id in self._cooks_of[pk]]
+            heapq.heapify(self._free[pk])
+
+    def ensure_fresh(self):
+        with self._lock:
+            self._discard_rolled_back()
+            state = self._current_state()
+            if self._is_fresh(state):
+                self._adopt(state)
+                return
+            self._build(state)
+            if self._dirty:
+                # Write the requeued and newly assigned tickets right away.
+                try:
+                    with transaction.atomic():
+                        self._flush()
+                except BaseException:
+                    self._tickets = None
+                    raise
+
+    # Scheduling
+
+    def _least_loaded(self, dish_id):
+        heap = self._free[dish_id]
+        if len(heap) > 2 * len(self._cooks_of[dish_id]) + 8:
+            heap[:] = [(self._load[cook_id], cook_id) for cook_id in self._cooks_of[dish_id]]
+            heapq.heapify(heap)
+        while heap:
+            load, cook_id = heap[0]
+            current = self._load[cook_id]
+            if load < current:
+                heapq.heapreplace(heap, (current, cook_id))
+            elif load > current:
+                heapq.heappop(heap)
+            elif self.capacity is not None and current >= self.capacity:
+                return None
+            else:
+                return cook_id
+        return None
+
+    def _set(self, ticket, status, cook_id):
+        self._expected.setdefault(ticket.pk, (ticket.status, ticket.cook_id))
+        if cook_id != ticket.cook_id:
+            self._reassigned.add(ticket.pk)
+        ticket.status, ticket.cook_id = status, cook_id
+        self._dirty[ticket.pk] = ticket
+
+    def _schedule(self, ticket):
+        cook_id = self._least_loaded(ticket.dish_id)
+        if cook_id is None:
+            entry = (-ticket.priority, next(self._seq), ticket.pk)
+            heapq.heappush(self._waiting[ticket.dish_id], entry)
+            return
+        self._load[cook_id] += 1
+        self._set(ticket, ASSIGNED, cook_id)
+
+    def _release(self, cook_id):
+        self._load[cook_id] -= 1
+        load = self._load[cook_id]
+        dish_ids = self._dishes_of[cook_id]
+        for dish_id in dish_ids:
+            heapq.heappush(self._free[dish_id], (load, cook_id))
+        self._drain(dish_ids)
+
+    def _drain(self, dish_ids):
+        """Hand waiting tickets of ``dish_ids`` out, highest priority first."""
+        candidates = [
+            (self._waiting[dish_id][0], dish_id)
+            for dish_id in dish_ids
+            if self._waiting.get(dish_id)
+        ]
+        heapq.heapify(candidates)
+        while candidates:
+            (_, _, ticket_id), dish_id = candidates[0]
+            waiting = self._waiting[dish_id]
+            ticket = self._tickets.get(ticket_id)
+            if ticket is None or ticket.status != QUEUED:
+                heapq.heappop(waiting)
+            elif (cook_id := self._least_loaded(dish_id)) is not None:
+                heapq.heappop(waiting)
+                self._load[cook_id] += 1
+                self._set(ticket, ASSIGNED, cook_id)
+            else:
+                heapq.heappop(candidates)
+                continue
+            if waiting:
+                heapq.heapreplace(candidates, (waiting[0], dish_id))
+            else:
+                heapq.heappop(candidates)
+
+    # Writing
+
+    def _flush(self):
+        """
+        Write the changed tickets with one ``UPDATE`` per status, setting
+        ``cook_id`` through a ``CASE`` only on the rows that changed cook, and
+        raise TicketConflict unless every row still had the status and cook
+        the state had for it.
+        """
+        if not self._dirty:
+            return
+        by_status = defaultdict(list)
+        for ticket in self._dirty.values():
+            by_status[ticket.status].append(ticket)
+        now = timezone.now()
+        for status, tickets in by_status.items():
+            changes = {"status": status, "updated_at": now}
+            cooks = defaultdict(list)
+            expected = defaultdict(list)
+            for ticket in tickets:
+                if ticket.pk in self._reassigned:
+                    cooks[ticket.cook_id].append(ticket.pk)
+                expected[self._expected[ticket.pk]].append(ticket.pk)
+            if cooks:
+                changes["cook_id"] = Case(
+                    *[When(pk__in=pks, then=Value(cook_id)) for cook_id, pks in cooks.items()],
+                    default=F("cook_id"),
+                    output_field=BigIntegerField(),
+                )
+            guard = Q()
+            for (previous, cook_id), pks in expected.items():
+                guard |= Q(pk__in=pks, status=previous, cook_id=cook_id)
+            updated = Ticket.objects.filter(guard).update(**changes)
+            if updated != len(tickets):
+                raise TicketConflict(f"{len(tickets) - updated} ticket(s) moved elsewhere")
+        events.publish("ticket", "updated", self._dirty)
+        self._dirty = {}
+        self._expected = {}
+        self._reassigned = set()
+        versioning.bump("kitchen.Ticket")
+        self._until_commit()
+
+    def _batch(self, func, *args):
+        with self._lock:
+            for attempt in range(CONFLICT_RETRIES + 1):
+                try:
+                    self.ensure_fresh()
+                    with transaction.atomic():
+                        result = func(*args)
+                        self._flush()
+                except TicketConflict:
+                    self._tickets = None
+                    if attempt == CONFLICT_RETRIES:
+                        raise
+                except BaseException:
+                    self._tickets = None
+                    raise
+                else:
+                    return result
+
+    # Public API
+
+    def submit(self, tickets):
+        """Schedule newly created ``tickets``, returning their assignments."""
+
+        def submit():
+            rows = sorted(tickets, key=lambda t: (-t.priority, t.pk))
+            self._qualify({ticket.dish_id for ticket in rows})
+            for row in rows:
+                if row.pk in self._tickets:
+                    # Already scheduled by a rebuild inside this transaction.
+                    continue
+                ticket = OpenTicket(row.pk, row.dish_id, None, QUEUED, row.priority)
+                self._tickets[ticket.pk] = ticket
+                self._schedule(ticket)
+            return {row.pk: self._tickets[row.pk].cook_id for row in rows}
+
+        return self._batch(submit)
+
+    def transition(self, ticket_ids, status, cook_id=None):
+        """
+        Move the open tickets among ``ticket_ids`` allowed to go to
+        ``status`` (only those of ``cook_id`` when given) and return their ids.
+        """
+
+        def transition():
+            moved = []
+            for pk in ticket_ids:
+                ticket = self._tickets.get(pk)
+                if ticket is None or ticket.status not in TRANSITIONS[status]:
+                    continue
+                if cook_id is not None and ticket.cook_id != cook_id:
+                    continue
+                previous = ticket.cook_id
+                self._set(ticket, status, previous)
+                if status != COOKING:
+                    del self._tickets[pk]
+                    if previous is not None:
+                        self._release(previous)
+                moved.append(pk)
+            return moved
+
+        return self._batch(transition)
+
+    def start(self, ticket_ids, cook_id=None):
+        return self.transition(ticket_ids, COOKING, cook_id)
+
+    def complete(self, ticket_ids, cook_id=None):
+        return self.transition(ticket_ids, DONE, cook_id)
+
+    def cancel(self, ticket_ids):
+        return self.transition(ticket_ids, CANCELLED)
+
+    def loads(self):
+        """Return ``{cook_id: open ticket count}`` for cooks with a load."""
+        with self._lock:
+            self.ensure_fresh()
+            return {cook_id: load for cook_id, load in self._load.items() if load}
+
+    def open_tickets(self, status):
+        """Return the ids of open tickets in ``status``."""
+        with self._lock:
+            self.ensure_fresh()
+            return sorted(
+                ticket.pk for ticket in self._tickets.values() if ticket.status == status
+            )
+
+
+scheduler = Scheduler(capacity=getattr(settings, "TICKET_COOK_CAPACITY", None))
+
+
+def place_order(dishes, table="", priority=0):
+    """Create an order with one ticket per dish and schedule the tickets."""
+    with transaction.atomic():
+        order = Order.objects.create(table=table)
+        tickets = Ticket.objects.bulk_create(
+            [Ticket(order=order, dish=dish, priority=priority) for dish in dishes]
+        )
+        assignments = scheduler.submit(tickets)
+        events.publish("ticket", "created", [ticket.pk for ticket in tickets])
+    for ticket in tickets:
+        ticket.cook_id = assignments[ticket.pk]
+        ticket.status = ASSIGNED if ticket.cook_id else QUEUED
+    return order
+
+
+def changed(sender, **kwargs):
+    transaction.on_commit(scheduler.invalidate)
+
+
+def cooks_changed(sender, action, **kwargs):
+    if action.startswith("post_"):
+        transaction.on_commit(scheduler.invalidate)
+
+
+def delete_tickets_of(dish_ids):
+    """Drop the tickets of dishes about to be raw deleted."""
+    tickets = Ticket.objects.filter(dish_id__in=dish_ids)
+    if tickets._raw_delete(tickets.db):
+        transaction.on_commit(scheduler.invalidate)
+        events.publish("ticket", "deleted")
+        versioning.bump("kitchen.Ticket")
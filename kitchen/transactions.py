@@ -0,0 +1,33 @@
+from django.db import transaction
+
+
+class _Once:
+    def __init__(self, func, args):
+        self.key = (func, args)
+        self.pending = True
+        self.__qualname__ = func.__qualname__
+
+    def __call__(self):
+        self.pending = False
+        func, args = self.key
+        func(*args)
+
+
+def on_commit_once(func, *args, robust=False):
+    """
+    Run ``func(*args)`` once the current transaction commits, like
+    ``transaction.on_commit``, unless the same call is already queued where
+    a rollback discarding it would discard the caller's work too.
+    """
+    connection = transaction.get_connection()
+    if connection.in_atomic_block:
+        current = set(connection.savepoint_ids)
+        for savepoint_ids, queued, _ in connection.run_on_commit:
+            if (
+                isinstance(queued, _Once)
+                and queued.pending
+                and queued.key == (func, args)
+                and savepoint_ids <= current
+            ):
+                return
+    transaction.on_commit(_Once(func, args), robust=robust)
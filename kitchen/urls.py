@@ -1,4 +1,10 @@
 from django.urls import path
+from .api import DishApiDetailView, DishApiListView
+from .autocomplete import AutocompleteView
+from .changes import ChangeFeedView
+from .events import EventStreamView, FragmentView
+from .exports import ExportView
+from .metrics import MetricsView
 from .views import (
     IndexView,
     DishListView,
@@ -6,6 +12,9 @@ from .views import (
     DishCreateView,
     DishUpdateView,
     DishDeleteView,
+    DishBulkActionView,
+    DishTypeBulkDeleteView,
+    IngredientBulkDeleteView,
     DishTypeListView,
     DishTypeCreateView,
     DishTypeUpdateView,
@@ -15,6 +24,9 @@ from .views import (
     IngredientCreateView,
     IngredientUpdateView,
     IngredientDeleteView,
+    OrderCreateView,
+    TicketListView,
+    TicketTransitionView,
 )
 
 urlpatterns = [
@@ -25,17 +37,70 @@ urlpatterns = [
     path("dishes/create/", DishCreateView.as_view(), name="dish-create"),
     path("dishes/<int:pk>/update/", DishUpdateView.as_view(), name="dish-update"),
     path("dishes/<int:pk>/delete/", DishDeleteView.as_view(), name="dish-delete"),
+    path("dishes/bulk/", DishBulkActionView.as_view(), name="dish-bulk"),
 
     path("dish-types/", DishTypeListView.as_view(), name="dishtype-list"),
     path("dish-types/<int:pk>/", DishTypeDetailView.as_view(), name="dishtype-detail"),
     path("dish-types/create/", DishTypeCreateView.as_view(), name="dishtype-create"),
     path("dish-types/<int:pk>/update/", DishTypeUpdateView.as_view(), name="dishtype-update"),
     path("dish-types/<int:pk>/delete/", DishTypeDeleteView.as_view(), name="dishtype-delete"),
+    path(
+        "dish-types/bulk-delete/",
+        DishTypeBulkDeleteView.as_view(),
+        name="dishtype-bulk-delete",
+    ),
 
     path("ingredients/", IngredientListView.as_view(), name="ingredient-list"),
     path("ingredients/create/", IngredientCreateView.as_view(), name="ingredient-create"),
     path("ingredients/<int:pk>/update/", IngredientUpdateView.as_view(), name="ingredient-update"),
     path("ingredients/<int:pk>/delete/", IngredientDeleteView.as_view(), name="ingredient-delete"),
+    path(
+        "ingredients/bulk-delete/",
+        IngredientBulkDeleteView.as_view(),
+        name="ingredient-bulk-delete",
+    ),
+
+    path("orders/create/", OrderCreateView.as_view(), name="order-create"),
+    path("tickets/", TicketListView.as_view(), name="ticket-list"),
+    path(
+        "tickets/<int:pk>/transition/",
+        TicketTransitionView.as_view(),
+        name="ticket-transition",
+    ),
+
+    path("api/dishes/", DishApiListView.as_view(), name="api-dish-list"),
+    path("api/dishes/<int:pk>/", DishApiDetailView.as_view(), name="api-dish-detail"),
+    path("api/changes/", ChangeFeedView.as_view(), name="api-changes"),
+    path(
+        "api/autocomplete/cooks/",
+        AutocompleteView.as_view(kind="cook"),
+        name="api-autocomplete-cooks",
+    ),
+    path(
+        "api/autocomplete/dishes/",
+        AutocompleteView.as_view(kind="dish"),
+        name="api-autocomplete-dishes",
+    ),
+    path(
+        "api/autocomplete/ingredients/",
+        AutocompleteView.as_view(kind="ingredient"),
+        name="api-autocomplete-ingredients",
+    ),
+
+    path("metrics/", MetricsView.as_view(), name="metrics"),
+    path("events/", EventStreamView.as_view(), name="events"),
+    path("events/fragments/", FragmentView.as_view(), name="live-fragments"),
+
+    path(
+        "export/dishes/",
+        ExportView.as_view(model="dish", filename="dishes"),
+        name="export-dishes",
+    ),
+    path(
+        "export/cooks/",
+        ExportView.as_view(model="cook", filename="cooks"),
+        name="export-cooks",
+    ),
 ]
 
 app_name = "kitchen"
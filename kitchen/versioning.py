@@ -0,0 +1,144 @@
+import hashlib
+from collections import Counter
+
+from django.contrib.messages import get_messages
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import ModelVersion
+from .transactions import on_commit_once
+
+# Committed bumps made by this process, so in-process caches that apply the
+# same changes themselves can tell them apart from other workers' writes.
+local_bumps = Counter()
+
+
+def _bump(label):
+    now = timezone.now()
+    updated = ModelVersion.objects.filter(label=label).update(
+        version=F("version") + 1, updated_at=now
+    )
+    if not updated:
+        try:
+            with transaction.atomic():
+                ModelVersion.objects.create(label=label, version=1)
+        except IntegrityError:
+            ModelVersion.objects.filter(label=label).update(
+                version=F("version") + 1, updated_at=now
+            )
+    local_bumps[label] += 1
+
+
+def bump(label):
+    """
+    Advance the version of ``label`` (an ``app_label.Model`` string) once
+    the transaction commits, once however many of its writes call this.
+    The version row is then locked only for its own short UPDATE, not
+    until every writer's commit. Versions are read before the data they
+    validate, so a reader between the commit and the bump only rebuilds
+    or re-renders once more.
+    """
+    on_commit_once(_bump, label, robust=True)
+
+
+def get_versions(labels):
+    """Return ``{label: (version, updated_at)}``, unknown labels at version 0."""
+    rows = ModelVersion.objects.filter(label__in=labels).values_list(
+        "label", "version", "updated_at"
+    )
+    versions = {label: (0, None) for label in labels}
+    versions.update({label: (version, updated) for label, version, updated in rows})
+    return versions
+
+
+async def aget_versions(labels):
+    """``get_versions`` for async views."""
+    rows = ModelVersion.objects.filter(label__in=labels).values_list(
+        "label", "version", "updated_at"
+    )
+    versions = {label: (0, None) for label in labels}
+    versions.update(
+        {label: (version, updated) async for label, version, updated in rows}
+    )
+    return versions
+
+
+class ConditionalResponseMixin:
+    """
+    Answer ``If-None-Match`` / ``If-Modified-Since`` with a 304 from a single
+    version table lookup covering every model listed in ``version_models``.
+
+    Every page renders the CSRF token and the flash messages, so the ETag
+    covers the CSRF secret and responses with pending messages are never
+    conditional.
+
+    Async views get the versions through the async ORM; list the mixin
+    after ``AsyncLoginRequiredMixin``, which resolves ``request.user``.
+    """
+
+    version_models = ()
+
+    def get_validators(self):
+        self.versions = get_versions(self.version_models)
+        return self._validators(self.versions)
+
+    async def aget_validators(self):
+        self.versions = await aget_versions(self.version_models)
+        return self._validators(self.versions)
+
+    def _validators(self, versions):
+        user = self.request.user
+        get_token(self.request)
+        parts = [
+            self.request.get_full_path(),
+            str(user.pk),
+            str(getattr(user, "updated_at", "")),
+            self.request.META["CSRF_COOKIE"],
+        ]
+        parts += [f"{label}:{versions[label][0]}" for label in sorted(versions)]
+        etag = hashlib.md5("|".join(parts).encode()).hexdigest()
+        modified = [updated for _, updated in versions.values() if updated]
+        return quote_etag(etag), max(modified).timestamp() if modified else None
+
+    def _is_conditional(self, request):
+        return (
+            request.method in ("GET", "HEAD")
+            and request.user.is_authenticated
+            and not len(get_messages(request))
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self._adispatch(request, *args, **kwargs)
+        if not self._is_conditional(request):
+            return super().dispatch(request, *args, **kwargs)
+        etag, last_modified = self.get_validators()
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+        return self._add_validators(response, etag, last_modified)
+
+    async def _adispatch(self, request, *args, **kwargs):
+        if not self._is_conditional(request):
+            return await super().dispatch(request, *args, **kwargs)
+        etag, last_modified = await self.aget_validators()
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = await super().dispatch(request, *args, **kwargs)
+        return self._add_validators(response, etag, last_modified)
+
+    def _add_validators(self, response, etag, last_modified):
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if last_modified:
+                response["Last-Modified"] = http_date(last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -1,15 +1,26 @@
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.urls import reverse_lazy
+from django.shortcuts import redirect, render
+from django.urls import reverse, reverse_lazy
 from django.views import generic
 from django.views.generic import TemplateView
 
-from .models import Dish, DishType, Ingredient
-from users.models import Cook
+from . import bulk_actions, counters, tickets, visits
+from .async_views import AsyncDetailView, AsyncListView, AsyncLoginRequiredMixin
+from .dish_summary import DISH_LIST_FIELDS
+from .models import Dish, DishType, Ingredient, Ticket
+from .pagination import KeysetPaginationMixin
+from .versioning import ConditionalResponseMixin
 from .forms import (
+    BulkDeleteForm,
+    DishBulkActionForm,
     DishForm,
     DishSearchForm,
     DishTypeSearchForm,
     IngredientSearchForm,
+    OrderForm,
+    TicketTransitionForm,
 )
 
 
@@ -18,41 +29,55 @@ class IndexView(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["num_cooks"] = Cook.objects.count()
-        context["num_dishes"] = Dish.objects.count()
-        context["num_types"] = DishType.objects.count()
-        context["num_ingredients"] = Ingredient.objects.count()
-
-        num_visits = self.request.session.get("num_visits", 0)
-        self.request.session["num_visits"] = num_visits + 1
-        context["num_visits"] = num_visits + 1
+        context.update(counters.get_counts())
+        context["num_visits"] = visits.record_visit(self.request)
         return context
 
 
-class DishListView(LoginRequiredMixin, generic.ListView):
+class DishListView(
+    AsyncLoginRequiredMixin,
+    ConditionalResponseMixin,
+    KeysetPaginationMixin,
+    AsyncListView,
+):
     model = Dish
+    version_models = ("kitchen.Dish", "kitchen.DishType", "kitchen.Ingredient")
     paginate_by = 5
     context_object_name = "dish_list"
 
-    def get_queryset(self):
-        queryset = Dish.objects.select_related("dish_type").prefetch_related(
-            "cooks", "ingredients"
+    async def aget_queryset(self):
+        # The row only needs the dish itself and its denormalized type name.
+        queryset = Dish.objects.only(*DISH_LIST_FIELDS).order_by("name")
+        self.filter_form = form = DishSearchForm(self.request.GET)
+        self.facet_queryset = await form.afilter_by_ingredients(queryset)
+        return form.search(form.filter_by_facets(self.facet_queryset))
+
+    async def aget_context_data(self, **kwargs):
+        kwargs["facets"] = await self.filter_form.afacets(
+            self.facet_queryset, versions=getattr(self, "versions", None)
         )
-        name = self.request.GET.get("name")
-        if name:
-            queryset = queryset.filter(name__icontains=name)
-        return queryset.order_by("name")
+        return await super().aget_context_data(**kwargs)
 
-    def get_context_data(self, *, object_list=None, **kwargs):
+    def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["search_form"] = DishSearchForm(
-            initial={"name": self.request.GET.get("name")}
-        )
+        context["search_form"] = DishSearchForm(initial=self.request.GET.dict())
+        context["bulk_form"] = DishBulkActionForm()
         return context
 
 
-class DishDetailView(LoginRequiredMixin, generic.DetailView):
+class DishDetailView(
+    AsyncLoginRequiredMixin, ConditionalResponseMixin, AsyncDetailView
+):
     model = Dish
+    queryset = Dish.objects.select_related("dish_type").prefetch_related(
+        "cooks", "ingredients"
+    )
+    version_models = (
+        "kitchen.Dish",
+        "kitchen.DishType",
+        "kitchen.Ingredient",
+        settings.AUTH_USER_MODEL,
+    )
 
 
 class DishCreateView(LoginRequiredMixin, generic.CreateView):
@@ -72,19 +97,124 @@ class DishDeleteView(LoginRequiredMixin, generic.DeleteView):
     success_url = reverse_lazy("kitchen:dish-list")
 
 
-class DishTypeListView(LoginRequiredMixin, generic.ListView):
+class BulkConfirmMixin:
+    """Render a cascade preview that re-posts the request once confirmed."""
+
+    def confirm_delete(self, model, queryset):
+        carried = [
+            (name, value)
+            for name in self.request.POST
+            if name not in ("csrfmiddlewaretoken", "confirm")
+            for value in self.request.POST.getlist(name)
+        ]
+        return render(
+            self.request,
+            "kitchen/bulk_confirm_delete.html",
+            {
+                "preview": bulk_actions.preview_delete(model, queryset),
+                "verbose_name_plural": model._meta.verbose_name_plural,
+                "carried": carried,
+                "cancel_url": self.get_success_url(),
+            },
+        )
+
+    def get_success_url(self):
+        url = reverse(self.success_url_name)
+        return f"{url}?{self.request.GET.urlencode()}" if self.request.GET else url
+
+
+class DishBulkActionView(LoginRequiredMixin, BulkConfirmMixin, generic.View):
+    """
+    Apply one action to the selected dishes, or to every dish matching the
+    list filters passed in the query string, as set-based statements in one
+    transaction.
+    """
+
+    success_url_name = "kitchen:dish-list"
+
+    def get_dishes(self, form):
+        if not form.cleaned_data["select_all"]:
+            return form.cleaned_data["dishes"]
+        search = DishSearchForm(self.request.GET)
+        dishes = search.filter_by_facets(search.filter_by_ingredients(Dish.objects.all()))
+        return search.search(dishes, rank=False)
+
+    def post(self, request, *args, **kwargs):
+        form = DishBulkActionForm(request.POST)
+        if not form.is_valid():
+            for errors in form.errors.values():
+                for error in errors:
+                    messages.error(request, error)
+            return redirect(self.get_success_url())
+
+        dishes = self.get_dishes(form)
+        action = form.cleaned_data["action"]
+        if action == "delete" and not request.POST.get("confirm"):
+            return self.confirm_delete(Dish, dishes)
+        try:
+            if action == "price":
+                count = bulk_actions.change_prices(dishes, form.cleaned_data["percent"])
+            elif action == "dish_type":
+                count = bulk_actions.reassign_dish_type(dishes, form.cleaned_data["dish_type"])
+            elif action == "add_ingredient":
+                count = bulk_actions.add_ingredient(dishes, form.cleaned_data["ingredient"])
+            elif action == "remove_ingredient":
+                count = bulk_actions.remove_ingredient(dishes, form.cleaned_data["ingredient"])
+            else:
+                count = bulk_actions.delete_dishes(dishes)
+        except bulk_actions.BulkActionError as error:
+            messages.error(request, str(error))
+        else:
+            messages.success(request, f"Updated {count} dish(es).")
+        return redirect(self.get_success_url())
+
+
+class BulkDeleteView(LoginRequiredMixin, BulkConfirmMixin, generic.View):
+    model = None
+    # Not "delete", which View would dispatch DELETE requests to.
+    perform_delete = None
+    success_url_name = None
+
+    def post(self, request, *args, **kwargs):
+        form = BulkDeleteForm(request.POST, queryset=self.model.objects.all())
+        if not form.is_valid():
+            messages.error(request, f"Select the {self.model._meta.verbose_name_plural} to delete.")
+            return redirect(self.get_success_url())
+        selected = form.cleaned_data["selected"]
+        if not request.POST.get("confirm"):
+            return self.confirm_delete(self.model, selected)
+        count = selected.count()
+        self.perform_delete(selected)
+        messages.success(
+            request, f"Deleted {count} {self.model._meta.verbose_name_plural}."
+        )
+        return redirect(self.get_success_url())
+
+
+class DishTypeBulkDeleteView(BulkDeleteView):
+    model = DishType
+    perform_delete = staticmethod(bulk_actions.delete_dish_types)
+    success_url_name = "kitchen:dishtype-list"
+
+
+class IngredientBulkDeleteView(BulkDeleteView):
+    model = Ingredient
+    perform_delete = staticmethod(bulk_actions.delete_ingredients)
+    success_url_name = "kitchen:ingredient-list"
+
+
+class DishTypeListView(
+    AsyncLoginRequiredMixin, KeysetPaginationMixin, AsyncListView
+):
     model = DishType
     paginate_by = 5
     context_object_name = "dishtype_list"
 
     def get_queryset(self):
         queryset = DishType.objects.all()
-        name = self.request.GET.get("name")
-        if name:
-            queryset = queryset.filter(name__icontains=name)
-        return queryset
+        return DishTypeSearchForm(self.request.GET).search(queryset)
 
-    def get_context_data(self, *, object_list=None, **kwargs):
+    def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["search_form"] = DishTypeSearchForm(
             initial={"name": self.request.GET.get("name")}
@@ -92,8 +222,12 @@ class DishTypeListView(LoginRequiredMixin, generic.ListView):
         return context
 
 
-class DishTypeDetailView(LoginRequiredMixin, generic.DetailView):
+class DishTypeDetailView(
+    AsyncLoginRequiredMixin, ConditionalResponseMixin, AsyncDetailView
+):
     model = DishType
+    queryset = DishType.objects.prefetch_related("dishes")
+    version_models = ("kitchen.DishType", "kitchen.Dish")
     context_object_name = "dishtype"
 
 
@@ -120,10 +254,7 @@ class IngredientListView(LoginRequiredMixin, generic.ListView):
 
     def get_queryset(self):
         queryset = Ingredient.objects.all()
-        name = self.request.GET.get("name")
-        if name:
-            queryset = queryset.filter(name__icontains=name)
-        return queryset
+        return IngredientSearchForm(self.request.GET).search(queryset)
 
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -148,3 +279,58 @@ class IngredientUpdateView(LoginRequiredMixin, generic.UpdateView):
 class IngredientDeleteView(LoginRequiredMixin, generic.DeleteView):
     model = Ingredient
     success_url = reverse_lazy("kitchen:ingredient-list")
+
+
+class OrderCreateView(LoginRequiredMixin, generic.FormView):
+    form_class = OrderForm
+    template_name = "kitchen/order_form.html"
+    success_url = reverse_lazy("kitchen:ticket-list")
+
+    def form_valid(self, form):
+        order = tickets.place_order(
+            form.cleaned_data["dishes"],
+            table=form.cleaned_data["table"],
+            priority=form.cleaned_data["priority"],
+        )
+        messages.success(self.request, f"{order} sent to the kitchen.")
+        return super().form_valid(form)
+
+
+class TicketListView(LoginRequiredMixin, generic.ListView):
+    """Open tickets, or with ``?mine=1`` only those of the current cook."""
+
+    paginate_by = 20
+    context_object_name = "ticket_list"
+
+    def get_queryset(self):
+        queryset = Ticket.objects.filter(status__in=Ticket.ACTIVE).select_related(
+            "order", "dish", "cook"
+        )
+        if self.request.GET.get("mine"):
+            queryset = queryset.filter(cook=self.request.user)
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["my_load"] = tickets.scheduler.loads().get(self.request.user.pk, 0)
+        return context
+
+
+class TicketTransitionView(LoginRequiredMixin, generic.View):
+    """
+    Start or complete a ticket assigned to the current cook, or cancel any
+    open ticket. Only the scheduler writes ticket state.
+    """
+
+    def post(self, request, pk, *args, **kwargs):
+        form = TicketTransitionForm(request.POST)
+        if form.is_valid():
+            action = form.cleaned_data["action"]
+            if action == "cancel":
+                moved = tickets.scheduler.cancel([pk])
+            else:
+                moved = getattr(tickets.scheduler, action)([pk], cook_id=request.user.pk)
+            if not moved:
+                messages.error(request, f"Ticket #{pk} cannot {action} now.")
+        url = reverse("kitchen:ticket-list")
+        return redirect(f"{url}?mine=1" if request.GET.get("mine") else url)
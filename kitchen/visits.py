@@ -0,0 +1,141 @@
+import atexit
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import SessionVisits
+
+SESSION_KEY = "num_visits"
+COOKIE_ENGINE = "django.contrib.sessions.backends.signed_cookies"
+
+
+def _add_stored(session_key, count, expire_date):
+    updated = SessionVisits.objects.filter(session_key=session_key).update(
+        count=F("count") + count, expire_date=expire_date
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            SessionVisits.objects.create(
+                session_key=session_key, count=count, expire_date=expire_date
+            )
+    except IntegrityError:
+        SessionVisits.objects.filter(session_key=session_key).update(
+            count=F("count") + count, expire_date=expire_date
+        )
+
+
+class VisitBuffer:
+    """
+    Per-process tally of home page visits that is added to the
+    SessionVisits table in batches instead of saving the session on every
+    request. The session itself is only ever written by its own requests.
+    """
+
+    def __init__(self, flush_interval=30, flush_threshold=1000):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)
+        self._expire_dates = {}
+        self._total = 0
+        self._last_flush = time.monotonic()
+
+    def add(self, session_key, expire_date):
+        with self._lock:
+            self._pending[session_key] += 1
+            self._expire_dates[session_key] = expire_date
+            self._total += 1
+            count = self._pending[session_key]
+            due = (
+                self._total >= self.flush_threshold
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+        return count
+
+    def pending(self, session_key):
+        with self._lock:
+            return self._pending.get(session_key, 0)
+
+    def forget(self, session_key):
+        with self._lock:
+            self._total -= self._pending.pop(session_key, 0)
+            self._expire_dates.pop(session_key, None)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+            expire_dates, self._expire_dates = self._expire_dates, {}
+            self._total = 0
+            self._last_flush = time.monotonic()
+        # Counts of sessions that ended without a logout go with them.
+        SessionVisits.objects.filter(expire_date__lt=timezone.now()).delete()
+        for session_key, count in pending.items():
+            _add_stored(session_key, count, expire_dates[session_key])
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = VisitBuffer(
+                flush_interval=getattr(settings, "VISIT_FLUSH_INTERVAL", 30),
+                flush_threshold=getattr(settings, "VISIT_FLUSH_THRESHOLD", 1000),
+            )
+            atexit.register(_flush_at_exit)
+        return _buffer
+
+
+def _flush_at_exit():
+    try:
+        _buffer.flush()
+    except DatabaseError:
+        # The database may already be gone, e.g. a destroyed test database.
+        pass
+
+
+def use_buffer():
+    if settings.SESSION_ENGINE == COOKIE_ENGINE:
+        # A cookie session's key changes with its data, so nothing can be
+        # counted under it.
+        return False
+    return getattr(settings, "VISIT_COUNTER", "session") == "buffered"
+
+
+def record_visit(request):
+    """Count a visit for the current session and return the new total."""
+    session = request.session
+    if not use_buffer() or session.session_key is None:
+        num_visits = session.get(SESSION_KEY, 0) + 1
+        session[SESSION_KEY] = num_visits
+        return num_visits
+    # Read the stored count before counting, a flush may follow. Visits
+    # counted while VISIT_COUNTER was "session" stay in the session.
+    stored = (
+        SessionVisits.objects.filter(session_key=session.session_key)
+        .values_list("count", flat=True)
+        .first()
+        or 0
+    )
+    count = get_buffer().add(session.session_key, session.get_expiry_date())
+    return session.get(SESSION_KEY, 0) + stored + count
+
+
+def session_ended(sender, request, user, **kwargs):
+    """Drop the counts of a session on logout, before its key goes."""
+    session_key = request.session.session_key
+    if session_key:
+        get_buffer().forget(session_key)
+        SessionVisits.objects.filter(session_key=session_key).delete()
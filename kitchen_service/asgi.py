@@ -2,6 +2,10 @@
 ASGI config for kitchen_service project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Production serves it with uvicorn workers (see gunicorn_asgi.py), so open
+/events/ streams wait on the event loop instead of holding threads. For
+live updates in development run ``uvicorn kitchen_service.asgi:application``
+instead of runserver.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
@@ -0,0 +1,31 @@
+"""
+Gunicorn config serving the ASGI application with uvicorn workers, so the
+async views and the /events/ streams share one event loop per worker. This
+is the production start command:
+
+    gunicorn -c kitchen_service/gunicorn_asgi.py
+
+Sync workers serving kitchen_service.wsgi answer /events/ with 501.
+"""
+
+import glob
+import multiprocessing
+import os
+
+wsgi_app = "kitchen_service.asgi:application"
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = "uvicorn_worker.UvicornWorker"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+accesslog = "-"
+
+
+def on_starting(server):
+    # Workers write their request metrics to METRICS_DIR; start each run
+    # from zero rather than adding up the previous run's workers.
+    directory = os.environ.get("METRICS_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            os.remove(path)
@@ -37,16 +37,30 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'kitchen.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'kitchen.auth.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Per-view timings, Server-Timing headers and the /metrics/ endpoint.
+REQUEST_METRICS = os.environ.get('REQUEST_METRICS', 'False') == 'True'
+# Directory the workers of a host share: each writes its metrics there every
+# METRICS_WRITE_INTERVAL seconds and /metrics/ adds them all up.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_WRITE_INTERVAL = 5
+# Scrapers read /metrics/ with "Authorization: Bearer <METRICS_TOKEN>" or
+# from one of the comma-separated METRICS_ALLOWED_IPS.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [
+    ip for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip
+]
+
 ROOT_URLCONF = 'kitchen_service.urls'
 
 TEMPLATES = [
@@ -67,6 +81,8 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'kitchen_service.wsgi.application'
+# Production runs this under uvicorn workers (kitchen_service/gunicorn_asgi.py).
+ASGI_APPLICATION = 'kitchen_service.asgi.application'
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -88,6 +104,31 @@ AUTH_PASSWORD_VALIDATORS = [
 
 AUTH_USER_MODEL = "users.Cook"
 
+# Serve list views with cursor (keyset) pagination instead of page numbers.
+KEYSET_PAGINATION = False
+
+# Sessions
+# https://docs.djangoproject.com/en/4.1/topics/http/sessions/
+
+SESSION_ENGINE = os.environ.get(
+    'DJANGO_SESSION_ENGINE', 'django.contrib.sessions.backends.db'
+)
+
+# "buffered" keeps home page visit counts in memory per worker and adds
+# them to the SessionVisits table every VISIT_FLUSH_INTERVAL seconds or after
+# VISIT_FLUSH_THRESHOLD visits; "session" saves the session on each visit.
+VISIT_COUNTER = os.environ.get('VISIT_COUNTER', 'buffered')
+VISIT_FLUSH_INTERVAL = 30
+VISIT_FLUSH_THRESHOLD = 1000
+
+# Seconds between checks for changes made by other workers, which the
+# /events/ stream announces; 0 turns the check off.
+EVENTS_POLL_INTERVAL = 2
+
+# Open tickets (assigned or cooking) a cook may hold before new tickets for
+# their dishes wait in the queue; None means no limit.
+TICKET_COOK_CAPACITY = None
+
 LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/accounts/login/"
 
@@ -107,12 +148,33 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/4.1/howto/static-files/
 
-STATIC_URL = 'static/'
+STATIC_URL = '/static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+STATICFILES_DIRS = [BASE_DIR / 'static']
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Template fragments are keyed on row versions, so a per-process cache
+    # never serves stale markup.
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragments',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Cache alias holding logged-in cooks without their password hash (see
+# kitchen/auth.py) and the seconds an entry or version lives; saves and
+# deletes invalidate it before then.
+AUTH_USER_CACHE = 'default'
+AUTH_USER_CACHE_TIMEOUT = 300
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
-
-STATIC_URL = "/static/"
-STATIC_ROOT = BASE_DIR / "staticfiles"
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
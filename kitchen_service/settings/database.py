@@ -0,0 +1,38 @@
+import os
+
+
+def postgres_from_env(environ=os.environ):
+    """
+    Build the Postgres ``DATABASES['default']`` entry from the environment.
+
+    By default connections come from a psycopg 3 pool and are returned to
+    it after each request. Production serves ASGI, where every request runs
+    in a new thread: a persistent connection would be opened per request
+    and left open, never reused. Sync WSGI deployments may set ``DB_POOL=False``
+    to have each worker thread keep its connection open for
+    ``DB_CONN_MAX_AGE`` seconds instead, checked before being reused.
+    """
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': environ['POSTGRES_DB'],
+        'USER': environ['POSTGRES_USER'],
+        'PASSWORD': environ['POSTGRES_PASSWORD'],
+        'HOST': environ['POSTGRES_HOST'],
+        'PORT': int(environ['POSTGRES_DB_PORT']),
+        'CONN_HEALTH_CHECKS': environ.get('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+    }
+    if environ.get('DB_POOL', 'True') == 'True':
+        # Pooled connections are closed by Django after every request.
+        database['CONN_MAX_AGE'] = 0
+        database['OPTIONS'] = {
+            'pool': {
+                'min_size': int(environ.get('DB_POOL_MIN_SIZE', '2')),
+                'max_size': int(environ.get('DB_POOL_MAX_SIZE', '10')),
+                'timeout': float(environ.get('DB_POOL_TIMEOUT', '10')),
+            },
+        }
+    else:
+        max_age = environ.get('DB_CONN_MAX_AGE', '60')
+        # An empty value keeps connections open for the life of the worker.
+        database['CONN_MAX_AGE'] = int(max_age) if max_age else None
+    return database
@@ -1,4 +1,5 @@
 from .base import *
+from .database import postgres_from_env
 import os
 
 
@@ -11,16 +12,39 @@ RENDER_EXTERNAL_HOSTNAME = os.environ.get('RENDER_EXTERNAL_HOSTNAME')
 if RENDER_EXTERNAL_HOSTNAME:
    ALLOWED_HOSTS.append(RENDER_EXTERNAL_HOSTNAME)
 
+# Shared between gunicorn workers.
+CACHES['default'] = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.environ.get('DJANGO_CACHE_DIR', '/tmp/kitchen_service_cache'),
+}
+
+# collectstatic writes hashed file names plus Brotli and gzip variants, which
+# WhiteNoise serves with a far-future "immutable" Cache-Control header.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+WHITENOISE_KEEP_ONLY_HASHED_FILES = True
+
+# Compile each template once per process.
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    (
+        'django.template.loaders.cached.Loader',
+        [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ],
+    ),
+]
+
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
 DATABASES = {
-       'default': {
-           'ENGINE': 'django.db.backends.postgresql',
-           'NAME': os.environ['POSTGRES_DB'],
-           'USER': os.environ['POSTGRES_USER'],
-           'PASSWORD': os.environ['POSTGRES_PASSWORD'],
-           'HOST': os.environ['POSTGRES_HOST'],
-           'PORT': int(os.environ['POSTGRES_DB_PORT']),
-       }
-   }
+    'default': postgres_from_env(),
+}
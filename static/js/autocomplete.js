@@ -0,0 +1,114 @@
+// Replace each <select multiple data-autocomplete-url="..."> with a list of
+// the selected items and a search box suggesting matches from the JSON
+// endpoint, adding picked items to the (hidden) select the form submits.
+(function () {
+  var DELAY = 200;
+
+  function setUp(select) {
+    var url = select.dataset.autocompleteUrl;
+    var box = document.createElement("div");
+    var chosen = document.createElement("div");
+    var input = document.createElement("input");
+    var menu = document.createElement("div");
+    var timer = null;
+    var latest = 0;
+
+    box.className = "position-relative";
+    chosen.className = "mb-1";
+    input.type = "search";
+    input.className = "form-control";
+    input.placeholder = "Type to search";
+    input.autocomplete = "off";
+    menu.className = "list-group position-absolute w-100 shadow";
+    menu.style.zIndex = 1000;
+    select.hidden = true;
+    box.appendChild(chosen);
+    box.appendChild(input);
+    box.appendChild(menu);
+    select.parentNode.insertBefore(box, select.nextSibling);
+
+    function renderChosen() {
+      chosen.textContent = "";
+      Array.prototype.forEach.call(select.selectedOptions, function (option) {
+        var chip = document.createElement("button");
+        chip.type = "button";
+        chip.className = "btn btn-sm btn-outline-secondary me-1 mb-1";
+        chip.textContent = option.text + " ×";
+        chip.addEventListener("click", function () {
+          select.removeChild(option);
+          renderChosen();
+        });
+        chosen.appendChild(chip);
+      });
+    }
+
+    function pick(result) {
+      var option = select.querySelector('option[value="' + result.id + '"]');
+      if (!option) {
+        option = new Option(result.label, result.id);
+        select.appendChild(option);
+      }
+      option.selected = true;
+      input.value = "";
+      menu.textContent = "";
+      renderChosen();
+      input.focus();
+    }
+
+    function renderMenu(results) {
+      menu.textContent = "";
+      results.forEach(function (result) {
+        var option = select.querySelector('option[value="' + result.id + '"]');
+        if (option && option.selected) {
+          return;
+        }
+        var item = document.createElement("button");
+        item.type = "button";
+        item.className = "list-group-item list-group-item-action";
+        item.textContent = result.label;
+        item.addEventListener("click", function () { pick(result); });
+        menu.appendChild(item);
+      });
+    }
+
+    function search() {
+      var query = input.value.trim();
+      var request = ++latest;
+      if (!query) {
+        menu.textContent = "";
+        return;
+      }
+      fetch(url + "?q=" + encodeURIComponent(query), { credentials: "same-origin" })
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+          // Answers can arrive out of order; show only the newest.
+          if (request === latest) {
+            renderMenu(data.results);
+          }
+        });
+    }
+
+    input.addEventListener("input", function () {
+      clearTimeout(timer);
+      timer = setTimeout(search, DELAY);
+    });
+    input.addEventListener("keydown", function (event) {
+      if (event.key === "Enter") {
+        // Pick the first suggestion instead of submitting the form.
+        event.preventDefault();
+        var first = menu.querySelector("button");
+        if (first) {
+          first.click();
+        }
+      }
+    });
+    document.addEventListener("click", function (event) {
+      if (!box.contains(event.target)) {
+        menu.textContent = "";
+      }
+    });
+    renderChosen();
+  }
+
+  document.querySelectorAll("select[data-autocomplete-url]").forEach(setUp);
+})();
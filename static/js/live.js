@@ -0,0 +1,114 @@
+// Keep a page listing <meta name="live-events" content="dish,ticket"> current
+// without reloading it: elements marked with data-live-kind, -fragment and
+// -id are re-rendered from the fragments endpoint when an event names their
+// object, and dropped once it stops returning them. Changes the page cannot
+// place by itself (new objects, missed events) only offer a reload.
+(function () {
+  var meta = document.querySelector('meta[name="live-events"]');
+  var script = document.currentScript;
+  if (!meta || !script || !window.EventSource || !window.fetch) {
+    return;
+  }
+  // Under WSGI the server answers 501 and EventSource gives up.
+  var source = new EventSource(
+    script.dataset.url + "?types=" + encodeURIComponent(meta.content)
+  );
+  var pending = {};
+  var timer = null;
+  var banner = null;
+
+  function shown(kind, ids) {
+    var elements = document.querySelectorAll('[data-live-kind="' + kind + '"]');
+    return Array.prototype.filter.call(elements, function (element) {
+      return ids === null || ids.indexOf(Number(element.dataset.liveId)) !== -1;
+    });
+  }
+
+  function offerReload() {
+    if (banner !== null) {
+      return;
+    }
+    banner = document.createElement("div");
+    banner.className = "alert alert-info";
+    banner.innerHTML = 'This page has changed. <a href="">Reload</a>';
+    var content = document.querySelector(".content") || document.body;
+    content.insertBefore(banner, content.firstChild);
+  }
+
+  function replace(name, id, html) {
+    var selector = '[data-live-fragment="' + name + '"][data-live-id="' + id + '"]';
+    document.querySelectorAll(selector).forEach(function (element) {
+      if (html === undefined) {
+        element.remove();
+        return;
+      }
+      var template = document.createElement("template");
+      template.innerHTML = html.trim();
+      element.replaceWith(template.content.firstElementChild);
+    });
+  }
+
+  function refresh() {
+    var batches = pending;
+    pending = {};
+    timer = null;
+    Object.keys(batches).forEach(function (name) {
+      var ids = Object.keys(batches[name]);
+      // Page filters (e.g. ?mine=1) decide which objects still belong.
+      var params = new URLSearchParams(window.location.search);
+      params.set("fragment", name);
+      params.set("ids", ids.join(","));
+      fetch(script.dataset.fragmentsUrl + "?" + params, { credentials: "same-origin" })
+        .then(function (response) {
+          if (!response.ok) {
+            throw new Error("fragments: " + response.status);
+          }
+          return response.json();
+        })
+        .then(function (data) {
+          ids.forEach(function (id) {
+            replace(name, id, data.fragments[id]);
+          });
+        })
+        .catch(offerReload);
+    });
+  }
+
+  function queue(elements) {
+    elements.forEach(function (element) {
+      var name = element.dataset.liveFragment;
+      pending[name] = pending[name] || {};
+      pending[name][element.dataset.liveId] = true;
+    });
+    if (elements.length && timer === null) {
+      // Changes often come in bursts; fetch once for all of them.
+      timer = setTimeout(refresh, 300);
+    }
+  }
+
+  function handle(event) {
+    var data = JSON.parse(event.data);
+    if (data.action === "deleted" && data.ids.length) {
+      shown(event.type, data.ids).forEach(function (element) {
+        element.remove();
+      });
+      return;
+    }
+    if (data.action === "created" || !data.ids.length) {
+      // New objects, or another process's changes that carry no ids.
+      offerReload();
+    }
+    queue(shown(event.type, data.ids.length ? data.ids : null));
+  }
+
+  var kinds = meta.content.split(",");
+  kinds.forEach(function (kind) {
+    source.addEventListener(kind, handle);
+  });
+  source.addEventListener("reset", function () {
+    offerReload();
+    kinds.forEach(function (kind) {
+      queue(shown(kind, null));
+    });
+  });
+})();
@@ -1,5 +1,6 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
+from kitchen.search import SearchFormMixin
 from .models import Cook
 
 
@@ -19,7 +20,39 @@ class CookExperienceUpdateForm(forms.ModelForm):
         fields = ["years_of_experience"]
 
 
-class CookSearchForm(forms.Form):
+class CookSearchForm(SearchFormMixin, forms.Form):
+    search_field = "username"
+
     username = forms.CharField(
         max_length=255, required=False, label="Search cook by username"
     )
+    min_dishes = forms.IntegerField(
+        min_value=0, required=False, label="At least this many dishes"
+    )
+    sort = forms.ChoiceField(
+        choices=[
+            ("", "Username"),
+            ("-dish_count", "Most dishes"),
+            ("-dish_type_count", "Most dish types"),
+            ("-menu_value", "Highest menu value"),
+        ],
+        required=False,
+    )
+
+    def filter_by_stats(self, queryset):
+        """Filter cooks on their stats row."""
+        if self.is_valid() and self.cleaned_data["min_dishes"] is not None:
+            queryset = queryset.filter(
+                stats__dish_count__gte=self.cleaned_data["min_dishes"]
+            )
+        return queryset
+
+    def search(self, queryset, rank=True):
+        """Search by username; a chosen sort replaces the relevance order."""
+        sort = self.cleaned_data["sort"] if self.is_valid() else ""
+        queryset = super().search(queryset, rank=rank and not sort)
+        if sort:
+            field = sort.lstrip("-")
+            direction = sort[: len(sort) - len(field)]
+            queryset = queryset.order_by(f"{direction}stats__{field}", "username")
+        return queryset
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from kitchen.search import create_search_index, drop_search_index
+
+
+def forwards(apps, schema_editor):
+    create_search_index(schema_editor, "users_cook", "username")
+
+
+def backwards(apps, schema_editor):
+    drop_search_index(schema_editor, "users_cook", "username")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cook',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
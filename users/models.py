@@ -5,6 +5,7 @@ from django.urls import reverse
 
 class Cook(AbstractUser):
     years_of_experience = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "cook"
@@ -1,7 +1,10 @@
 import pytest
 from django.urls import reverse
 from users.models import Cook
-from users.forms import CookCreationForm, CookExperienceUpdateForm
+from users.forms import CookCreationForm, CookExperienceUpdateForm, CookSearchForm
+from kitchen.cook_stats import with_stats
+from kitchen.models import Dish, DishType
+from kitchen.tests import assert_query_budget
 
 
 @pytest.mark.django_db
@@ -97,3 +100,89 @@ def test_cook_list_view_with_search(client):
     cook_list = response.context["cook_list"]
     assert len(cook_list) == 1
     assert cook_list[0].username == "chef5"
+
+
+@pytest.mark.django_db
+def test_cook_list_view_keyset_pagination(client, settings):
+    settings.KEYSET_PAGINATION = True
+    for i in range(7):
+        Cook.objects.create_user(username=f"cook{i}", password="test12345")
+    client.login(username="cook0", password="test12345")
+
+    url = reverse("users:cook-list")
+    response = client.get(url)
+    page = response.context["page_obj"]
+    assert [cook.username for cook in page] == [f"cook{i}" for i in range(5)]
+
+    response = client.get(url, {"cursor": page.next_cursor})
+    assert [cook.username for cook in response.context["page_obj"]] == ["cook5", "cook6"]
+
+
+@pytest.mark.django_db
+def test_cook_views_query_budget(client):
+    cook = Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    dish_type = DishType.objects.create(name="Soup")
+
+    def grow():
+        start = Dish.objects.count()
+        for i in range(start, start + 10):
+            Cook.objects.create(username=f"cook{i}")
+            dish = Dish.objects.create(
+                name=f"Dish {i}", description="", price=5, dish_type=dish_type
+            )
+            dish.cooks.add(cook)
+
+    assert_query_budget(client, reverse("users:cook-detail", args=[cook.pk]), 5, grow)
+    assert_query_budget(client, reverse("users:cook-list"), 6, grow)
+
+
+@pytest.mark.django_db
+def test_cook_views_are_async(client):
+    cook = Cook.objects.create_user(username="chef", password="test12345")
+    Cook.objects.create_user(username="baker", password="test12345")
+    assert client.get(reverse("users:cook-list")).status_code == 302
+    client.login(username="chef", password="test12345")
+
+    response = client.get(reverse("users:cook-list"), {"username": "che"})
+    assert response.wsgi_request.resolver_match.func.view_class.view_is_async
+    assert [c.username for c in response.context["cook_list"]] == ["chef"]
+    response = client.get(reverse("users:cook-list"), {"cursor": ""})
+    assert [c.username for c in response.context["cook_list"]] == ["baker", "chef"]
+    assert response.context["page_obj"].is_keyset
+    response = client.get(reverse("users:cook-detail", args=[cook.pk]))
+    assert response.context["cook"] == cook
+    assert response["ETag"]
+
+
+@pytest.mark.django_db
+def test_cook_list_sorts_and_filters_on_stats(client):
+    Cook.objects.create_user(username="chef", password="test12345")
+    client.login(username="chef", password="test12345")
+    dish_type = DishType.objects.create(name="Soup")
+    busy, idle = Cook.objects.create(username="busy"), Cook.objects.create(username="idle")
+    for i in range(3):
+        dish = Dish.objects.create(
+            name=f"Dish {i}", description="", price=4, dish_type=dish_type
+        )
+        dish.cooks.add(busy, *([idle] if i == 0 else []))
+
+    url = reverse("users:cook-list")
+    response = client.get(url, {"sort": "-dish_count"})
+    assert [c.username for c in response.context["cook_list"]] == ["busy", "idle", "chef"]
+    assert response.context["cook_list"][0].menu_value == 12
+
+    response = client.get(url, {"min_dishes": 1, "sort": "-menu_value"})
+    assert [c.username for c in response.context["cook_list"]] == ["busy", "idle"]
+
+    # The sort wins over search relevance, which would put "idle" first.
+    response = client.get(url, {"username": "idle", "sort": "-dish_count"})
+    assert [c.username for c in response.context["cook_list"]] == ["idle"]
+    idle2 = Cook.objects.create(username="idle2")
+    idle2.dishes.add(*Dish.objects.all()[:2])
+    response = client.get(url, {"username": "idle", "sort": "-dish_count"})
+    assert [c.username for c in response.context["cook_list"]] == ["idle2", "idle"]
+    form = CookSearchForm({"username": "idle", "sort": "-dish_count"})
+    sql = str(form.search(with_stats(Cook.objects.all())).query)
+    assert '"kitchen_cookstats"."dish_count" DESC' in sql
+    assert "COALESCE" not in sql and "search_rank" not in sql
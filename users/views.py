@@ -1,32 +1,45 @@
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy
 from django.views import generic
 
+from kitchen.async_views import AsyncDetailView, AsyncListView, AsyncLoginRequiredMixin
+from kitchen.cook_stats import with_stats
+from kitchen.pagination import KeysetPaginationMixin
+from kitchen.versioning import ConditionalResponseMixin
 from .models import Cook
 from .forms import CookCreationForm, CookExperienceUpdateForm, CookSearchForm
 
 
-class CookListView(LoginRequiredMixin, generic.ListView):
+class CookListView(AsyncLoginRequiredMixin, KeysetPaginationMixin, AsyncListView):
     model = Cook
     paginate_by = 5
+    keyset_fields = ("username", "pk")
     context_object_name = "cook_list"
 
     def get_queryset(self):
-        queryset = Cook.objects.prefetch_related("dishes__dish_type")
-        username = self.request.GET.get("username")
-        if username:
-            queryset = queryset.filter(username__icontains=username)
-        return queryset
+        queryset = with_stats(Cook.objects.order_by("username"))
+        form = CookSearchForm(self.request.GET)
+        return form.search(form.filter_by_stats(queryset))
 
-    def get_context_data(self, *, object_list=None, **kwargs):
+    def use_keyset_pagination(self):
+        # Cursors only cover the default username order.
+        if self.request.GET.get("sort"):
+            return False
+        return super().use_keyset_pagination()
+
+    def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["search_form"] = CookSearchForm(initial={"username": self.request.GET.get("username")})
+        context["search_form"] = CookSearchForm(initial=self.request.GET.dict())
         return context
 
 
-class CookDetailView(LoginRequiredMixin, generic.DetailView):
+class CookDetailView(
+    AsyncLoginRequiredMixin, ConditionalResponseMixin, AsyncDetailView
+):
     model = Cook
-    queryset = Cook.objects.prefetch_related("dishes__dish_type")
+    version_models = (settings.AUTH_USER_MODEL, "kitchen.Dish")
+    queryset = with_stats(Cook.objects.prefetch_related("dishes"))
 
 
 class CookCreateView(LoginRequiredMixin, generic.CreateView):